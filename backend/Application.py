@@ -12,11 +12,10 @@ from flask_login import (
     login_required,
 )
 from flask_bcrypt import Bcrypt
-from flask_migrate import Migrate
 from src.flask_config import app
 from src.Socket import socketio
 
-from src.Models import db, User
+from src.Models import db, upgrade_database, User
 
 
 CORS(app, supports_credentials=True)
@@ -24,7 +23,6 @@ CORS(app, supports_credentials=True)
 
 # Extensions
 bcrypt = Bcrypt(app)
-migrate = Migrate(app, db)
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -32,12 +30,9 @@ login_manager.login_view = "login"
 
 from src.Process.JobManager import Jobs
 
-# --- Initialize Worker and Jobs ---
-jobs = Jobs(app, socketio)
-
 # --- App context ---
 with app.app_context():
-    db.create_all()
+    upgrade_database()
     if not User.query.filter_by(username="bestfuneralservices").first():
         hashed = bcrypt.generate_password_hash("bfsadmin").decode("utf-8")
         u = User(username="bestfuneralservices", password=hashed)
@@ -45,6 +40,9 @@ with app.app_context():
         db.session.commit()
         print("Default admin user created")
 
+# --- Initialize Jobs (after the tables exist: it resumes queued jobs) ---
+jobs = Jobs(app, socketio)
+
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -112,6 +110,12 @@ def stop_job(job_id):
     return jobs.stop(job_id)
 
 
+@app.route("/user/jobs/<job_id>/reaudit", methods=["POST"])
+@login_required
+def reaudit_job(job_id):
+    return jobs.reaudit(job_id, request)
+
+
 @app.route("/user/jobs/<job_id>/delete", methods=["DELETE"])
 @login_required
 def delete_job(job_id):
@@ -121,7 +125,16 @@ def delete_job(job_id):
 @app.route("/user/jobs", methods=["GET"])
 @login_required
 def get_jobs():
-    return jobs.get_all(current_user.id)
+    return jobs.get_all(current_user.id, request)
+
+
+@app.route("/user/jobs/stats", methods=["GET"])
+@login_required
+def get_job_stats():
+    # Operators only: the stats include other users' jobs
+    if current_user.username not in app.config["STATS_USERS"]:
+        return jsonify({"error": "Not allowed to read job stats"}), 403
+    return jobs.stats()
 
 
 @app.route("/health", methods=["GET"])
@@ -0,0 +1,132 @@
+"""job pipeline: queue, checkpoints, stored documents, per-document results
+
+Revision ID: 9e57d3c28a40
+Revises: 4c1f0a9e2b71
+Create Date: 2026-10-18 14:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9e57d3c28a40"
+down_revision = "4c1f0a9e2b71"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "jobs", sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True)
+    )
+    # Rows from before updated_at: unchanged since they were created
+    op.execute("UPDATE jobs SET updated_at = created_at WHERE updated_at IS NULL")
+    op.create_index("ix_jobs_user_created", "jobs", ["user_id", "created_at"])
+    op.create_index("ix_jobs_user_status", "jobs", ["user_id", "status"])
+    op.create_index("ix_jobs_user_updated", "jobs", ["user_id", "updated_at"])
+
+    op.add_column("audit_results", sa.Column("skipped_pages", sa.JSON(), nullable=True))
+    op.add_column(
+        "audit_results", sa.Column("reused_from_job_id", sa.String(), nullable=True)
+    )
+
+    op.add_column(
+        "uploads", sa.Column("content_hash", sa.String(length=64), nullable=True)
+    )
+    op.create_index("ix_uploads_content_hash", "uploads", ["content_hash"])
+    op.create_index("ix_uploads_file_path", "uploads", ["file_path"])
+
+    op.create_table(
+        "document_audit_results",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("job_id", sa.String(), nullable=False),
+        sa.Column("upload_id", sa.Integer(), nullable=False),
+        sa.Column("other_upload_id", sa.Integer(), nullable=True),
+        sa.Column("accuracy", sa.String(), nullable=True),
+        sa.Column("issues", sa.JSON(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["job_id"], ["jobs.id"]),
+        sa.ForeignKeyConstraint(["other_upload_id"], ["uploads.id"]),
+        sa.ForeignKeyConstraint(["upload_id"], ["uploads.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "deleted_jobs",
+        sa.Column("job_id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("job_id"),
+    )
+    op.create_index(
+        "ix_deleted_jobs_user_deleted", "deleted_jobs", ["user_id", "deleted_at"]
+    )
+    op.create_table(
+        "standardized_documents",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("upload_id", sa.Integer(), nullable=False),
+        sa.Column("document_type", sa.String(), nullable=False),
+        sa.Column("pages", sa.JSON(), nullable=False),
+        sa.Column("parsed_content", sa.JSON(), nullable=True),
+        sa.Column("blank_pages", sa.JSON(), nullable=True),
+        sa.Column("model_name", sa.String(), nullable=True),
+        sa.Column("prompt_version", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["upload_id"], ["uploads.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("upload_id"),
+    )
+    op.create_table(
+        "job_queue",
+        sa.Column("job_id", sa.String(), nullable=False),
+        sa.Column("enqueued_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("claimed_by", sa.String(), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["job_id"], ["jobs.id"]),
+        sa.PrimaryKeyConstraint("job_id"),
+    )
+    op.create_table(
+        "job_checkpoints",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("job_id", sa.String(), nullable=False),
+        sa.Column("upload_id", sa.Integer(), nullable=True),
+        sa.Column("stage", sa.String(), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["job_id"], ["jobs.id"]),
+        sa.ForeignKeyConstraint(["upload_id"], ["uploads.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("job_id", "upload_id", "stage"),
+    )
+    op.create_table(
+        "socket_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("event", sa.String(), nullable=False),
+        sa.Column("room", sa.String(), nullable=True),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("socket_events")
+    op.drop_table("job_checkpoints")
+    op.drop_table("job_queue")
+    op.drop_table("standardized_documents")
+    op.drop_index("ix_deleted_jobs_user_deleted", table_name="deleted_jobs")
+    op.drop_table("deleted_jobs")
+    op.drop_table("document_audit_results")
+    with op.batch_alter_table("uploads") as batch_op:
+        batch_op.drop_index("ix_uploads_file_path")
+        batch_op.drop_index("ix_uploads_content_hash")
+        batch_op.drop_column("content_hash")
+    with op.batch_alter_table("audit_results") as batch_op:
+        batch_op.drop_column("reused_from_job_id")
+        batch_op.drop_column("skipped_pages")
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.drop_index("ix_jobs_user_updated")
+        batch_op.drop_index("ix_jobs_user_status")
+        batch_op.drop_index("ix_jobs_user_created")
+        batch_op.drop_column("updated_at")
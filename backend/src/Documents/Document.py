@@ -1,19 +1,19 @@
 from abc import ABC
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from src.Documents.Page import Page
+from src.Documents.Layout import serialize_layout
 
 
-def get_full_document_text(pages: list[Page]):
-    document_text = ""
-    for page in pages:
-        document_text += f"{page.text_with_location_content}, "
-    return document_text
+def get_full_document_text(pages: list[Page], columns: int | None = 100) -> str:
+    return serialize_layout(pages, columns)
 
 
 @dataclass
 class Document(ABC):
     pages: list[Page] = None
     _parsed_content: dict | None = None
+    # Fields that parallel field groups answered differently, see Formatter
+    formatting_conflicts: list[dict] = field(default_factory=list)
 
     @property
     def parsed_content(self) -> dict | None:
@@ -5,6 +5,9 @@ from src.Documents.Document import Document
 @dataclass
 class DeathRegistrationWorksheet(Document):
     name = "Death Registration Worksheet"
+    # Classification label, and header texts that identify the form
+    type_name = "death registration worksheet"
+    signatures = ["DEATH REGISTRATION WORKSHEET", "REGISTRATION WORKSHEET"]
     fields: list[str] = field(
         default_factory=lambda: [
             "DECEDENT'S FIRST NAME",
@@ -64,7 +67,8 @@ class DeathRegistrationWorksheet(Document):
             "OTHER RESPONSIBLE PARTY RELATIONSHIP",
             "DECEDENT'S OCCUPATION",
             "TYPE OF PLACE OF DEATH",
-            "PLACE OF DEATH FACILITY NAME" "PLACE OF DEATH FACILITY ADDRESS",
+            "PLACE OF DEATH FACILITY NAME",
+            "PLACE OF DEATH FACILITY ADDRESS",
             "SPECIFY OTHER INSTITUTION OR ADDRESS WHERE DEATH OCCURRED",
             "CERTIFIER TYPE",
             "CERTIFIER'S LICENSE NUMBER",
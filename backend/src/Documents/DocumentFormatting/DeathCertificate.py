@@ -5,6 +5,9 @@ from src.Documents.Document import Document
 @dataclass
 class DeathCertificate(Document):
     name: str = "Certificate of Death"
+    # Classification label, and header texts that identify the form
+    type_name = "certificate of death"
+    signatures = ["CERTIFICATE OF DEATH", "CERTIFIED COPY", "STATE REGISTRAR"]
     fields: list[str] = field(
         default_factory=lambda: [
             "DECEDENT'S FIRST NAME",
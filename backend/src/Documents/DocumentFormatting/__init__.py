@@ -0,0 +1,9 @@
+from src.Documents.DocumentFormatting.DRW import DeathRegistrationWorksheet
+from src.Documents.DocumentFormatting.DeathCertificate import DeathCertificate
+
+
+# Document classes by the label classification returns for them
+DOCUMENT_TYPES = {
+    document_class.type_name: document_class
+    for document_class in (DeathRegistrationWorksheet, DeathCertificate)
+}
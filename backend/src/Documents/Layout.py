@@ -0,0 +1,78 @@
+"""
+Compact text layout of OCR'd pages for LLM prompts.
+
+Recognized boxes are grouped into reading-order lines, one output line per
+text line. With columns, each segment is prefixed by its horizontal position
+quantised to ``columns`` steps of the page width (``@12 Name``); the vertical
+position is given by the line order, so no raw box coordinates are sent.
+"""
+
+from src.Documents.Page import Page
+
+
+def _group_lines(content: list[tuple]) -> list[list[tuple]]:
+    """Group ``(text, box, score)`` entries into lines, top to bottom"""
+    entries = sorted(
+        (entry for entry in content if str(entry[0]).strip()),
+        key=lambda entry: (float(entry[1][1]) + float(entry[1][3])) / 2,
+    )
+    lines = []  # [top, bottom, entries]
+    for entry in entries:
+        top, bottom = float(entry[1][1]), float(entry[1][3])
+        center = (top + bottom) / 2
+        if lines and lines[-1][0] <= center <= lines[-1][1]:
+            line = lines[-1]
+            line[0], line[1] = min(line[0], top), max(line[1], bottom)
+            line[2].append(entry)
+        else:
+            lines.append([top, bottom, [entry]])
+    return [sorted(line[2], key=lambda entry: float(entry[1][0])) for line in lines]
+
+
+def serialize_page(page: Page, columns: int | None = 100) -> str:
+    lines = _group_lines(page.content)
+    if not lines:
+        return ""
+    # Pages read before their width was kept fall back to the rightmost text
+    width = page.width or (
+        max(float(entry[1][2]) for line in lines for entry in line) or 1.0
+    )
+    rendered = []
+    for line in lines:
+        if columns:
+            segments = (
+                f"@{min(columns - 1, int(float(entry[1][0]) / width * columns))} "
+                f"{str(entry[0]).strip()}"
+                for entry in line
+            )
+        else:
+            segments = (str(entry[0]).strip() for entry in line)
+        rendered.append(" ".join(segments))
+    return "\n".join(rendered)
+
+
+def serialize_layout(pages: list[Page], columns: int | None = 100) -> str:
+    """The pages as reading-order lines, with quantised columns unless None"""
+    return "\n".join(
+        f"[page {number}]\n{serialize_page(page, columns)}"
+        for number, page in enumerate(pages, start=1)
+    )
+
+
+def get_raw_document_text(pages: list[Page]) -> str:
+    """The former prompt format: every box as ``text: [x1 y1 x2 y2]``"""
+    return "".join(f"{page.text_with_location_content}, " for page in pages)
+
+
+def prompt_size_report(pages: list[Page], columns: int | None = 100) -> dict:
+    """Prompt size of the raw box format against the compact layout"""
+    raw = len(get_raw_document_text(pages))
+    compact = len(serialize_layout(pages, columns))
+    return {
+        "raw_chars": raw,
+        "compact_chars": compact,
+        # ~4 characters per token for English text
+        "raw_tokens_estimate": raw // 4,
+        "compact_tokens_estimate": compact // 4,
+        "reduction": round(1 - compact / raw, 3) if raw else 0.0,
+    }
@@ -4,6 +4,8 @@ from dataclasses import dataclass
 @dataclass
 class Page:
     content: list[tuple]
+    # Width in pixels of the rendering the boxes are in, when known
+    width: float | None = None
 
     @property
     def average_recognition_accuracy(self) -> float:
@@ -16,3 +18,22 @@ class Page:
     @property
     def text_with_location_content(self) -> str:
         return ", ".join([f"{text}: {box}" for text, box, _ in self.content])
+
+    def to_json(self) -> list | dict:
+        # numpy boxes/scores from PaddleOCR are converted to plain lists/floats
+        content = [
+            [text, box.tolist() if hasattr(box, "tolist") else list(box), float(score)]
+            for text, box, score in self.content
+        ]
+        if self.width is None:
+            return content
+        return {"width": self.width, "content": content}
+
+    @classmethod
+    def from_json(cls, data: list | dict) -> "Page":
+        # Pages stored before the width was kept are plain content lists
+        width = None
+        if isinstance(data, dict):
+            width, data = data.get("width"), data["content"]
+        content = [(text, box, score) for text, box, score in data]
+        return cls(content=content, width=width)
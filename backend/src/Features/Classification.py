@@ -1,13 +1,94 @@
+from difflib import SequenceMatcher
+
 from src.Documents.Page import Page
 from src.Prompts import DOCUMENT_CLASSIFICATION_PROMPT
 from src.Documents.Document import get_full_document_text
+from src.Documents.DocumentFormatting import DOCUMENT_TYPES
 from src.Features.IFeature import AIFeature
+from src.Features.LocalExtraction import field_label
+
+
+def _signature_found(signature: str, texts: list[str], page_text: str) -> bool:
+    if f" {signature} " in page_text:
+        return True
+    # OCR may garble a header slightly, e.g. "REGISTRATI0N"
+    return any(SequenceMatcher(None, text, signature).ratio() >= 0.85 for text in texts)
+
+
+class LocalDocumentClassifier:
+    """
+    Scores the first page against every registered document type: half for
+    the header signatures of the type found on the page, half for the share
+    of the type's own field labels (those no other type has) printed on it.
+    """
+
+    def __init__(self, document_types: dict = None, min_margin: float = 0.25):
+        self.document_types = document_types or DOCUMENT_TYPES
+        self.min_margin = min_margin
+        labels = {
+            type_name: {field_label(name) for name in document_class().fields}
+            for type_name, document_class in self.document_types.items()
+        }
+        self._labels = {
+            type_name: {
+                label
+                for label in type_labels
+                if not any(
+                    label in other
+                    for other_name, other in labels.items()
+                    if other_name != type_name
+                )
+            }
+            for type_name, type_labels in labels.items()
+        }
+
+    def scores(self, page: Page) -> dict:
+        texts = [field_label(text) for text, _, _ in page.content]
+        page_text = f" {' '.join(texts)} "
+        scores = {}
+        for type_name, document_class in self.document_types.items():
+            signature = any(
+                _signature_found(signature, texts, page_text)
+                for signature in document_class.signatures
+            )
+            labels = self._labels[type_name]
+            found = sum(f" {label} " in page_text for label in labels)
+            coverage = found / len(labels) if labels else 0.0
+            scores[type_name] = 0.5 * signature + 0.5 * coverage
+        return scores
+
+    def classify(self, pages: list[Page]) -> tuple[str | None, dict]:
+        """The document type, or None when the margin is too small to tell"""
+        if not pages:
+            return None, {}
+        scores = self.scores(pages[0])
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best_score - runner_up >= self.min_margin:
+            return best, scores
+        return None, scores
 
 
 class DocumentClassification(AIFeature):
+    name = "classification"
+    step = "classify"
+
+    def __init__(self, ai_model, use_cache: bool = True, local_classifier=None):
+        """Asks the LLM only when ``local_classifier`` cannot tell the type"""
+        super().__init__(ai_model, use_cache)
+        self.local_classifier = local_classifier
 
     def classify(self, pages_read: list[Page]):
-        self._ai_model.set_prompt(
-            f"{DOCUMENT_CLASSIFICATION_PROMPT} {get_full_document_text(pages_read)}"
+        if self.local_classifier is not None:
+            doc_type, scores = self.local_classifier.classify(pages_read)
+            print(f"[Classification] local scores {scores} -> {doc_type}")
+            if doc_type:
+                return doc_type
+
+        prompt = (
+            f"{DOCUMENT_CLASSIFICATION_PROMPT}\n"
+            # The document type only depends on the wording, not the layout
+            f"{get_full_document_text(pages_read, columns=None)}"
         )
-        return self._ai_model.get_text_response()
+        return self._ai_model.generate(prompt, use_cache=self._use_cache)
@@ -1,12 +1,65 @@
 from src.Prompts import DOCUMENT_COMPARISON_PROMPT
 from src.Features.IFeature import AIFeature
+from src.Features.Results import parse_accuracy
 
 
 class DocumentComparison(AIFeature):
-    def compare(self, document1, document2):
-        self._ai_model.set_prompt(
+    name = "comparison"
+    step = "compare"
+
+    def __init__(self, ai_model, use_cache: bool = True, checker=None):
+        """With a ``CrossChecker``, only the fields it cannot decide go to the LLM"""
+        super().__init__(ai_model, use_cache)
+        self.checker = checker
+
+    def _compare_contents(self, name1, content1, name2, content2) -> dict:
+        prompt = (
             f"{DOCUMENT_COMPARISON_PROMPT}\n\n"
-            f"{document1.name}: {document1.parsed_content}\n\n"
-            f"{document2.name}: {document2.parsed_content}"
+            f"{name1}: {content1}\n\n"
+            f"{name2}: {content2}"
+        )
+        return self._ai_model.generate(prompt, json=True, use_cache=self._use_cache)
+
+    def compare(self, document1, document2):
+        pair = self.checker.order(document1, document2) if self.checker else None
+        if pair is None:
+            return self._compare_contents(
+                document1.name,
+                document1.parsed_content,
+                document2.name,
+                document2.parsed_content,
+            )
+
+        worksheet, certificate = pair
+        local = self.checker.check(worksheet.parsed_content, certificate.parsed_content)
+        compared = local.decided + len(local.undecided)
+        print(
+            f"[Comparison] {local.decided}/{compared} field(s) decided locally, "
+            f"{len(local.undecided)} sent to the LLM"
         )
-        return self._ai_model.get_json_response()
+        if not compared:
+            # Nothing comparable field by field; let the LLM look at everything
+            return self._compare_contents(
+                worksheet.name,
+                worksheet.parsed_content,
+                certificate.name,
+                certificate.parsed_content,
+            )
+
+        issues, matches = list(local.issues), len(local.matches)
+        if local.undecided:
+            # Both sides under the certificate's field names, so the LLM sees
+            # them as intersecting keys
+            results = self._compare_contents(
+                worksheet.name,
+                {name: left for name, (left, _) in local.undecided.items()},
+                certificate.name,
+                {name: right for name, (_, right) in local.undecided.items()},
+            )
+            issues.extend(results.get("issues") or [])
+            accuracy = parse_accuracy(results.get("accuracy"))
+            if accuracy is not None:
+                matches += round(accuracy / 100 * len(local.undecided))
+            else:
+                matches += len(local.undecided) - len(results.get("issues") or [])
+        return {"issues": issues, "accuracy": f"{round(100 * matches / compared)}%"}
@@ -0,0 +1,369 @@
+"""
+Local cross-check of a Death Registration Worksheet against a Certificate of
+Death.
+
+``FIELD_MAPPING`` pairs the worksheet fields with the certificate fields that
+hold the same fact; several worksheet fields may map to one combined
+certificate field (name parts to "NAME (FIRST, MIDDLE, LAST, SUFFIX)",
+address parts to the usual residence address). Each pair is normalised and
+scored for its kind of value. A pair is a match or a mismatch when the score
+is clear either way, and undecided otherwise; only the undecided pairs need
+the LLM. A field filled in on one document only is an issue.
+"""
+
+import re
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+
+from src.Documents.DocumentFormatting.DRW import DeathRegistrationWorksheet
+from src.Documents.DocumentFormatting.DeathCertificate import DeathCertificate
+from src.Features.Formatter import is_empty_value
+from src.Helpers.date_formats import parse_document_date
+
+
+# (worksheet fields, certificate field, kind)
+FIELD_MAPPING = [
+    (["DECEDENT'S FIRST NAME"], "DECEDENT'S FIRST NAME", "name"),
+    (["DECEDENT'S MIDDLE NAME"], "DECEDENT'S MIDDLE NAME", "name"),
+    (["DECEDENT'S LAST NAME"], "DECEDENT'S LAST NAME", "name"),
+    (["DECEDENT'S SUFFIX"], "DECEDENT'S SUFFIX", "name"),
+    (["DECEDENT's AKA'S"], "DECEDENT's AKA'S", "name"),
+    (["SOCIAL SECURITY NUMBER"], "SOCIAL SECURITY NUMBER", "digits"),
+    (["DATE OF DEATH (mm/dd/yyyy)"], "DATE OF DEATH (mm/dd/yyyy)", "date"),
+    (["DATE OF BIRTH (mm/dd/yyyy)"], "DATE OF BIRTH (mm/dd/yyyy)", "date"),
+    (["AGE"], "AGE", "number"),
+    (["MARITAL STATUS"], "MARITAL STATUS", "choice"),
+    (
+        [
+            "DECEDENT'S BIRTH CITY OR TOWN",
+            "DECEDENT'S BIRTH COUNTY",
+            "DECEDENT'S BIRTH STATE",
+            "DECEDENT'S BIRTH COUNTRY",
+        ],
+        "BIRTHPLACE (CITY, STATE OR COUNTRY)",
+        "place",
+    ),
+    (
+        [
+            "DECEDENT'S RESIDENCE STREET ADDRESS",
+            "RESIDENCE CITY",
+            "RESIDENCE COUNTY",
+            "RESIDENCE STATE",
+            "ZIP CODE",
+        ],
+        "DECEDENT'S USUAL RESIDENCE ADDRESS (STREET, CITY, COUNTY, STATE, ZIP)",
+        "address",
+    ),
+    (
+        [
+            "FIRST NAME OF SURVIVING SPOUSE",
+            "MIDDLE NAME OF SURVIVING SPOUSE",
+            "LAST NAME OF SURVIVING SPOUSE PRIOR TO FIRST MARRIAGE",
+            "SUFFIX (SURVIVING SPOUSE)",
+        ],
+        "NAME OF SURVIVING SPOUSE PRIOR TO FIRST MARRIAGE (FIRST, MIDDLE, LAST, SUFFIX)",
+        "name",
+    ),
+    (
+        [
+            "FATHER'S FIRST NAME",
+            "FATHER'S MIDDLE NAME",
+            "FATHER'S LAST NAME",
+            "SUFFIX (FATHER)",
+        ],
+        "FATHER'S NAME (FIRST, MIDDLE, LAST, SUFFIX)",
+        "name",
+    ),
+    (
+        [
+            "MOTHER'S FIRST NAME",
+            "MOTHER'S MIDDLE NAME",
+            "MOTHER'S LAST NAME PRIOR TO FIRST MARRIAGE",
+            "SUFFIX (MOTHER)",
+        ],
+        "MOTHER'S NAME PRIOR TO FIRST MARRIAGE (FIRST, MIDDLE, LAST, SUFFIX)",
+        "name",
+    ),
+    (
+        [
+            "INFORMANT'S FIRST NAME",
+            "INFORMANT'S MIDDLE NAME",
+            "INFORMANT'S LAST NAME",
+            "SUFFIX (INFORMANT)",
+        ],
+        "INFORMANT'S NAME (FIRST, MIDDLE, LAST, SUFFIX)",
+        "name",
+    ),
+    (["RELATIONSHIP TO DECEDENT"], "INFORMANT'S RELATIONSHIP", "choice"),
+    (["INFORMANT'S MAILING ADDRESS"], "INFORMANT'S MAILING ADDRESS", "address"),
+    (["DECEDENT'S OCCUPATION"], "OCCUPATION", "text"),
+    (["EVER IN U.S. ARMED FORCES?"], "EVER IN ARMED FORCES", "choice"),
+    (
+        ["NAME OF FUNERAL DIRECTOR"],
+        "FUNERAL DIRECTOR'S NAME OR RESPONSIBLE PERSON",
+        "name",
+    ),
+    (["LICENSE NUMBER"], "LICENSE NUMBER", "identifier"),
+    (
+        ["NAME OF FUNERAL HOME", "ADDRESS OF FUNERAL HOME OR OTHER RESPONSIBLE PARTY"],
+        "FUNERAL FACILITY OR RESPONSIBLE PERSON (NAME & ADDRESS)",
+        "address",
+    ),
+    (
+        ["PLACE OF DISPOSITION - NAME OF FIRST DISPOSITION FACILITY"],
+        "FIRST DISPOSITION FACILITY NAME & LOCATION",
+        "place",
+    ),
+    (
+        ["PLACE OF DISPOSITION - NAME OF SECOND DISPOSITION FACILITY"],
+        "SECOND DISPOSITION FACILITY NAME & LOCATION",
+        "place",
+    ),
+    (
+        [
+            "PLACE OF DEATH FACILITY NAME",
+            "PLACE OF DEATH FACILITY ADDRESS",
+            "SPECIFY OTHER INSTITUTION OR ADDRESS WHERE DEATH OCCURRED",
+        ],
+        "PLACE OF DEATH (FACILITY NAME AND ADDRESS)",
+        "address",
+    ),
+    (["CERTIFIER'S NAME"], "NAME OF PERSON COMPLETING CAUSE OF DEATH", "name"),
+    (
+        [
+            "CERTIFIER'S ADDRESS",
+            "CERTIFIER'S CITY, TOWN, OR LOCATION",
+            "CERTIFIER'S STATE",
+            "CERTIFIER'S ZIP CODE",
+        ],
+        "CERTIFIER'S ADDRESS",
+        "address",
+    ),
+    (["DATE SIGNED"], "DATE CERTIFIED (mm/dd/yyyy)", "date"),
+]
+
+# Scores at or above MATCH are matches, at or below MISMATCH are mismatches
+MATCH_SCORE = 0.9
+MISMATCH_SCORE = 0.5
+# Score of values that are neither, whatever their similarity
+_UNDECIDED_SCORE = (MATCH_SCORE + MISMATCH_SCORE) / 2
+
+_ABBREVIATIONS = {
+    "STREET": "ST",
+    "AVENUE": "AVE",
+    "ROAD": "RD",
+    "DRIVE": "DR",
+    "BOULEVARD": "BLVD",
+    "LANE": "LN",
+    "COURT": "CT",
+    "PLACE": "PL",
+    "PARKWAY": "PKWY",
+    "HIGHWAY": "HWY",
+    "CIRCLE": "CIR",
+    "TRAIL": "TRL",
+    "APARTMENT": "APT",
+    "SUITE": "STE",
+    "NORTH": "N",
+    "SOUTH": "S",
+    "EAST": "E",
+    "WEST": "W",
+    "SAINT": "ST",
+    "MOUNT": "MT",
+    "USA": "US",
+    "COUNTY": "",
+}
+
+_NAME_ABBREVIATIONS = {"JUNIOR": "JR", "SENIOR": "SR", "SECOND": "II", "THIRD": "III"}
+
+_STATES = {
+    "ALABAMA": "AL", "ALASKA": "AK", "ARIZONA": "AZ", "ARKANSAS": "AR",
+    "CALIFORNIA": "CA", "COLORADO": "CO", "CONNECTICUT": "CT", "DELAWARE": "DE",
+    "FLORIDA": "FL", "GEORGIA": "GA", "HAWAII": "HI", "IDAHO": "ID",
+    "ILLINOIS": "IL", "INDIANA": "IN", "IOWA": "IA", "KANSAS": "KS",
+    "KENTUCKY": "KY", "LOUISIANA": "LA", "MAINE": "ME", "MARYLAND": "MD",
+    "MASSACHUSETTS": "MA", "MICHIGAN": "MI", "MINNESOTA": "MN",
+    "MISSISSIPPI": "MS", "MISSOURI": "MO", "MONTANA": "MT", "NEBRASKA": "NE",
+    "NEVADA": "NV", "NEW HAMPSHIRE": "NH", "NEW JERSEY": "NJ",
+    "NEW MEXICO": "NM", "NEW YORK": "NY", "NORTH CAROLINA": "NC",
+    "NORTH DAKOTA": "ND", "OHIO": "OH", "OKLAHOMA": "OK", "OREGON": "OR",
+    "PENNSYLVANIA": "PA", "RHODE ISLAND": "RI", "SOUTH CAROLINA": "SC",
+    "SOUTH DAKOTA": "SD", "TENNESSEE": "TN", "TEXAS": "TX", "UTAH": "UT",
+    "VERMONT": "VT", "VIRGINIA": "VA", "WASHINGTON": "WA",
+    "WEST VIRGINIA": "WV", "WISCONSIN": "WI", "WYOMING": "WY",
+    "DISTRICT OF COLUMBIA": "DC", "UNITED STATES OF AMERICA": "US",
+    "UNITED STATES": "US",
+}  # fmt: skip
+
+_CHOICES = {
+    "Y": "YES",
+    "TRUE": "YES",
+    "N": "NO",
+    "FALSE": "NO",
+    "NONE": "NO",
+    "M": "MALE",
+    "F": "FEMALE",
+    "NEVERMARRIED": "NEVER MARRIED",
+    "MARRIED BUT SEPARATED": "SEPARATED",
+}
+# Choices that are certainly different facts when they differ
+_KNOWN_CHOICES = {
+    "YES",
+    "NO",
+    "MALE",
+    "FEMALE",
+    "MARRIED",
+    "NEVER MARRIED",
+    "DIVORCED",
+    "WIDOWED",
+    "SEPARATED",
+}
+
+
+def _normalize(value) -> str:
+    text = ", ".join(map(str, value)) if isinstance(value, list) else str(value)
+    return " ".join(re.sub(r"[^A-Z0-9 ]", " ", text.upper()).split())
+
+
+def _tokens(value, kind: str) -> list[str]:
+    text = _normalize(value)
+    if kind in {"address", "place"}:
+        # Longest names first, so "WEST VIRGINIA" is not read as "W VIRGINIA"
+        for state in sorted(_STATES, key=len, reverse=True):
+            text = re.sub(rf"\b{state}\b", _STATES[state], text)
+        tokens = [_ABBREVIATIONS.get(token, token) for token in text.split()]
+        return [token for token in tokens if token]
+    if kind == "name":
+        return [_NAME_ABBREVIATIONS.get(token, token) for token in text.split()]
+    return text.split()
+
+
+def _token_similarity(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    if len(a) == 1 or len(b) == 1 or re.search(r"\d", a + b):
+        # House numbers, ZIP codes and initials are exact or different
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _token_set_score(left: list[str], right: list[str]) -> float:
+    """
+    1.0 only when every token of each side is found as is on the other.
+    Otherwise how well the shorter side's tokens are found in the longer side,
+    at most undecided: a value that leaves out parts of the other (no county)
+    or differs slightly ("1234" / "1243", "JOHNSON" / "JOHNSTON") is left to
+    the LLM, and only a value mostly absent from the other is a mismatch.
+    """
+    if not left or not right:
+        return 0.0
+    if set(left) == set(right):
+        return 1.0
+    shorter, longer = sorted((left, right), key=len)
+    coverage = sum(
+        max(_token_similarity(token, other) for other in longer) for token in shorter
+    ) / len(shorter)
+    return min(coverage, _UNDECIDED_SCORE)
+
+
+def score_values(left, right, kind: str) -> float | None:
+    """Similarity of two values in [0, 1], or None when they cannot be compared"""
+    if kind == "digits":
+        left, right = re.sub(r"\D", "", str(left)), re.sub(r"\D", "", str(right))
+        return None if not left or not right else float(left == right)
+    if kind == "number":
+        left, right = re.findall(r"\d+", str(left)), re.findall(r"\d+", str(right))
+        return None if not left or not right else float(left[0] == right[0])
+    if kind == "date":
+        left, right = parse_document_date(left), parse_document_date(right)
+        return None if left is None or right is None else float(left == right)
+    if kind == "identifier":
+        left = re.sub(r"[^A-Z0-9]", "", str(left).upper())
+        right = re.sub(r"[^A-Z0-9]", "", str(right).upper())
+        return float(left == right)
+    if kind == "choice":
+        left, right = _normalize(left), _normalize(right)
+        left, right = _CHOICES.get(left, left), _CHOICES.get(right, right)
+        if left == right:
+            return 1.0
+        if left in _KNOWN_CHOICES and right in _KNOWN_CHOICES:
+            return 0.0
+        return SequenceMatcher(None, left, right).ratio()
+    if kind == "name":
+        # Names only match exactly; spelling variants are for the LLM to judge
+        left, right = _tokens(left, kind), _tokens(right, kind)
+        return 1.0 if left and sorted(left) == sorted(right) else None
+    if kind in {"address", "place"}:
+        return _token_set_score(_tokens(left, kind), _tokens(right, kind))
+    return SequenceMatcher(None, _normalize(left), _normalize(right)).ratio()
+
+
+@dataclass
+class CrossCheckResult:
+    matches: list[str] = field(default_factory=list)
+    issues: list[str] = field(default_factory=list)
+    # certificate field -> (worksheet value, certificate value)
+    undecided: dict = field(default_factory=dict)
+
+    @property
+    def decided(self) -> int:
+        return len(self.matches) + len(self.issues)
+
+
+class CrossChecker:
+    def __init__(self, mapping: list[tuple] = None):
+        self.mapping = mapping or FIELD_MAPPING
+
+    @staticmethod
+    def order(document1, document2):
+        """The documents as ``(worksheet, certificate)``, or None if not a pair"""
+        if isinstance(document1, DeathRegistrationWorksheet) and isinstance(
+            document2, DeathCertificate
+        ):
+            return document1, document2
+        if isinstance(document2, DeathRegistrationWorksheet) and isinstance(
+            document1, DeathCertificate
+        ):
+            return document2, document1
+        return None
+
+    def check(self, worksheet: dict, certificate: dict) -> CrossCheckResult:
+        result = CrossCheckResult()
+        for worksheet_fields, certificate_field, kind in self.mapping:
+            parts = [
+                worksheet.get(name)
+                for name in worksheet_fields
+                if not is_empty_value(worksheet.get(name))
+            ]
+            left = " ".join(map(str, parts))
+            right = certificate.get(certificate_field)
+            if not parts and is_empty_value(right):
+                # Empty on both documents: nothing to compare
+                continue
+            if not parts or is_empty_value(right):
+                # Filled in on one document only, as the LLM would report it
+                filled, empty = (
+                    (DeathRegistrationWorksheet.name, DeathCertificate.name)
+                    if parts
+                    else (DeathCertificate.name, DeathRegistrationWorksheet.name)
+                )
+                result.issues.append(
+                    f"{certificate_field}: '{left or right}' on the {filled} "
+                    f"but missing from the {empty}"
+                )
+                continue
+
+            score = score_values(left, right, kind)
+            if kind == "text" and score is not None and score < MATCH_SCORE:
+                # Free text can say the same thing in other words
+                score = None
+            if score is None or MISMATCH_SCORE < score < MATCH_SCORE:
+                result.undecided[certificate_field] = (left, right)
+            elif score >= MATCH_SCORE:
+                result.matches.append(certificate_field)
+            else:
+                result.issues.append(
+                    f"{certificate_field}: '{left}' on the "
+                    f"{DeathRegistrationWorksheet.name} but '{right}' on the "
+                    f"{DeathCertificate.name}"
+                )
+        return result
@@ -1,13 +1,134 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
 from src.Prompts import DOCUMENT_FORMATTING_PROMPT
 from src.Features.IFeature import AIFeature
+from src.LLM.Schema import SchemaRejected, fields_schema
+
+
+def is_empty_value(value) -> bool:
+    return value is None or str(value).strip().lower() in {"", "null", "none", "n/a"}
+
+
+def merge_field_groups(groups: list[list[str]], partials: list[dict]):
+    """
+    Merge the results of field groups into one dict, in field order.
+
+    A field answered by more than one group with different non-null values is
+    a conflict: the group the field was asked in wins, and the conflict is
+    returned as ``{"field", "value", "alternatives"}``.
+    """
+    owner = {name: index for index, group in enumerate(groups) for name in group}
+    merged, conflicts = {}, []
+    for name in [name for group in groups for name in group]:
+        merged[name] = partials[owner[name]].get(name)
+    alternatives = {}
+    for index, partial in enumerate(partials):
+        for name, value in partial.items():
+            if owner.get(name) == index:
+                continue
+            if name not in owner:
+                # Not a requested field; keep the first answer, as before
+                merged.setdefault(name, value)
+            elif not is_empty_value(value) and value != merged.get(name):
+                alternatives.setdefault(name, []).append(value)
+    for name, values in alternatives.items():
+        if is_empty_value(merged[name]):
+            # The owning group found nothing; take what another group saw
+            merged[name], values = values[0], values[1:]
+        if values:
+            conflicts.append(
+                {"field": name, "value": merged[name], "alternatives": values}
+            )
+    return merged, conflicts
+
+
+def merge_local_fields(fields: list[str], parsed_content: dict, local: dict) -> dict:
+    """LLM results in field order, overridden by the fields read locally"""
+    # Local values are exact reads of strictly formatted text, so they win
+    merged = {name: parsed_content.get(name) for name in fields}
+    merged.update(parsed_content)
+    merged.update(local)
+    return merged
 
 
 class DocumentFormatter(AIFeature):
+    name = "formatting"
+    step = "format"
 
-    def format_document(self, document):
-        self._ai_model.set_prompt(
+    def __init__(
+        self,
+        ai_model,
+        use_cache: bool = True,
+        group_size: int = 0,
+        max_parallel: int = 4,
+        extractor=None,
+    ):
+        """
+        ``group_size`` > 0 extracts the fields in groups of that size, in
+        parallel. Fields the ``extractor`` (a ``FieldExtractor``) reads
+        locally are not sent to the LLM.
+        """
+        super().__init__(ai_model, use_cache)
+        self.group_size = group_size
+        self.max_parallel = max_parallel
+        self.extractor = extractor
+
+    def _format_fields(self, document, fields: list[str]) -> dict:
+        prompt = (
             f"{DOCUMENT_FORMATTING_PROMPT}\n"
-            f"Document standard fields: {document.fields}\n\n"
-            f"Document Raw Text Content with Recognition Boxes: {document.full_document_text}"
+            f"Document standard fields: {fields}\n\n"
+            f"Document Text Layout:\n{document.full_document_text}"
+        )
+        try:
+            # The schema pins the response's keys to exactly the requested fields
+            return self._ai_model.generate(
+                prompt, schema=fields_schema(fields), use_cache=self._use_cache
+            )
+        except (ValueError, SchemaRejected) as e:
+            print(f"[Formatter] Structured output rejected, free-form JSON: {e}")
+            return self._ai_model.generate(prompt, json=True, use_cache=self._use_cache)
+
+    def extract_locally(self, document) -> dict:
+        if self.extractor is None:
+            return {}
+        local = self.extractor.extract(document.pages, document.fields)
+        print(f"[Formatter] {len(local)} field(s) read locally: {list(local)}")
+        return local
+
+    def format_document(self, document):
+        local = self.extract_locally(document)
+        fields = [name for name in document.fields if name not in local]
+        parsed_content = self._format_remaining(document, fields) if fields else {}
+        document.parsed_content = merge_local_fields(
+            document.fields, parsed_content, local
+        )
+
+    def _format_remaining(self, document, fields: list[str]) -> dict:
+        if self.group_size <= 0 or len(fields) <= self.group_size:
+            return self._format_fields(document, fields)
+
+        groups = [
+            fields[start : start + self.group_size]
+            for start in range(0, len(fields), self.group_size)
+        ]
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(self.max_parallel, len(groups))),
+            thread_name_prefix="formatting",
+        ) as executor:
+            # Each call runs in a copy of this context, so it keeps the job's
+            # rate limiter queue
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run, self._format_fields, document, group
+                )
+                for group in groups
+            ]
+            partials = [future.result() for future in futures]
+
+        parsed_content, document.formatting_conflicts = merge_field_groups(
+            groups, partials
         )
-        document.parsed_content = self._ai_model.get_json_response()
+        for conflict in document.formatting_conflicts:
+            print(f"[Formatter] Conflicting values for {conflict}")
+        return parsed_content
@@ -3,9 +3,11 @@ from src.Prompts import DOCUMENT_GENERAL_AUDIT_PROMPT
 
 
 class GeneralAudit(AIFeature):
+    name = "general_audit"
+    step = "audit"
 
     def audit(self, document):
-        self._ai_model.set_prompt(
+        prompt = (
             f"{DOCUMENT_GENERAL_AUDIT_PROMPT}\n\n" f"{document.parsed_content}"
         )
-        return self._ai_model.get_json_response()
+        return self._ai_model.generate(prompt, json=True, use_cache=self._use_cache)
@@ -1,3 +1,9 @@
 class AIFeature:
-    def __init__(self, ai_model):
+    # Key used to opt a feature out of the LLM response cache (LLM_CACHE_OPT_OUT)
+    name = None
+    # Pipeline step whose routed model the feature uses, see LLM_ROUTES
+    step = None
+
+    def __init__(self, ai_model, use_cache: bool = True):
         self._ai_model = ai_model
+        self._use_cache = use_cache
@@ -0,0 +1,189 @@
+"""
+Deterministic extraction of strictly formatted fields from OCR output.
+
+A field is handled locally when its name maps to a value pattern (SSN, date,
+ZIP code, phone, email, license number, time). Its label is looked up among
+the recognized texts and the value is taken from the nearest matching text in
+the label itself, to its right on the same line, or right below it. A field
+is only filled when all its label occurrences agree on one value; anything
+ambiguous is left to the LLM.
+"""
+
+import re
+from difflib import SequenceMatcher
+
+from src.Documents.Page import Page
+
+
+def _format_ssn(match) -> str:
+    digits = re.sub(r"\D", "", match.group())
+    return f"{digits[:3]}-{digits[3:5]}-{digits[5:]}"
+
+
+def _format_date(match) -> str:
+    month, day, year = (int(part) for part in match.groups())
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    return f"{month:02d}/{day:02d}/{year:04d}"
+
+
+def _format_phone(match) -> str:
+    digits = re.sub(r"\D", "", match.group())[-10:]
+    return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
+
+
+def _format_time(match) -> str:
+    return re.sub(r"\s+", " ", match.group().upper()).replace(".", "")
+
+
+# kind -> (value pattern, formatter of the match; None rejects the match)
+PATTERNS = {
+    "ssn": (re.compile(r"(?<!\d)\d{3}[- ]?\d{2}[- ]?\d{4}(?!\d)"), _format_ssn),
+    "date": (
+        re.compile(r"(?<!\d)(\d{1,2})\s?[/.-]\s?(\d{1,2})\s?[/.-]\s?(\d{4})(?!\d)"),
+        _format_date,
+    ),
+    "zip": (re.compile(r"(?<!\d)\d{5}(?:-\d{4})?(?!\d)"), lambda m: m.group()),
+    "phone": (
+        re.compile(r"(?<!\d)(?:\+?1[ .-]?)?\(?\d{3}\)?[ .-]?\d{3}[ .-]?\d{4}(?!\d)"),
+        _format_phone,
+    ),
+    "email": (
+        re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"),
+        lambda m: m.group().lower(),
+    ),
+    "license": (
+        re.compile(r"(?<![\w-])(?=[A-Z0-9-]*\d[A-Z0-9-]*\d)[A-Z0-9][A-Z0-9-]{2,14}"),
+        lambda m: m.group(),
+    ),
+    "time": (
+        re.compile(r"(?<!\d)\d{1,2}:\d{2}(?:\s?[AaPp]\.?[Mm]\.?)?(?!\d)"),
+        _format_time,
+    ),
+}
+
+# (field name pattern, kind), first match wins
+FIELD_KINDS = [
+    (re.compile(r"SOCIAL SECURITY NUMBER"), "ssn"),
+    (re.compile(r"^DATE\b|\(MM/DD/YYYY\)"), "date"),
+    (re.compile(r"ZIP CODE$"), "zip"),
+    (re.compile(r"(PHONE|TELEPHONE|FAX) NUMBER"), "phone"),
+    (re.compile(r"EMAIL ADDRESS"), "email"),
+    (re.compile(r"LICENSE NUMBER"), "license"),
+    (re.compile(r"^TIME OF"), "time"),
+]
+
+LABEL_MIN_SIMILARITY = 0.85
+# Label words shorter than this must be read exactly: one wrong letter turns
+# "FAX" into "TAX" and "DATE" into "GATE"
+LABEL_FUZZY_MIN_LENGTH = 5
+
+
+def field_kind(field: str) -> str | None:
+    for pattern, kind in FIELD_KINDS:
+        if pattern.search(field.upper()):
+            return kind
+    return None
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^A-Z0-9 ]", " ", str(text).upper()).split())
+
+
+def field_label(field: str) -> str:
+    """The printed label of a field: its name without the format hints"""
+    return _normalize(re.sub(r"\(.*?\)|\?", " ", field))
+
+
+def _word_similarity(word: str, label_word: str) -> float:
+    if word == label_word:
+        return 1.0
+    if len(label_word) < LABEL_FUZZY_MIN_LENGTH:
+        return 0.0
+    return SequenceMatcher(None, word, label_word).ratio()
+
+
+def _label_similarity(text: str, label: str) -> float:
+    """
+    Word by word similarity of the start of ``text``, which may go on with
+    the value, to ``label``, weighted by the length of the label words
+    """
+    label_words = label.split()
+    words = _normalize(text).split()[: len(label_words)]
+    if not label_words or len(words) < len(label_words):
+        return 0.0
+    total = sum(
+        _word_similarity(word, label_word) * len(label_word)
+        for word, label_word in zip(words, label_words)
+    )
+    return total / sum(len(label_word) for label_word in label_words)
+
+
+def _normalize_label_text(text: str) -> str:
+    # Drop printed format hints so "(mm/dd/yyyy)" is not taken for a value
+    return re.sub(r"\([^)]*\)", " ", str(text))
+
+
+def _find_value(text: str, kind: str):
+    pattern, formatter = PATTERNS[kind]
+    for match in pattern.finditer(str(text)):
+        value = formatter(match)
+        if value:
+            return value
+    return None
+
+
+class FieldExtractor:
+    def extract(self, pages: list[Page], fields: list[str]) -> dict:
+        """Values of the ``fields`` that could be read without the LLM"""
+        values = {}
+        for field in fields:
+            kind = field_kind(field)
+            if kind is None:
+                continue
+            found = set()
+            label = field_label(field)
+            for page in pages:
+                for index, (text, box, _) in enumerate(page.content):
+                    if _label_similarity(text, label) >= LABEL_MIN_SIMILARITY:
+                        value = self._value_near_label(page.content, index, kind)
+                        if value:
+                            found.add(value)
+            if len(found) == 1:
+                values[field] = found.pop()
+        return values
+
+    def _value_near_label(self, content: list[tuple], label_index: int, kind: str):
+        text, box, _ = content[label_index]
+        # The label and the value are often read as one text
+        value = _find_value(_normalize_label_text(text), kind)
+        if value:
+            return value
+
+        x_min, y_min, x_max, y_max = (float(v) for v in box)
+        height = max(1.0, y_max - y_min)
+        width = max(1.0, x_max - x_min)
+        best, best_distance = None, None
+        for index, (other_text, other_box, _) in enumerate(content):
+            if index == label_index:
+                continue
+            ox_min, oy_min, ox_max, oy_max = (float(v) for v in other_box)
+            center = (oy_min + oy_max) / 2
+            if y_min - height / 2 <= center <= y_max + height / 2 and ox_min >= x_min:
+                # Same line, to the right of the label
+                distance = max(0.0, ox_min - x_max)
+            elif (
+                y_min + height / 2 <= oy_min <= y_max + 3 * height
+                and ox_max >= x_min - width / 2
+                and ox_min <= x_max + width / 2
+            ):
+                # Below the label, under its columns
+                distance = 2 * (oy_min - y_max) + abs(ox_min - x_min)
+            else:
+                continue
+            if best_distance is not None and distance >= best_distance:
+                continue
+            value = _find_value(other_text, kind)
+            if value:
+                best, best_distance = value, distance
+        return best
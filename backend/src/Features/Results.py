@@ -0,0 +1,24 @@
+import re
+
+
+def parse_accuracy(accuracy) -> float | None:
+    """The percentage of an "NN%" accuracy, or None when there is none"""
+    match = re.search(r"\d+(\.\d+)?", str(accuracy))
+    return min(100.0, float(match.group())) if match else None
+
+
+def combine_results(labelled: list[tuple[str, dict]]) -> dict:
+    """
+    One job result from the results of several documents (or document
+    pairs): every issue prefixed with its label, and the mean accuracy.
+    """
+    if len(labelled) == 1:
+        return labelled[0][1]
+    issues, accuracies = [], []
+    for label, results in labelled:
+        issues.extend(f"{label}: {issue}" for issue in results.get("issues") or [])
+        accuracy = parse_accuracy(results.get("accuracy"))
+        if accuracy is not None:
+            accuracies.append(accuracy)
+    accuracy = f"{round(sum(accuracies) / len(accuracies))}%" if accuracies else None
+    return {"issues": issues, "accuracy": accuracy}
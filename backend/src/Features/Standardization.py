@@ -0,0 +1,92 @@
+import hashlib
+
+from src.Documents.Page import Page
+from src.Documents.Document import get_full_document_text
+from src.Documents.DocumentFormatting import DOCUMENT_TYPES
+from src.Features.IFeature import AIFeature
+from src.Features.Formatter import merge_local_fields
+from src.LLM.Schema import fields_schema
+from src.Prompts import (
+    DOCUMENT_CLASSIFICATION_PROMPT,
+    DOCUMENT_FORMATTING_PROMPT,
+    DOCUMENT_STANDARDIZATION_PROMPT,
+)
+
+
+def standardization_version() -> str:
+    """
+    Changes with the prompts and document fields a standardised document
+    depends on, so stored documents of an older version are not reused.
+    """
+    digest = hashlib.sha256()
+    for prompt in (
+        DOCUMENT_CLASSIFICATION_PROMPT,
+        DOCUMENT_FORMATTING_PROMPT,
+        DOCUMENT_STANDARDIZATION_PROMPT,
+    ):
+        digest.update(prompt.encode("utf-8"))
+    for type_name, document_class in sorted(DOCUMENT_TYPES.items()):
+        digest.update(f"{type_name}:{document_class().fields}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def standardization_schema(document_types: dict) -> dict:
+    """
+    The document type, plus one property per type holding its fields. Only
+    the chosen type's property is an object; the others are null.
+    """
+    properties = {"document_type": {"type": "string", "enum": list(document_types)}}
+    for type_name, document_class in document_types.items():
+        properties[type_name] = {
+            "anyOf": [fields_schema(document_class().fields), {"type": "null"}]
+        }
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+class DocumentStandardizer(AIFeature):
+    """Classifies and formats a document in one structured-output LLM call"""
+
+    name = "standardization"
+    step = "format"
+
+    def __init__(self, ai_model, use_cache: bool = True, formatter=None):
+        """Fields the ``formatter``'s extractor reads locally override the LLM's"""
+        super().__init__(ai_model, use_cache)
+        self.formatter = formatter
+        self.document_types = DOCUMENT_TYPES
+        self.schema = standardization_schema(self.document_types)
+
+    def standardize(self, pages_read: list[Page]):
+        """
+        The document, typed and formatted; ValueError on an unusable response,
+        SchemaRejected when the provider refuses the schema
+        """
+        document_fields = {
+            type_name: document_class().fields
+            for type_name, document_class in self.document_types.items()
+        }
+        prompt = (
+            f"{DOCUMENT_FORMATTING_PROMPT}\n"
+            f"{DOCUMENT_STANDARDIZATION_PROMPT}\n"
+            f"Document types and their standard fields: {document_fields}\n\n"
+            f"Document Text Layout:\n{get_full_document_text(pages_read)}"
+        )
+        response = self._ai_model.generate(
+            prompt, schema=self.schema, use_cache=self._use_cache
+        )
+        doc_type = response["document_type"]
+        parsed_content = response[doc_type]
+        if parsed_content is None:
+            raise ValueError(f"No fields returned for document type {doc_type}")
+
+        document = self.document_types[doc_type](pages=pages_read)
+        local = self.formatter.extract_locally(document) if self.formatter else {}
+        document.parsed_content = merge_local_fields(
+            document.fields, parsed_content, local
+        )
+        return doc_type, document
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class DiskCache:
+    """
+    Key/value cache in a SQLite file, shared by every process that opens it.
+
+    Values are stored as JSON. When the stored payload exceeds ``max_bytes``
+    the least recently used entries are evicted; entries older than
+    ``ttl_seconds`` (if given) are treated as missing. Hit and miss counters
+    are kept in the file as well, so they add up across processes.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: float | None = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_entries_last_access "
+                "ON entries (last_access)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_entries_created_at "
+                "ON entries (created_at)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters "
+                "(name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)",
+                [("hits",), ("misses",), ("evictions",), ("expired",)],
+            )
+
+    def _count(self, name: str, amount: int = 1):
+        self._conn.execute(
+            "UPDATE counters SET value = value + ? WHERE name = ?", (amount, name)
+        )
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count("expired")
+                row = None
+            if row is None:
+                self._count("misses")
+                return None
+            self._conn.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._count("hits")
+        return json.loads(row[0])
+
+    def set(self, key: str, value):
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        if self.ttl_seconds:
+            self._conn.execute(
+                "DELETE FROM entries WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Free down to 90% so eviction does not run on every insert
+        to_free = total - int(self.max_bytes * 0.9)
+        freed = evicted = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_access"
+        ).fetchall():
+            if freed >= to_free:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            freed += size
+            evicted += 1
+        self._count("evictions", evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters"))
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }
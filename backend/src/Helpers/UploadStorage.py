@@ -0,0 +1,111 @@
+import os
+import uuid
+import hashlib
+from dataclasses import dataclass
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class PendingBlob:
+    """An upload written to a temporary file, not yet in the store"""
+
+    temp_path: str
+    content_hash: str
+    path: str
+
+
+class UploadStorage:
+    """
+    Content-addressed upload files: a file lives at
+    ``<root>/<hash[:2]>/<hash[2:4]>/<hash>``, so identical uploads share one
+    copy whatever their names. A blob is removed once no Upload row
+    references its path.
+
+    Several processes may add and release blobs at once, without a shared
+    lock: ``place`` puts a blob in the store before the Upload rows
+    referencing it are committed and ``finish`` puts it back afterwards, while
+    ``release`` moves a blob aside and only deletes it if it is still
+    unreferenced after the move.
+    """
+
+    def __init__(self, root: str, chunk_size: int = CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+
+    @property
+    def _incoming(self) -> str:
+        incoming = os.path.join(self.root, "incoming")
+        os.makedirs(incoming, exist_ok=True)
+        return incoming
+
+    def receive(self, file) -> PendingBlob:
+        """Stream an uploaded ``FileStorage`` to a temporary file, hashing it"""
+        temp_path = os.path.join(self._incoming, uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        try:
+            with open(temp_path, "wb") as out:
+                while True:
+                    chunk = file.stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        content_hash = digest.hexdigest()
+        path = os.path.join(
+            self.root, content_hash[:2], content_hash[2:4], content_hash
+        )
+        return PendingBlob(temp_path, content_hash, path)
+
+    def place(self, pending: PendingBlob) -> str:
+        """Put a received file in the store, keeping it received for ``finish``"""
+        os.makedirs(os.path.dirname(pending.path), exist_ok=True)
+        if not os.path.exists(pending.path):
+            # A link, so the received copy survives a concurrent release
+            staged = f"{pending.temp_path}.placed"
+            os.link(pending.temp_path, staged)
+            os.replace(staged, pending.path)
+        return pending.path
+
+    def finish(self, pending: PendingBlob) -> None:
+        """
+        Call once the Upload rows referencing the blob are committed: restores
+        the blob if a release removed it before they were, then drops the
+        received copy.
+        """
+        if os.path.exists(pending.path):
+            self._remove(pending.temp_path)
+        else:
+            os.replace(pending.temp_path, pending.path)
+
+    def discard(self, pending: PendingBlob) -> None:
+        self._remove(pending.temp_path)
+
+    def release(self, path: str, count_references) -> bool:
+        """
+        Remove the blob at ``path`` when ``count_references()``, which must
+        read committed rows in a transaction of its own, finds none.
+        """
+        if count_references() > 0:
+            return False
+        trash = os.path.join(self._incoming, uuid.uuid4().hex)
+        try:
+            os.replace(path, trash)
+        except OSError:
+            return False
+        if count_references() > 0:
+            # An upload of the same file was committed in between
+            os.replace(trash, path)
+            return False
+        return self._remove(trash)
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
@@ -1,4 +1,4 @@
-from datetime import timezone
+from datetime import datetime, timezone
 
 
 def to_utc_iso(dt):
@@ -10,3 +10,34 @@ def to_utc_iso(dt):
     else:
         dt = dt.astimezone(timezone.utc)
     return dt.isoformat().replace("+00:00", "Z")
+
+
+def from_utc_iso(text: str):
+    """Aware UTC datetime of an ISO 8601 timestamp; naive ones are taken as UTC"""
+    dt = datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+_DOCUMENT_DATE_FORMATS = [
+    "%m/%d/%Y",
+    "%m-%d-%Y",
+    "%m.%d.%Y",
+    "%Y-%m-%d",
+    "%B %d %Y",
+    "%b %d %Y",
+    "%d %B %Y",
+    "%d %b %Y",
+]
+
+
+def parse_document_date(value):
+    """Date written on a document in any of the usual US forms, or None"""
+    text = " ".join(str(value).replace(",", " ").split())
+    for date_format in _DOCUMENT_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
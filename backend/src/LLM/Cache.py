@@ -0,0 +1,54 @@
+import hashlib
+from abc import ABC, abstractmethod
+
+from src.Helpers.DiskCache import DiskCache
+
+
+def response_cache_key(model_name: str, temperature, kind: str, prompt: str) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return f"{model_name}|{temperature}|{kind}|{prompt_hash}"
+
+
+class ILLMCache(ABC):
+    @abstractmethod
+    def get(self, key: str):
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class SqliteLLMCache(ILLMCache):
+    """LLM responses in a SQLite file, with TTL and size-bounded LRU eviction"""
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: float | None = None):
+        self._cache = DiskCache(path, max_bytes, ttl_seconds)
+
+    def get(self, key: str):
+        return self._cache.get(key)
+
+    def set(self, key: str, value) -> None:
+        self._cache.set(key, value)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+_caches = {}
+
+
+def get_llm_cache(config) -> ILLMCache | None:
+    """The process-wide response cache for an app config, or None when disabled"""
+    path = config["LLM_CACHE_PATH"]
+    max_bytes = config["LLM_CACHE_MAX_MB"] * 1024 * 1024
+    if not path or max_bytes <= 0:
+        return None
+    if path not in _caches:
+        _caches[path] = SqliteLLMCache(
+            path, max_bytes, config["LLM_CACHE_TTL_SECONDS"] or None
+        )
+    return _caches[path]
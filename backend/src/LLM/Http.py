@@ -0,0 +1,56 @@
+"""
+Shared, pooled HTTP clients for the LLM providers.
+
+Every model instance with the same settings reuses one connection pool, so
+concurrent calls from many jobs share keep-alive connections instead of each
+opening their own. Async clients are bound to an event loop and are kept per
+loop.
+"""
+
+import asyncio
+import threading
+import weakref
+
+import httpx
+
+
+_clients = {}
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _settings(timeout: float, connect_timeout: float, max_connections: int):
+    return dict(
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+    )
+
+
+def get_http_client(
+    timeout: float = 120.0, connect_timeout: float = 10.0, max_connections: int = 20
+) -> httpx.Client:
+    key = (timeout, connect_timeout, max_connections)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = httpx.Client(
+                **_settings(timeout, connect_timeout, max_connections)
+            )
+        return _clients[key]
+
+
+def get_async_http_client(
+    timeout: float = 120.0, connect_timeout: float = 10.0, max_connections: int = 20
+) -> httpx.AsyncClient:
+    """The pooled async client of the running event loop"""
+    loop = asyncio.get_running_loop()
+    key = (timeout, connect_timeout, max_connections)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        if key not in clients:
+            clients[key] = httpx.AsyncClient(
+                **_settings(timeout, connect_timeout, max_connections)
+            )
+        return clients[key]
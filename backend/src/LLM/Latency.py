@@ -0,0 +1,69 @@
+"""
+Latency histograms of the LLM calls of a process, by pipeline step and model.
+The router takes its hedging thresholds from them and the stats endpoint
+reports them; this module imports no provider SDK, so the web process can.
+"""
+
+import threading
+from bisect import bisect_left
+from collections import deque
+
+
+# Upper bounds, in seconds, of the histogram buckets reported in the stats
+BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+
+class LatencyHistogram:
+    """Bucket counts of every latency, plus the last ``window`` for percentiles"""
+
+    def __init__(self, window: int = 200):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.counts[bisect_left(BUCKETS, seconds)] += 1
+            self.recent.append(seconds)
+
+    def percentile(self, percent: float, min_samples: int = 1) -> float | None:
+        """The rolling percentile, or None with fewer than ``min_samples``"""
+        with self._lock:
+            samples = sorted(self.recent)
+        if not samples or len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percent / 100))
+        return samples[index]
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            counts = list(self.counts)
+        labels = [f"<={bound}s" for bound in BUCKETS] + [f">{BUCKETS[-1]}s"]
+        return {
+            "count": sum(counts),
+            "buckets": dict(zip(labels, counts)),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def get_latency_histogram(step: str, model_name: str) -> LatencyHistogram:
+    with _histograms_lock:
+        key = (step, model_name)
+        if key not in _histograms:
+            _histograms[key] = LatencyHistogram()
+        return _histograms[key]
+
+
+def latency_stats() -> dict:
+    """Latency histograms of this process by step, then model"""
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    stats = {}
+    for (step, model_name), histogram in sorted(histograms.items()):
+        stats.setdefault(step, {})[model_name] = histogram.as_dict()
+    return stats
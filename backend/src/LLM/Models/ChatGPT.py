@@ -1,72 +1,110 @@
 import os
 import re
 import json
+import asyncio
+import weakref
 from dotenv import load_dotenv
-from openai import OpenAI
-from src.LLM.Models.IModel import IModel
+from openai import AsyncOpenAI, OpenAI
+from src.LLM.Http import get_async_http_client, get_http_client
+from src.LLM.Models.IModel import IModel, is_bad_request
+from src.LLM.Schema import SchemaRejected
 
 
 class ChatGPTAI(IModel):
-    def __init__(self, model_name: str = "gpt-5"):
+    def __init__(
+        self,
+        model_name: str = "gpt-5",
+        cache=None,
+        timeout: float = 120.0,
+        connect_timeout: float = 10.0,
+        max_connections: int = 20,
+        limiter=None,
+    ):
         load_dotenv()
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise EnvironmentError("Missing 'OPENAI_API_KEY' environment variable")
 
-        self.client = OpenAI(api_key=api_key)
+        self._api_key = api_key
+        self._http_settings = dict(
+            timeout=timeout,
+            connect_timeout=connect_timeout,
+            max_connections=max_connections,
+        )
+        # IModel retries 429s (in step with the limiter) and transient failures
+        self.client = OpenAI(
+            api_key=api_key,
+            http_client=get_http_client(**self._http_settings),
+            max_retries=0,
+        )
+        # AsyncOpenAI clients are bound to the event loop they are used in
+        self._async_clients = weakref.WeakKeyDictionary()
         self.model_name = model_name
         self.prompt = None
         self.temperature = 0.2
+        self.cache = cache
+        self.limiter = limiter
 
-    def set_prompt(self, prompt: str, temperature: float = 0.2):
-        self.prompt = prompt
-        if temperature is not None:
-            self.temperature = temperature
+    def _get_async_client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            self._async_clients[loop] = AsyncOpenAI(
+                api_key=self._api_key,
+                http_client=get_async_http_client(**self._http_settings),
+                max_retries=0,
+            )
+        return self._async_clients[loop]
 
-    def get_text_response(self) -> str:
-        if not self.prompt:
-            raise ValueError("Prompt is not set. Call set_prompt() first.")
+    def _request(self, prompt: str, json: bool, temperature, schema=None) -> dict:
+        request = dict(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            top_p=1.0,
+        )
+        if schema is not None:
+            request["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": schema, "strict": True},
+            }
+        elif json:
+            request["response_format"] = {"type": "json_object"}
+        return request
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": self.prompt}],
-                temperature=self.temperature,
-                top_p=1.0,
-                
-            )
-            text = response.choices[0].message.content.strip()
+    def _parse(self, response, json_mode: bool):
+        content = response.choices[0].message.content
+        if not json_mode:
+            text = (content or "").strip()
             if not text:
                 raise RuntimeError("ChatGPT returned an empty response.")
-
             print("ChatGPT raw text:", text)
             return text
-        except Exception as e:
-            raise RuntimeError(f"ChatGPT API call failed: {e}")
 
-    def get_json_response(self) -> dict:
-        if not self.prompt:
-            raise ValueError("Prompt is not set. Call set_prompt() first.")
+        data = json.loads(content)
+        if not isinstance(data, dict):
+            raise RuntimeError("ChatGPT did not return a JSON object.")
+        print("ChatGPT JSON keys:", list(data.keys()))
+        return data
+
+    def _raise_error(self, error: Exception, schema):
+        if schema is not None and is_bad_request(error):
+            raise SchemaRejected(f"ChatGPT rejected the schema: {error}") from error
+        raise RuntimeError(f"ChatGPT API call failed: {error}") from error
 
+    def _fetch(self, prompt: str, json: bool, temperature, schema=None):
         try:
             response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "user", "content": self.prompt}
-                ],
-                temperature=self.temperature,
-                top_p=1.0,
-                response_format={"type": "json_object"} 
+                **self._request(prompt, json, temperature, schema)
             )
+            return self._parse(response, json)
+        except Exception as e:
+            self._raise_error(e, schema)
 
-            content = response.choices[0].message.content
-            data = json.loads(content)
-
-            if not isinstance(data, dict):
-                raise RuntimeError("ChatGPT did not return a JSON object.")
-
-            print("ChatGPT JSON keys:", list(data.keys()))
-            return data
-
+    async def _afetch(self, prompt: str, json: bool, temperature, schema=None):
+        try:
+            response = await self._get_async_client().chat.completions.create(
+                **self._request(prompt, json, temperature, schema)
+            )
+            return self._parse(response, json)
         except Exception as e:
-            raise RuntimeError(f"ChatGPT API call failed: {e}")
+            self._raise_error(e, schema)
@@ -2,7 +2,8 @@ import os
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
-from src.LLM.Models.IModel import IModel
+from src.LLM.Models.IModel import IModel, is_bad_request
+from src.LLM.Schema import SchemaRejected
 import json
 
 import re, json
@@ -30,7 +31,13 @@ def safe_json_parse(text: str):
 
 
 class GeminiAI(IModel):
-    def __init__(self, model_name: str = "gemini-1.5-flash"):
+    def __init__(
+        self,
+        model_name: str = "gemini-1.5-flash",
+        cache=None,
+        timeout: float = 120.0,
+        limiter=None,
+    ):
         load_dotenv()
         api_key = os.getenv("GOOGLE_GEMINI_API_KEY")
         if not api_key:
@@ -38,46 +45,65 @@ class GeminiAI(IModel):
                 "Missing 'GOOGLE_GEMINI_API_KEY' environment variable"
             )
 
-        self.client = genai.Client(api_key=api_key)
+        # One client per model: it pools its connections, and client.aio shares
+        # them with the async calls
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(timeout=int(timeout * 1000)),
+        )
         self.model_name = model_name
         self.prompt = None
         self.config = None
+        self.cache = cache
+        self.limiter = limiter
 
-    def set_prompt(
-        self, prompt: str, temperature: float = 0.5, thinking_budget: int = 512
-    ):
-        self.prompt = prompt
-        return
-        cfg_kwargs = {}
+    def _config(self, temperature, schema=None):
+        if temperature is None and schema is None:
+            return self.config
+        settings = {}
         if temperature is not None:
-            cfg_kwargs["temperature"] = temperature
-        if thinking_budget is not None:
-            cfg_kwargs["thinking_config"] = types.ThinkingConfig(
-                thinking_budget=thinking_budget
-            )
-        self.config = types.GenerateContentConfig(**cfg_kwargs) if cfg_kwargs else None
+            settings["temperature"] = temperature
+        if schema is not None:
+            settings["response_mime_type"] = "application/json"
+            settings["response_json_schema"] = schema
+        return types.GenerateContentConfig(**settings)
+
+    def _parse(self, response, json_mode: bool):
+        if not response.text or not response.text.strip():
+            raise RuntimeError("Gemini returned an empty response.")
+
+        print("Gemini raw text:", repr(response.text[:300]))
+        if not json_mode:
+            return response.text
+        try:
+            return safe_json_parse(response.text)
+        except json.JSONDecodeError:
+            print("Gemini returned non-JSON text, wrapping into fallback:")
+            return {"raw_text": response.text}
 
-    def get_text_response(self) -> str:
-        if not self.prompt:
-            raise ValueError("Prompt is not set. Call set_prompt() first.")
+    def _raise_error(self, error: Exception, schema):
+        if schema is not None and is_bad_request(error):
+            raise SchemaRejected(f"Gemini rejected the schema: {error}") from error
+        raise RuntimeError(f"Gemini API call failed: {error}") from error
 
+    def _fetch(self, prompt: str, json: bool, temperature, schema=None):
         try:
             response = self.client.models.generate_content(
-                model=self.model_name, contents=self.prompt, config=self.config
+                model=self.model_name,
+                contents=prompt,
+                config=self._config(temperature, schema),
             )
-            if not response.text or not response.text.strip():
-                raise RuntimeError("Gemini returned an empty response.")
-
-            print("Gemini raw text:", repr(response.text[:300]))
-            return response.text
         except Exception as e:
-            raise RuntimeError(f"Gemini API call failed: {e}")
+            self._raise_error(e, schema)
+        return self._parse(response, json)
 
-    def get_json_response(self) -> dict:
-        raw_text = self.get_text_response()
+    async def _afetch(self, prompt: str, json: bool, temperature, schema=None):
         try:
-            return safe_json_parse(raw_text)
-
-        except json.JSONDecodeError:
-            print("Gemini returned non-JSON text, wrapping into fallback:")
-            return {"raw_text": raw_text}
+            response = await self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+                config=self._config(temperature, schema),
+            )
+        except Exception as e:
+            self._raise_error(e, schema)
+        return self._parse(response, json)
@@ -1,11 +1,232 @@
+import asyncio
 from abc import ABC, abstractmethod
+import httpx
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from src.LLM.Cache import ILLMCache, response_cache_key
+from src.LLM.RateLimiter import RateLimiter, estimate_tokens
+from src.LLM.Schema import schema_key, validate
+
+
+def _has_status(error: BaseException, status: int) -> bool:
+    """Whether ``error``, or an error it was raised from, has HTTP ``status``"""
+    while error is not None:
+        codes = (getattr(error, "status_code", None), getattr(error, "code", None))
+        if status in codes:
+            return True
+        error = error.__cause__
+    return False
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return _has_status(error, 429)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    A failure the provider SDKs retry by default: a 408, 409 or 5xx response,
+    a connection error or a timeout. The SDK exceptions for the last two are
+    raised from the underlying httpx error.
+    """
+    while error is not None:
+        if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+            return True
+        for code in (getattr(error, "status_code", None), getattr(error, "code", None)):
+            if isinstance(code, int) and (code in (408, 409) or 500 <= code < 600):
+                return True
+        error = error.__cause__
+    return False
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    return is_rate_limit_error(error) or is_transient_error(error)
+
+
+def is_bad_request(error: BaseException) -> bool:
+    # With a schema, usually a keyword or shape structured outputs do not support
+    return _has_status(error, 400)
 
 
 class IModel(ABC):
+    """
+    LLM model. ``generate``/``agenerate`` are stateless and safe to call from
+    many threads or tasks at once with one shared instance.
+    """
+
+    model_name: str = None
+    temperature: float | None = None
+    # Optional response cache; set by the concrete models
+    cache: ILLMCache | None = None
+    # Optional shared request/token budget, and the completion size it assumes
+    limiter: RateLimiter | None = None
+    completion_tokens: int = 1000
+    max_attempts: int = 6
+    # Legacy set_prompt() state, see below
+    prompt: str = None
+
     @abstractmethod
-    def set_prompt(self):
+    def _fetch(self, prompt: str, json: bool, temperature, schema: dict = None):
+        """
+        Call the provider; returns the text, or the parsed object with
+        ``json``. With ``schema`` the provider's structured output mode is
+        asked to follow that JSON schema.
+        """
         pass
 
     @abstractmethod
-    def get_text_response(self):
+    async def _afetch(self, prompt: str, json: bool, temperature, schema=None):
         pass
+
+    def _cache_key(self, prompt: str, json: bool, temperature, schema=None) -> str:
+        kind = f"schema:{schema_key(schema)}" if schema else "json" if json else "text"
+        return response_cache_key(self.model_name, temperature, kind, prompt)
+
+    def _cache_lookup(self, key: str):
+        cached = self.cache.get(key)
+        if cached is not None:
+            print(f"[LLM cache] hit for {self.model_name} response")
+        return cached
+
+    def _retrying_options(self) -> dict:
+        def before_sleep(retry_state):
+            delay = retry_state.next_action.sleep
+            error = retry_state.outcome.exception()
+            rate_limited = is_rate_limit_error(error)
+            reason = "rate limited" if rate_limited else f"failed ({error!r})"
+            print(
+                f"[LLM] {self.model_name} {reason}, retrying in {delay:.1f}s "
+                f"(attempt {retry_state.attempt_number}/{self.max_attempts})"
+            )
+            # Only a 429 means the shared budget is exhausted
+            if rate_limited and self.limiter is not None:
+                self.limiter.pause(delay)
+
+        return dict(
+            retry=retry_if_exception(is_retryable_error),
+            wait=wait_random_exponential(multiplier=1, max=60),
+            stop=stop_after_attempt(self.max_attempts),
+            before_sleep=before_sleep,
+            reraise=True,
+        )
+
+    def _call(self, prompt: str, json: bool, temperature, schema=None):
+        """``_fetch`` within the rate limits, retrying 429s and transient failures"""
+        for attempt in Retrying(**self._retrying_options()):
+            with attempt:
+                if self.limiter is not None:
+                    self.limiter.acquire(
+                        estimate_tokens(prompt, self.completion_tokens)
+                    )
+                response = self._fetch(prompt, json, temperature, schema)
+                if schema is not None:
+                    validate(response, schema)
+                return response
+
+    async def _acall(self, prompt: str, json: bool, temperature, schema=None):
+        async for attempt in AsyncRetrying(**self._retrying_options()):
+            with attempt:
+                if self.limiter is not None:
+                    await asyncio.to_thread(
+                        self.limiter.acquire,
+                        estimate_tokens(prompt, self.completion_tokens),
+                    )
+                response = await self._afetch(prompt, json, temperature, schema)
+                if schema is not None:
+                    validate(response, schema)
+                return response
+
+    def generate(
+        self,
+        prompt: str,
+        *,
+        json: bool = False,
+        schema: dict | None = None,
+        temperature: float | None = None,
+        use_cache: bool = True,
+    ):
+        """
+        Response to ``prompt``: text, or a parsed JSON object with ``json``.
+        With a JSON ``schema`` the response is a structured output validated
+        against it (ValueError when it does not follow the schema,
+        SchemaRejected when the provider refuses the schema).
+        """
+        if not prompt:
+            raise ValueError("Prompt is empty.")
+        if temperature is None:
+            temperature = self.temperature
+        json = json or schema is not None
+        if self.cache is None or not use_cache:
+            return self._call(prompt, json, temperature, schema)
+
+        key = self._cache_key(prompt, json, temperature, schema)
+        cached = self._cache_lookup(key)
+        if cached is not None:
+            return cached
+        response = self._call(prompt, json, temperature, schema)
+        self.cache.set(key, response)
+        return response
+
+    async def agenerate(
+        self,
+        prompt: str,
+        *,
+        json: bool = False,
+        schema: dict | None = None,
+        temperature: float | None = None,
+        use_cache: bool = True,
+    ):
+        """Async ``generate``, over the pooled async HTTP client"""
+        if not prompt:
+            raise ValueError("Prompt is empty.")
+        if temperature is None:
+            temperature = self.temperature
+        json = json or schema is not None
+        if self.cache is None or not use_cache:
+            return await self._acall(prompt, json, temperature, schema)
+
+        key = self._cache_key(prompt, json, temperature, schema)
+        cached = self._cache_lookup(key)
+        if cached is not None:
+            return cached
+        response = await self._acall(prompt, json, temperature, schema)
+        self.cache.set(key, response)
+        return response
+
+    def cached_response(
+        self,
+        prompt: str,
+        *,
+        json: bool = False,
+        schema: dict | None = None,
+        temperature: float | None = None,
+        use_cache: bool = True,
+    ):
+        """The response ``generate`` would take from the cache, or None"""
+        if self.cache is None or not use_cache:
+            return None
+        if temperature is None:
+            temperature = self.temperature
+        json = json or schema is not None
+        return self.cache.get(self._cache_key(prompt, json, temperature, schema))
+
+    # --- Legacy stateful API: not safe to share between concurrent callers ---
+    def set_prompt(self, prompt: str, temperature: float | None = None):
+        self.prompt = prompt
+        if temperature is not None:
+            self.temperature = temperature
+
+    def get_text_response(self, use_cache: bool = True) -> str:
+        if not self.prompt:
+            raise ValueError("Prompt is not set. Call set_prompt() first.")
+        return self.generate(self.prompt, use_cache=use_cache)
+
+    def get_json_response(self, use_cache: bool = True) -> dict:
+        if not self.prompt:
+            raise ValueError("Prompt is not set. Call set_prompt() first.")
+        return self.generate(self.prompt, json=True, use_cache=use_cache)
@@ -0,0 +1,169 @@
+"""
+Requests-per-minute and tokens-per-minute budget of one LLM provider, shared
+by every call of a process to that provider.
+
+Budgets are kept in memory, so each process enforces an equal share of the
+configured budget: LLM_RATE_LIMIT_PROCESSES must be the number of processes
+making LLM calls, or together they exceed it that many times over.
+
+Callers wait in one queue per job and are served round-robin across jobs, so
+a job with many pending calls cannot starve the others. Budgets are token
+buckets refilled continuously; a rate-limited (429) response pauses all grants
+for the retry delay, so the other callers back off together instead of piling
+more failed requests onto the provider.
+"""
+
+import time
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+
+# Fairness key of the calls made by the current thread/task, usually the job id
+current_llm_job = contextvars.ContextVar("current_llm_job", default="default")
+
+
+@contextmanager
+def llm_job(job_id):
+    token = current_llm_job.set(str(job_id))
+    try:
+        yield
+    finally:
+        current_llm_job.reset(token)
+
+
+def estimate_tokens(prompt: str, completion_tokens: int = 0) -> int:
+    # ~4 characters per token for English text
+    return len(prompt) // 4 + 1 + completion_tokens
+
+
+class _Bucket:
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Requests larger than the whole budget go through once the bucket is full
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        """A budget of 0 is not enforced"""
+        self._requests = _Bucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+        self._cond = threading.Condition()
+        # Job key -> waiting tickets; the first key with waiters is served next
+        self._queues = OrderedDict()
+        self._paused_until = 0.0
+        self.granted = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0.0
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        wait = max(0.0, self._paused_until - now)
+        for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                wait = max(wait, bucket.wait_time(amount))
+        return wait
+
+    def acquire(self, tokens: int, key: str | None = None):
+        """Block until one request of ``tokens`` tokens fits in the budget"""
+        key = key or current_llm_job.get()
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._queues.setdefault(key, deque()).append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    head_key = next(iter(self._queues))
+                    if head_key == key and self._queues[key][0] is ticket:
+                        wait = self._wait_time(tokens, now)
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                    if bucket is not None:
+                        bucket.take(amount)
+                self.granted += 1
+                self.wait_seconds += time.monotonic() - started
+            finally:
+                queue = self._queues[key]
+                queue.remove(ticket)
+                if queue:
+                    # Round-robin: this job's next call waits behind the other jobs
+                    self._queues.move_to_end(key)
+                else:
+                    del self._queues[key]
+                self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Hold every grant for ``seconds``, e.g. after a 429 response"""
+        with self._cond:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "granted": self.granted,
+                "rate_limited": self.rate_limited,
+                "waiting": sum(len(queue) for queue in self._queues.values()),
+                "waiting_jobs": len(self._queues),
+                "average_wait_seconds": (
+                    round(self.wait_seconds / self.granted, 3) if self.granted else 0.0
+                ),
+                "requests_per_minute": self._requests and self._requests.capacity,
+                "tokens_per_minute": self._tokens and self._tokens.capacity,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def process_budget(budget: tuple, processes: int) -> tuple:
+    """This process's share of a (requests, tokens) per minute budget"""
+    processes = max(1, processes)
+    return tuple(max(1, value // processes) if value else 0 for value in budget)
+
+
+def get_rate_limiter(config, provider: str) -> RateLimiter | None:
+    """The process-wide limiter of a provider, or None when both budgets are 0"""
+    provider = provider.lower()
+    budget = process_budget(
+        config["LLM_RATE_LIMITS"].get(provider.upper(), (0, 0)),
+        config["LLM_RATE_LIMIT_PROCESSES"],
+    )
+    if not any(budget):
+        return None
+    with _limiters_lock:
+        key = (provider, *budget)
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(*budget)
+        return _limiters[key]
+
+
+def limiter_stats(config) -> dict:
+    """Stats of the limiter of every provider, None for unlimited providers"""
+    stats = {}
+    for provider in config["LLM_RATE_LIMITS"]:
+        limiter = get_rate_limiter(config, provider)
+        stats[provider.lower()] = limiter.stats() if limiter else None
+    return stats
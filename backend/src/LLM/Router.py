@@ -0,0 +1,212 @@
+"""
+Per-step model routing: each pipeline step (classify, format, compare, audit)
+gets its own model, with an optional model of another provider as secondary.
+
+The secondary answers when the primary fails. With hedging on, it is also
+fired when the primary has not answered within its rolling p95 latency for
+the step, and whichever returns first wins. Latencies are kept per step and
+model in the process-wide histograms of ``src.LLM.Latency``.
+"""
+
+import time
+import asyncio
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.LLM.Cache import get_llm_cache
+from src.LLM.Latency import get_latency_histogram
+from src.LLM.RateLimiter import get_rate_limiter
+
+
+STEPS = ("classify", "format", "compare", "audit")
+
+# Hedged calls run here, so the caller can wait on both models at once
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+class RoutedModel:
+    """
+    The model of one step. Exposes ``generate``/``agenerate`` like a model,
+    so features use it as their ``ai_model``.
+    """
+
+    def __init__(
+        self,
+        step: str,
+        primary,
+        secondary=None,
+        hedge: bool = False,
+        percentile: float = 95,
+        min_samples: int = 20,
+    ):
+        self.step = step
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge = hedge
+        self.percentile = percentile
+        self.min_samples = min_samples
+
+    @property
+    def model_name(self) -> str:
+        return self.primary.model_name
+
+    def hedge_delay(self) -> float | None:
+        """Seconds to wait for the primary before firing the secondary"""
+        if not self.hedge or self.secondary is None:
+            return None
+        histogram = get_latency_histogram(self.step, self.primary.model_name)
+        return histogram.percentile(self.percentile, self.min_samples)
+
+    def _timed(self, model, prompt: str, kwargs: dict):
+        start = time.monotonic()
+        response = model.generate(prompt, **kwargs)
+        elapsed = time.monotonic() - start
+        get_latency_histogram(self.step, model.model_name).observe(elapsed)
+        return response
+
+    async def _atimed(self, model, prompt: str, kwargs: dict):
+        start = time.monotonic()
+        response = await model.agenerate(prompt, **kwargs)
+        elapsed = time.monotonic() - start
+        get_latency_histogram(self.step, model.model_name).observe(elapsed)
+        return response
+
+    def _submit(self, model, prompt: str, kwargs: dict):
+        # In a copy of this context, so the call keeps the job's limiter queue
+        return _executor.submit(
+            contextvars.copy_context().run, self._timed, model, prompt, kwargs
+        )
+
+    def _log_fallback(self, reason) -> None:
+        print(
+            f"[Router] {self.step}: {self.primary.model_name} {reason}, "
+            f"firing {self.secondary.model_name}"
+        )
+
+    def generate(self, prompt: str, **kwargs):
+        # Cache hits are instant; they must not shrink the latency thresholds
+        cached = self.primary.cached_response(prompt, **kwargs)
+        if cached is not None:
+            return cached
+        if self.secondary is None:
+            return self._timed(self.primary, prompt, kwargs)
+
+        delay = self.hedge_delay()
+        if delay is None:
+            try:
+                return self._timed(self.primary, prompt, kwargs)
+            except Exception as e:
+                self._log_fallback(f"failed ({e})")
+                return self._timed(self.secondary, prompt, kwargs)
+
+        primary = self._submit(self.primary, prompt, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done and primary.exception() is None:
+            return primary.result()
+        self._log_fallback(
+            f"failed ({primary.exception()})" if done else f"slower than {delay:.1f}s"
+        )
+        # A slow primary keeps running; the first good answer is taken
+        pending = {primary, self._submit(self.secondary, prompt, kwargs)} - done
+        error = primary.exception() if done else None
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def agenerate(self, prompt: str, **kwargs):
+        cached = self.primary.cached_response(prompt, **kwargs)
+        if cached is not None:
+            return cached
+        if self.secondary is None:
+            return await self._atimed(self.primary, prompt, kwargs)
+
+        delay = self.hedge_delay()
+        if delay is None:
+            try:
+                return await self._atimed(self.primary, prompt, kwargs)
+            except Exception as e:
+                self._log_fallback(f"failed ({e})")
+                return await self._atimed(self.secondary, prompt, kwargs)
+
+        primary = asyncio.ensure_future(self._atimed(self.primary, prompt, kwargs))
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done and primary.exception() is None:
+            return primary.result()
+        self._log_fallback(
+            f"failed ({primary.exception()})" if done else f"slower than {delay:.1f}s"
+        )
+        secondary = asyncio.ensure_future(
+            self._atimed(self.secondary, prompt, kwargs)
+        )
+        pending = {primary, secondary} - done
+        error = primary.exception() if done else None
+        try:
+            while pending:
+                finished, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in finished:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+        finally:
+            # Unlike threads, the losing request can be dropped
+            for task in pending:
+                task.cancel()
+        raise error
+
+
+def build_model(spec: str, config):
+    """A model from a "provider:model name" spec, e.g. "gemini:gemini-2.5-flash" """
+    provider, _, model_name = spec.partition(":")
+    provider = provider.strip().lower()
+    settings = dict(
+        cache=get_llm_cache(config),
+        timeout=config["LLM_TIMEOUT_SECONDS"],
+        # Each provider has its own quota, so its own budget
+        limiter=get_rate_limiter(config, provider),
+    )
+    if model_name.strip():
+        settings["model_name"] = model_name.strip()
+    # Only the SDK of a configured provider is imported
+    if provider == "openai":
+        from src.LLM.Models.ChatGPT import ChatGPTAI
+
+        return ChatGPTAI(
+            connect_timeout=config["LLM_CONNECT_TIMEOUT_SECONDS"],
+            max_connections=config["LLM_MAX_CONNECTIONS"],
+            **settings,
+        )
+    if provider == "gemini":
+        from src.LLM.Models.Gemini import GeminiAI
+
+        return GeminiAI(**settings)
+    raise ValueError(f"Unknown LLM provider in {spec!r}")
+
+
+def build_step_models(config) -> dict:
+    """The ``RoutedModel`` of every step, from LLM_ROUTES"""
+    models = {}
+
+    def model(spec):
+        # Steps on the same model share its instance, and so its clients
+        if spec not in models:
+            models[spec] = build_model(spec, config)
+        return models[spec]
+
+    routes = {}
+    for step in STEPS:
+        primary, secondary = config["LLM_ROUTES"][step.upper()]
+        routes[step] = RoutedModel(
+            step,
+            model(primary),
+            model(secondary) if secondary else None,
+            hedge=config["LLM_HEDGING"],
+            percentile=config["LLM_HEDGE_PERCENTILE"],
+            min_samples=config["LLM_HEDGE_MIN_SAMPLES"],
+        )
+    return routes
@@ -0,0 +1,75 @@
+"""
+JSON schemas for structured LLM outputs, and validation of the responses.
+
+Only the subset of JSON Schema the schemas below use is validated: objects
+with properties/required/additionalProperties, string and null types, enum
+and anyOf. Schemas are built in the strict form structured outputs require
+(every property required, no additional properties).
+"""
+
+import json
+import hashlib
+
+
+class SchemaRejected(Exception):
+    """The provider refused a request for its response schema (HTTP 400)"""
+
+
+def fields_schema(fields: list[str]) -> dict:
+    """An object with one nullable string property per field"""
+    return {
+        "type": "object",
+        "properties": {name: {"type": ["string", "null"]} for name in fields},
+        "required": list(fields),
+        "additionalProperties": False,
+    }
+
+
+def schema_key(schema: dict) -> str:
+    payload = json.dumps(schema, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+_TYPES = {
+    "object": dict,
+    "string": str,
+    "null": type(None),
+    "array": list,
+    "boolean": bool,
+    "number": (int, float),
+    "integer": int,
+}
+
+
+def validate(data, schema: dict, path: str = "$") -> None:
+    """Raise ValueError when ``data`` does not follow ``schema``"""
+    if "anyOf" in schema:
+        errors = []
+        for option in schema["anyOf"]:
+            try:
+                validate(data, option, path)
+                return
+            except ValueError as e:
+                errors.append(str(e))
+        raise ValueError(f"{path}: matches none of the allowed schemas ({errors})")
+
+    allowed = schema.get("type")
+    if allowed is not None:
+        allowed = allowed if isinstance(allowed, list) else [allowed]
+        if not any(isinstance(data, _TYPES[name]) for name in allowed):
+            raise ValueError(f"{path}: expected {allowed}, got {type(data).__name__}")
+    if "enum" in schema and data not in schema["enum"]:
+        raise ValueError(f"{path}: {data!r} is not one of {schema['enum']}")
+
+    if isinstance(data, dict):
+        properties = schema.get("properties", {})
+        missing = [name for name in schema.get("required", []) if name not in data]
+        if missing:
+            raise ValueError(f"{path}: missing {missing}")
+        if schema.get("additionalProperties") is False:
+            extra = [name for name in data if name not in properties]
+            if extra:
+                raise ValueError(f"{path}: unexpected {extra}")
+        for name, value in data.items():
+            if name in properties:
+                validate(value, properties[name], f"{path}.{name}")
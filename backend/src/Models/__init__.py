@@ -1,8 +1,9 @@
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timezone
-from sqlalchemy.dialects.sqlite import JSON  # for issues list
 from flask_login import UserMixin
-from sqlalchemy import event
+from flask_migrate import stamp, upgrade
+from sqlalchemy import event, inspect
 from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
@@ -11,11 +12,34 @@ db = SQLAlchemy()
 # --- Enable SQLite foreign keys ---
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
+    # DATABASE_URL may point at another database, e.g. PostgreSQL
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
     cursor.close()
 
 
+# First revision of migrations/: the tables of databases that predate it
+BASELINE_REVISION = "4c1f0a9e2b71"
+
+
+def upgrade_database():
+    """
+    Bring the database up to the latest migration; safe to run on every
+    start. A new database is created from the models and stamped at the
+    latest revision, and one created by ``db.create_all()`` before
+    migrations existed is stamped at the baseline first. Call inside an app
+    context.
+    """
+    tables = inspect(db.engine).get_table_names()
+    if "alembic_version" not in tables:
+        if "jobs" not in tables:
+            db.create_all()
+            stamp()
+            return
+        stamp(revision=BASELINE_REVISION)
+    upgrade()
 
 
 class User(db.Model, UserMixin):
@@ -36,6 +60,12 @@ class User(db.Model, UserMixin):
 
 class Job(db.Model):
     __tablename__ = "jobs"
+    __table_args__ = (
+        # Job listing: keyset pages, status filter and incremental sync per user
+        db.Index("ix_jobs_user_created", "user_id", "created_at"),
+        db.Index("ix_jobs_user_status", "user_id", "status"),
+        db.Index("ix_jobs_user_updated", "user_id", "updated_at"),
+    )
 
     id = db.Column(db.String, primary_key=True)  # UUID or custom ID
     case_number = db.Column(db.String, nullable=False)
@@ -46,6 +76,12 @@ class Job(db.Model):
         db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
     feature = db.Column(db.String, nullable=False)
+    # Any change of the row, e.g. its status; drives ``since=`` job listings
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
 
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
 
@@ -60,6 +96,19 @@ class Job(db.Model):
         lazy=True,
         cascade="all, delete-orphan",
     )
+    queue_entry = db.relationship(
+        "QueuedJob",
+        backref="job",
+        uselist=False,
+        lazy=True,
+        cascade="all, delete-orphan",
+    )
+    checkpoints = db.relationship(
+        "JobCheckpoint", backref="job", lazy=True, cascade="all, delete-orphan"
+    )
+    document_results = db.relationship(
+        "DocumentAuditResult", backref="job", lazy=True, cascade="all, delete-orphan"
+    )
 
 
 class AuditResult(db.Model):
@@ -69,11 +118,53 @@ class AuditResult(db.Model):
     job_id = db.Column(db.String, db.ForeignKey("jobs.id"), nullable=False)
 
     accuracy = db.Column(db.String, nullable=True)
-    issues = db.Column(JSON, nullable=True)
+    issues = db.Column(db.JSON, nullable=True)
     completed_at = db.Column(
         db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
     error = db.Column(db.Text, nullable=True)
+    # Pages left out of OCR as blank, as [{"file": name, "page": number}]
+    skipped_pages = db.Column(db.JSON, nullable=True)
+    # Completed job with the same files and feature whose result this copies;
+    # no foreign key, so that job can still be deleted
+    reused_from_job_id = db.Column(db.String, nullable=True)
+
+
+class DocumentAuditResult(db.Model):
+    """
+    Result for one document of a job (general audit), or for one pair of its
+    documents (cross-check); the job's AuditResult combines them.
+    """
+
+    __tablename__ = "document_audit_results"
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String, db.ForeignKey("jobs.id"), nullable=False)
+    upload_id = db.Column(db.Integer, db.ForeignKey("uploads.id"), nullable=False)
+    # The second document of a cross-check pair
+    other_upload_id = db.Column(db.Integer, db.ForeignKey("uploads.id"), nullable=True)
+
+    accuracy = db.Column(db.String, nullable=True)
+    issues = db.Column(db.JSON, nullable=True)
+    completed_at = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+
+class DeletedJob(db.Model):
+    """Tombstone of a deleted job, so that ``since=`` listings report it"""
+
+    __tablename__ = "deleted_jobs"
+    __table_args__ = (
+        db.Index("ix_deleted_jobs_user_deleted", "user_id", "deleted_at"),
+    )
+
+    job_id = db.Column(db.String, primary_key=True)
+    # No foreign keys: the job is gone, and the tombstone is pruned on its own
+    user_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
 
 
 class Upload(db.Model):
@@ -81,7 +172,111 @@ class Upload(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     permanent_file_name = db.Column(db.String, nullable=False)
-    file_path = db.Column(db.String, nullable=False)
+    # Content-addressed blob, shared by every upload of the same file
+    file_path = db.Column(db.String, nullable=False, index=True)
+    # SHA-256 of the file, to find earlier submissions of the same files
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
 
     job_id = db.Column(db.String, db.ForeignKey("jobs.id"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+
+    checkpoints = db.relationship(
+        "JobCheckpoint", backref="upload", lazy=True, cascade="all, delete-orphan"
+    )
+    standardized_document = db.relationship(
+        "StandardizedDocument",
+        backref="upload",
+        uselist=False,
+        lazy=True,
+        cascade="all, delete-orphan",
+    )
+
+
+class StandardizedDocument(db.Model):
+    """OCR pages, type and fields of an upload, reused for every upload of its file"""
+
+    __tablename__ = "standardized_documents"
+
+    id = db.Column(db.Integer, primary_key=True)
+    upload_id = db.Column(
+        db.Integer, db.ForeignKey("uploads.id"), nullable=False, unique=True
+    )
+    document_type = db.Column(db.String, nullable=False)
+    pages = db.Column(db.JSON, nullable=False)
+    parsed_content = db.Column(db.JSON, nullable=True)
+    # Numbers of the file's pages OCR skipped as blank
+    blank_pages = db.Column(db.JSON, nullable=True)
+    # Formatting model, and the version of the prompts and fields it ran with
+    model_name = db.Column(db.String, nullable=True)
+    prompt_version = db.Column(db.String, nullable=False)
+    created_at = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+
+def record_failure(session, job, error: str) -> AuditResult:
+    """Mark ``job`` failed with ``error``, replacing any result it already has"""
+    session.query(AuditResult).filter_by(job_id=job.id).delete()
+    audit = AuditResult(job_id=job.id, error=error)
+    session.add(audit)
+    job.status = "failed"
+    return audit
+
+
+def copy_standardized(row: StandardizedDocument, upload_id) -> StandardizedDocument:
+    """A copy of a stored document for another upload of the same file"""
+    return StandardizedDocument(
+        upload_id=upload_id,
+        document_type=row.document_type,
+        pages=row.pages,
+        parsed_content=row.parsed_content,
+        blank_pages=row.blank_pages,
+        model_name=row.model_name,
+        prompt_version=row.prompt_version,
+        created_at=row.created_at,
+    )
+
+
+class QueuedJob(db.Model):
+    """Durable queue entry; a row lives until a worker has finished the job"""
+
+    __tablename__ = "job_queue"
+
+    job_id = db.Column(db.String, db.ForeignKey("jobs.id"), primary_key=True)
+    enqueued_at = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    claimed_by = db.Column(db.String, nullable=True)
+    heartbeat_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+
+
+class JobCheckpoint(db.Model):
+    """Output of a completed pipeline stage, used to resume interrupted jobs"""
+
+    __tablename__ = "job_checkpoints"
+    __table_args__ = (db.UniqueConstraint("job_id", "upload_id", "stage"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String, db.ForeignKey("jobs.id"), nullable=False)
+    # None for job-level stages (audit)
+    upload_id = db.Column(db.Integer, db.ForeignKey("uploads.id"), nullable=True)
+    stage = db.Column(db.String, nullable=False)
+    data = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+
+class SocketEvent(db.Model):
+    """Socket.IO event emitted by a worker process, relayed by the web process"""
+
+    __tablename__ = "socket_events"
+
+    id = db.Column(db.Integer, primary_key=True)
+    event = db.Column(db.String, nullable=False)
+    room = db.Column(db.String, nullable=True)
+    data = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
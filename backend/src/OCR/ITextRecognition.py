@@ -6,3 +6,7 @@ class ITextRecognition(ABC):
     @abstractmethod
     def get_recognized_texts(self, page: Page):
         pass
+
+    def get_recognized_texts_batch(self, pages: list, batch_size: int = 4) -> list:
+        """Recognized texts for many page images, in input order"""
+        return [self.get_recognized_texts(page) for page in pages]
@@ -40,6 +40,28 @@ class PaddleOCRTextRecognition(ITextRecognition):
             )
         raise ValueError("No recognized texts generated.")
 
+    def get_recognized_texts_batch(
+        self, pages: list[NDArray], batch_size: int = 4
+    ) -> list[list[Tuple]]:
+        # One predict() call runs detection and recognition over a whole batch
+        recognized = []
+        for start in range(0, len(pages), batch_size):
+            batch = pages[start : start + batch_size]
+            results = self._model.predict(batch)
+            if len(results) != len(batch):
+                raise ValueError("No recognized texts generated.")
+            recognized.extend(
+                list(
+                    zip(
+                        result["rec_texts"],
+                        result["rec_boxes"],
+                        result["rec_scores"],
+                    )
+                )
+                for result in results
+            )
+        return recognized
+
     def set_model(self, **kwargs) -> None:
         # change or add model instance specifications e.g. lang=en -> ch
         self._model = PaddleOCR(**kwargs)
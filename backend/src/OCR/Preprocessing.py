@@ -0,0 +1,167 @@
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+
+# Longest side of the thumbnail used for the blank and skew checks
+_ANALYSIS_SIZE = 1000
+# Inked blobs at least this wide or tall in the thumbnail (about a letter of
+# small print) make a page non-blank however little ink it has in total
+_MIN_MARK_PIXELS = 8
+
+
+@dataclass
+class PreprocessRecord:
+    """What preprocessing did to one page image"""
+
+    blank: bool = False
+    ink_ratio: float = 0.0
+    scale: float = 1.0
+    skew_angle: float = 0.0
+    binarized: bool = False
+    # Affine transform from rendered page pixels to preprocessed image pixels
+    matrix: np.ndarray = field(
+        default_factory=lambda: np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    )
+
+    @property
+    def key(self) -> str:
+        # Identifies the transform, since the OCR boxes are mapped back through it
+        return f"{self.scale:.4f},{self.skew_angle:.2f},{self.binarized}"
+
+    def map_box_back(self, box) -> np.ndarray:
+        """Map an ``[x_min, y_min, x_max, y_max]`` box onto the rendered page"""
+        x_min, y_min, x_max, y_max = (float(v) for v in box)
+        corners = np.array(
+            [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+        )
+        inverse = cv2.invertAffineTransform(self.matrix)
+        mapped = corners @ inverse[:, :2].T + inverse[:, 2]
+        x_min, y_min = np.maximum(mapped.min(axis=0), 0)
+        x_max, y_max = mapped.max(axis=0)
+        return np.array([x_min, y_min, x_max, y_max], dtype=np.int32)
+
+    def as_dict(self) -> dict:
+        return {
+            "blank": self.blank,
+            "ink_ratio": round(self.ink_ratio, 5),
+            "scale": round(self.scale, 4),
+            "skew_angle": round(self.skew_angle, 2),
+            "binarized": self.binarized,
+        }
+
+
+def _thumbnail(gray: np.ndarray) -> np.ndarray:
+    factor = _ANALYSIS_SIZE / max(gray.shape)
+    if factor >= 1:
+        return gray
+    return cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+
+def _ink_mask(gray: np.ndarray) -> np.ndarray:
+    # Anything clearly darker than the paper counts as ink, so faint scanner
+    # noise and the grey tint of recycled paper do not
+    background = np.median(gray)
+    return gray < background - 64
+
+
+def _has_marks(ink: np.ndarray) -> bool:
+    """Whether any connected inked blob is larger than a speck of dust"""
+    count, _, stats, _ = cv2.connectedComponentsWithStats(
+        ink.astype(np.uint8), connectivity=8
+    )
+    if count <= 1:
+        return False
+    # Label 0 is the background
+    sizes = stats[1:, [cv2.CC_STAT_WIDTH, cv2.CC_STAT_HEIGHT]]
+    return bool(sizes.max() >= _MIN_MARK_PIXELS)
+
+
+def _estimate_skew(ink: np.ndarray, max_angle: float, step: float = 0.25) -> float:
+    """
+    Projection profile search: text lines give the sharpest row profile when
+    they are horizontal.
+    """
+    image = ink.astype(np.uint8) * 255
+    height, width = image.shape
+    center = (width / 2, height / 2)
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        rotation = cv2.getRotationMatrix2D(center, float(angle), 1.0)
+        rotated = cv2.warpAffine(
+            image, rotation, (width, height), flags=cv2.INTER_NEAREST
+        )
+        profile = rotated.sum(axis=1, dtype=np.float64)
+        score = float(np.sum(np.diff(profile) ** 2))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def preprocess_page(
+    image: np.ndarray,
+    target_height: int | None = None,
+    deskew: bool = False,
+    max_skew: float = 5.0,
+    blank_max_ink: float | None = None,
+    binarize: bool = False,
+) -> tuple[np.ndarray | None, PreprocessRecord]:
+    """
+    Prepare a rendered BGR page for OCR.
+
+    Pages with less than ``blank_max_ink`` of their area inked, and no mark
+    larger than a speck (a short line, a signature or a stamp is kept), are
+    reported blank and None is returned instead of an image. Otherwise the page is
+    downscaled to ``target_height`` pixels (never upscaled), rotated
+    level when ``deskew`` finds a skew of up to ``max_skew`` degrees, and
+    optionally binarized with an adaptive threshold.
+    """
+    record = PreprocessRecord()
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    thumbnail = _thumbnail(gray)
+    ink = _ink_mask(thumbnail)
+    record.ink_ratio = float(ink.mean())
+    if (
+        blank_max_ink is not None
+        and record.ink_ratio < blank_max_ink
+        and not _has_marks(ink)
+    ):
+        record.blank = True
+        return None, record
+
+    height, width = gray.shape
+    if target_height and height > target_height:
+        record.scale = target_height / height
+        image = cv2.resize(
+            image,
+            (max(1, round(width * record.scale)), target_height),
+            interpolation=cv2.INTER_AREA,
+        )
+    transform = np.diag([record.scale, record.scale, 1.0])
+
+    if deskew and max_skew > 0:
+        angle = _estimate_skew(ink, max_skew)
+        if abs(angle) >= 0.25:
+            record.skew_angle = angle
+            height, width = image.shape[:2]
+            rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+            image = cv2.warpAffine(
+                image,
+                rotation,
+                (width, height),
+                flags=cv2.INTER_LINEAR,
+                borderMode=cv2.BORDER_CONSTANT,
+                borderValue=(255, 255, 255),
+            )
+            transform = np.vstack([rotation, [0.0, 0.0, 1.0]]) @ transform
+    record.matrix = transform[:2]
+
+    if binarize:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        binary = cv2.adaptiveThreshold(
+            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15
+        )
+        image = cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
+        record.binarized = True
+    return image, record
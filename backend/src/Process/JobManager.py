@@ -1,52 +1,80 @@
-import os
+import json
 import uuid
+import base64
+import hashlib
 import traceback
-from flask import jsonify
+from functools import partial
+from datetime import datetime, timedelta, timezone
+from flask import jsonify, make_response
 from flask_login import current_user
-from werkzeug.utils import secure_filename
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import selectinload, sessionmaker
 from contextlib import contextmanager
 
-from src.Models import Job as JobModel, Upload, db
+from src.Models import (
+    Job as JobModel,
+    AuditResult,
+    DeletedJob,
+    DocumentAuditResult,
+    JobCheckpoint,
+    Upload,
+    copy_standardized,
+    db,
+)
+from src.Process.JobQueue import DatabaseJobQueue, RQJobQueue
+from src.Process.WorkerPool import WorkerPool
+from src.Process.Recognition import get_ocr_cache
+from src.LLM.Cache import get_llm_cache
+from src.LLM.RateLimiter import limiter_stats
+from src.LLM.Latency import latency_stats
+from src.Socket.Relay import start_event_relay
 
-from src.Process.Worker import Worker
-
-import threading
-
-import queue
-
-
-from src.Helpers.date_formats import to_utc_iso
-
-
-worker = Worker()
+from src.Helpers.date_formats import from_utc_iso, to_utc_iso
+from src.Helpers.UploadStorage import UploadStorage
 
 
 class Jobs:
-    def __init__(self, app, socketio, queue=queue.Queue()):
+    def __init__(self, app, socketio, job_queue=None):
         self.app = app
         self.socketio = socketio
-        self.queue = queue
+        self.pool = None
+        self.storage = UploadStorage(app.config["UPLOAD_FOLDER"])
+        broker_url = app.config["JOB_BROKER_URL"]
+        if job_queue is not None:
+            self.queue = job_queue
+        elif broker_url:
+            self.queue = RQJobQueue(app, broker_url)
+        else:
+            self.queue = DatabaseJobQueue(
+                app,
+                lease_seconds=app.config["JOB_LEASE_SECONDS"],
+                poll_interval=app.config["JOB_QUEUE_POLL_SECONDS"],
+                max_attempts=app.config["JOB_MAX_ATTEMPTS"],
+            )
 
         # SQLAlchemy session factory
         with app.app_context():
             self.SessionLocal = sessionmaker(bind=db.engine)
 
-        threading.Thread(target=self._worker_loop, daemon=True).start()
+        # Resume jobs interrupted by a restart before taking new ones
+        self.queue.recover()
 
-    def _worker_loop(self):
-        while True:
-            job_id, callback = self.queue.get()
-            try:
-                print(f"[WorkerLoop] Processing job {job_id}")
-                callback(job_id)
-            except Exception as e:
-                print(f"[WorkerLoop] Job {job_id} failed: {e}")
-                traceback.print_exc()
-            finally:
-                self.queue.task_done()
+        if app.config["RUN_WORKERS_IN_WEB"] and not broker_url:
+            # Imported here: OCR and the LLM SDKs are only needed when this
+            # process runs the pipeline itself
+            from src.Process.Worker import Worker
 
-    # Start worker thread
+            self.pool = WorkerPool(
+                size=app.config["JOB_WORKERS"],
+                ocr_processes=app.config["OCR_PROCESSES"],
+                job_queue=self.queue,
+                worker_factory=Worker,
+                heartbeat_interval=app.config["JOB_LEASE_SECONDS"] / 4,
+            )
+            self.pool.start()
+        elif not app.config["SOCKETIO_MESSAGE_QUEUE"]:
+            # Separate worker processes emit through the database
+            start_event_relay(app, socketio)
 
     @contextmanager
     def get_db_session(self):
@@ -71,47 +99,64 @@ class Jobs:
                 return jsonify({"error": "Missing branch or feature"}), 400
             if not files or not any(f.filename for f in files):
                 return jsonify({"error": "No files provided"}), 400
+            # Complete a resubmission of an already audited file set at once
+            reuse_results = request.form.get("reuse_results", "true").lower() == "true"
 
             job_id = str(uuid.uuid4())
-            uploaded_files = []
+            uploaded_files = [file.filename for file in files if file.filename]
+            reused = None
 
-            with self.app.app_context():
-                with self.get_db_session() as session:
-                    job_record = JobModel(
-                        id=job_id,
-                        case_number=request.form.get("case_number", "").strip(),
-                        branch=branch,
-                        status="queued",
-                        feature=feature,
-                        user_id=current_user.id,
-                        description=request.form.get("description", "").strip(),
-                    )
-                    session.add(job_record)
-                    session.flush()
-                    created_at = job_record.created_at
-
-                    # Save uploaded files
-                    for file in files:
-                        if file.filename:
-                            unique_filename = (
-                                f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
-                            )
-                            filepath = os.path.join(
-                                self.app.config["UPLOAD_FOLDER"], unique_filename
-                            )
-                            file.save(os.path.normpath(filepath))
-                            upload_record = Upload(
-                                permanent_file_name=file.filename,
-                                file_path=filepath,
-                                job_id=job_id,
-                                user_id=current_user.id,
+            # Stream and hash the files before the transaction opens
+            pending = []
+            try:
+                for file in files:
+                    if file.filename:
+                        pending.append(self.storage.receive(file))
+            except BaseException:
+                for blob in pending:
+                    self.storage.discard(blob)
+                raise
+
+            try:
+                with self.app.app_context():
+                    with self.get_db_session() as session:
+                        job_record = JobModel(
+                            id=job_id,
+                            case_number=request.form.get("case_number", "").strip(),
+                            branch=branch,
+                            status="queued",
+                            feature=feature,
+                            user_id=current_user.id,
+                            description=request.form.get("description", "").strip(),
+                        )
+                        session.add(job_record)
+                        for file_name, blob in zip(uploaded_files, pending):
+                            session.add(
+                                Upload(
+                                    permanent_file_name=file_name,
+                                    file_path=self.storage.place(blob),
+                                    content_hash=blob.content_hash,
+                                    job_id=job_id,
+                                    user_id=current_user.id,
+                                )
                             )
-                            session.add(upload_record)
-                            uploaded_files.append(file.filename)
-                    session.commit()
+                        session.flush()
+                        created_at = job_record.created_at
 
-            self.queue.put((job_id, worker.process_job))
-            print(f"[JobManager] Job {job_id} enqueued successfully.")
+                        if reuse_results:
+                            reused = self._reuse_results(session, job_record)
+                        if reused is None:
+                            self.queue.put(job_id, session=session)
+                        session.commit()
+                # Referenced now: undo a release that ran before the commit
+                for blob in pending:
+                    self.storage.finish(blob)
+            except BaseException:
+                for blob in pending:
+                    self.storage.discard(blob)
+                # Blobs this job stored first are referenced by nothing now
+                self._release_blobs([blob.path for blob in pending])
+                raise
 
             job_data = {
                 "id": job_id,
@@ -123,14 +168,114 @@ class Jobs:
                 "feature": feature,
                 "user_id": current_user.id,
             }
+            if reused is None:
+                self.queue.notify()
+                print(f"[JobManager] Job {job_id} enqueued successfully.")
+            else:
+                print(
+                    f"[JobManager] Job {job_id} completed with the result of "
+                    f"job {reused['reused_from']}"
+                )
+                job_data.update(reused)
             self._emit_new_job(job_data)
-            return jsonify({"success": "Job added successfully", "job_id": job_id}), 200
+            return (
+                jsonify(
+                    {
+                        "success": "Job added successfully",
+                        "job_id": job_id,
+                        "reused_from": reused["reused_from"] if reused else None,
+                    }
+                ),
+                200,
+            )
 
         except Exception as e:
             print(f"[JobManager] Error adding job: {e}")
             traceback.print_exc()
             return jsonify({"error": f"Failed to add job: {str(e)}"}), 500
 
+    def _find_duplicate(self, session, job):
+        """
+        The latest completed job of the same user and feature whose files
+        have exactly the hashes of ``job``'s files, or None.
+        """
+        hashes = sorted(upload.content_hash for upload in job.uploads)
+        if not hashes or None in hashes:
+            return None
+        # Jobs with the first file, found through the content hash index
+        candidates = (
+            session.query(JobModel)
+            .join(Upload, Upload.job_id == JobModel.id)
+            .join(AuditResult, AuditResult.job_id == JobModel.id)
+            .filter(
+                Upload.content_hash == hashes[0],
+                JobModel.id != job.id,
+                JobModel.user_id == job.user_id,
+                JobModel.feature == job.feature,
+                JobModel.status == "completed",
+                AuditResult.error.is_(None),
+            )
+            .order_by(JobModel.created_at.desc())
+            .all()
+        )
+        for candidate in candidates:
+            if sorted(u.content_hash for u in candidate.uploads) == hashes:
+                return candidate
+        return None
+
+    def _reuse_results(self, session, job):
+        """
+        Complete ``job`` with a copy of a duplicate job's results. Returns the
+        fields to send to the client, or None when there is no duplicate.
+        """
+        source = self._find_duplicate(session, job)
+        if source is None:
+            return None
+        result = source.audit_result
+        audit = AuditResult(
+            job_id=job.id,
+            accuracy=result.accuracy,
+            issues=result.issues,
+            skipped_pages=result.skipped_pages,
+            reused_from_job_id=source.id,
+        )
+        session.add(audit)
+        # Per-document results follow their files to this job's uploads. The
+        # uploads are paired one to one, in the same order on both sides, so
+        # a file uploaded twice keeps two distinct uploads
+        pairs = zip(
+            sorted(source.uploads, key=lambda u: (u.content_hash, u.id)),
+            sorted(job.uploads, key=lambda u: (u.content_hash, u.id)),
+        )
+        upload_map = {source_upload.id: upload.id for source_upload, upload in pairs}
+        for document_result in source.document_results:
+            other_id = document_result.other_upload_id
+            session.add(
+                DocumentAuditResult(
+                    job_id=job.id,
+                    upload_id=upload_map[document_result.upload_id],
+                    other_upload_id=upload_map[other_id] if other_id else None,
+                    accuracy=document_result.accuracy,
+                    issues=document_result.issues,
+                )
+            )
+        # The stored documents too: a re-audit of this job reads them, even
+        # once the source job is deleted
+        for upload in source.uploads:
+            stored = upload.standardized_document
+            if stored is not None:
+                session.add(copy_standardized(stored, upload_map[upload.id]))
+        job.status = "completed"
+        session.flush()
+        return {
+            "status": "completed",
+            "accuracy": audit.accuracy,
+            "issues": audit.issues,
+            "skipped_pages": audit.skipped_pages,
+            "completed_at": to_utc_iso(audit.completed_at),
+            "reused_from": source.id,
+        }
+
     def stop(self, job_id: str):
         """Mark job as canceled in DB (Redis worker will respect this)"""
         try:
@@ -157,6 +302,74 @@ class Jobs:
         except Exception as e:
             return jsonify({"error": f"Failed to cancel job: {str(e)}"}), 500
 
+    def reaudit(self, job_id: str, request):
+        """
+        Run the audit of a finished job again, optionally as the other
+        feature. The worker reuses the stored standardised documents of its
+        uploads, so only the comparison or audit stage calls the LLM.
+        """
+        try:
+            with self.app.app_context():
+                with self.get_db_session() as session:
+                    job = session.get(JobModel, job_id)
+                    if not job or job.user_id != current_user.id:
+                        return jsonify({"error": f"Job {job_id} not found."}), 400
+                    if job.status not in {"completed", "failed", "canceled"}:
+                        return (
+                            jsonify(
+                                {
+                                    "error": f"Job {job_id} is still {job.status}, cannot re-audit"
+                                }
+                            ),
+                            400,
+                        )
+                    if self.queue.is_active(job_id, session=session):
+                        # A canceled run may still be going; it would write its
+                        # result over the re-audit's
+                        return (
+                            jsonify(
+                                {
+                                    "error": f"Job {job_id} is still held by a worker, try again shortly"
+                                }
+                            ),
+                            409,
+                        )
+                    feature = request.form.get("feature", "").strip() or job.feature
+                    if feature.lower() not in {"general", "cross-check"}:
+                        return jsonify({"error": f"Unknown feature {feature}"}), 400
+                    if feature.lower() == "cross-check" and len(job.uploads) < 2:
+                        return (
+                            jsonify({"error": "Cross-check needs at least two files"}),
+                            400,
+                        )
+
+                    session.query(AuditResult).filter_by(job_id=job_id).delete()
+                    session.query(DocumentAuditResult).filter_by(
+                        job_id=job_id
+                    ).delete()
+                    session.query(JobCheckpoint).filter_by(job_id=job_id).delete()
+                    job.feature = feature
+                    job.status = "queued"
+                    self.queue.put(job_id, session=session)
+                    session.commit()
+                    job_data = {
+                        "id": job_id,
+                        "status": "queued",
+                        "feature": feature,
+                        "accuracy": None,
+                        "issues": [],
+                        "completed_at": None,
+                        "user_id": job.user_id,
+                    }
+
+            self.queue.notify()
+            print(f"[JobManager] Job {job_id} re-enqueued for a {feature} audit.")
+            self._emit_job_update(job_data)
+            return jsonify({"success": "Job re-audit queued", "job_id": job_id}), 200
+        except Exception as e:
+            traceback.print_exc()
+            return jsonify({"error": f"Failed to re-audit job: {str(e)}"}), 500
+
     def delete(self, job_id: str):
         """Delete a completed/failed/canceled job"""
         try:
@@ -175,17 +388,52 @@ class Jobs:
                             400,
                         )
                     file_paths = [u.file_path for u in job.uploads]
-                    for fp in file_paths:
-                        try:
-                            os.remove(fp)
-                        except:
-                            pass
+                    # Tombstone for ?since= listings; old ones are pruned here
+                    session.add(DeletedJob(job_id=job.id, user_id=job.user_id))
+                    session.query(DeletedJob).filter(
+                        DeletedJob.deleted_at
+                        < datetime.now(timezone.utc)
+                        - timedelta(days=self.app.config["JOBS_TOMBSTONE_DAYS"])
+                    ).delete(synchronize_session=False)
                     session.delete(job)
                     session.commit()
+                    # Files also uploaded by other jobs stay in the store
+                    self._release_blobs(file_paths)
                     return jsonify({"success": f"Job {job_id} deleted successfully"})
         except Exception as e:
             return jsonify({"error": f"Failed to delete job: {str(e)}"}), 500
 
+    def _count_references(self, path) -> int:
+        # A session of its own per count, so other processes' commits are seen
+        with self.app.app_context():
+            with self.get_db_session() as session:
+                return session.query(Upload).filter_by(file_path=path).count()
+
+    def _release_blobs(self, paths):
+        """Remove the stored files of ``paths`` no upload references anymore"""
+        for path in set(paths):
+            if self.storage.release(path, partial(self._count_references, path)):
+                print(f"[JobManager] Removed unreferenced upload {path}")
+
+    def stats(self):
+        """Queue depth and per-worker utilisation of the job pool"""
+        if self.pool:
+            stats = self.pool.stats()
+        else:
+            # Workers run in separate processes and report in their own logs
+            stats = {"queue_depth": self.queue.qsize(), "workers": []}
+        ocr_cache = get_ocr_cache(
+            self.app.config["OCR_CACHE_PATH"],
+            self.app.config["OCR_CACHE_MAX_MB"] * 1024 * 1024,
+        )
+        stats["ocr_cache"] = ocr_cache.stats() if ocr_cache else None
+        llm_cache = get_llm_cache(self.app.config)
+        stats["llm_cache"] = llm_cache.stats() if llm_cache else None
+        # Only meaningful here when the workers run in the web process
+        stats["llm_limiter"] = limiter_stats(self.app.config)
+        stats["llm_latency"] = latency_stats()
+        return jsonify(stats), 200
+
     # --- SocketIO helpers ---
     def _emit_new_job(self, job_data):
         try:
@@ -217,13 +465,118 @@ class Jobs:
         except Exception as e:
             print(f"[JobManager] Error emitting job_failed: {e}")
 
-    def get_all(self, user_id):
-        """Fetch all jobs for a user"""
+    @staticmethod
+    def _encode_cursor(job) -> str:
+        payload = json.dumps([to_utc_iso(job.created_at), job.id])
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str):
+        created_at, job_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return from_utc_iso(created_at), job_id
+
+    def _job_listing(self, session, user_id, args):
+        """
+        The query of a job listing, its order and its page size, from the
+        request ``args``:
+
+        - ``status``, ``feature``, ``branch``, ``case_number``: exact filters
+        - ``since``: only jobs changed (created, status, results) after it;
+          the first page then also lists the jobs deleted since, as
+          ``{"id": ..., "deleted": true, "updated_at": ...}``
+        - ``order``: ``asc`` (default, oldest first) or ``desc`` by created_at
+        - ``limit``: page size, and ``cursor``: X-Next-Cursor of the page before
+        """
+        query = session.query(JobModel).filter(JobModel.user_id == user_id)
+        for name in ("status", "feature", "branch", "case_number"):
+            value = args.get(name, "").strip()
+            if value:
+                query = query.filter(getattr(JobModel, name) == value)
+        if args.get("since"):
+            query = query.filter(JobModel.updated_at > from_utc_iso(args["since"]))
+
+        descending = args.get("order", "asc").lower() == "desc"
+        if args.get("cursor"):
+            created_at, job_id = self._decode_cursor(args["cursor"])
+            if descending:
+                query = query.filter(
+                    or_(
+                        JobModel.created_at < created_at,
+                        and_(JobModel.created_at == created_at, JobModel.id < job_id),
+                    )
+                )
+            else:
+                query = query.filter(
+                    or_(
+                        JobModel.created_at > created_at,
+                        and_(JobModel.created_at == created_at, JobModel.id > job_id),
+                    )
+                )
+
+        limit = int(args["limit"]) if args.get("limit") else None
+        if limit is not None:
+            limit = max(1, min(limit, self.app.config["JOBS_MAX_PAGE_SIZE"]))
+        return query, descending, limit
+
+    def get_all(self, user_id, request):
+        """
+        Jobs of a user, as a list. Pagination is opt-in (``limit``) so the
+        response stays a plain list; the next page's cursor is sent in the
+        X-Next-Cursor header. See ``_job_listing`` for the parameters.
+        """
         try:
             with self.app.app_context():
                 with self.get_db_session() as session:
-                    jobs_list = session.query(JobModel).filter_by(user_id=user_id).all()
-                    return jsonify(
+                    try:
+                        query, descending, limit = self._job_listing(
+                            session, user_id, request.args
+                        )
+                    except (ValueError, TypeError) as e:
+                        return jsonify({"error": f"Invalid job query: {e}"}), 400
+
+                    order = (JobModel.created_at, JobModel.id)
+                    if descending:
+                        order = tuple(column.desc() for column in order)
+                    query = query.order_by(*order).options(
+                        selectinload(JobModel.uploads),
+                        selectinload(JobModel.audit_result),
+                    )
+                    jobs_list = query.limit(limit + 1).all() if limit else query.all()
+                    next_cursor = None
+                    if limit and len(jobs_list) > limit:
+                        jobs_list = jobs_list[:limit]
+                        next_cursor = self._encode_cursor(jobs_list[-1])
+                    deleted = []
+                    if request.args.get("since") and not request.args.get("cursor"):
+                        deleted = (
+                            session.query(DeletedJob)
+                            .filter(
+                                DeletedJob.user_id == user_id,
+                                DeletedJob.deleted_at
+                                > from_utc_iso(request.args["since"]),
+                            )
+                            .order_by(DeletedJob.deleted_at)
+                            .all()
+                        )
+
+                    # The page only changes with its rows: repeated polls are
+                    # answered without serialising it again
+                    etag = hashlib.sha1(
+                        json.dumps(
+                            [
+                                sorted(request.args.items()),
+                                [(j.id, str(j.updated_at)) for j in jobs_list],
+                                [d.job_id for d in deleted],
+                                next_cursor,
+                            ]
+                        ).encode("utf-8")
+                    ).hexdigest()
+                    if etag in request.if_none_match:
+                        response = make_response("", 304)
+                        response.set_etag(etag)
+                        return response
+
+                    response = jsonify(
                         [
                             {
                                 "id": j.id,
@@ -231,6 +584,7 @@ class Jobs:
                                 "branch": j.branch,
                                 "status": j.status,
                                 "created_at": to_utc_iso(j.created_at),
+                                "updated_at": to_utc_iso(j.updated_at),
                                 "files": [
                                     {"permanent_file_name": u.permanent_file_name}
                                     for u in j.uploads
@@ -248,6 +602,11 @@ class Jobs:
                                 "issues": (
                                     j.audit_result.issues if j.audit_result else []
                                 ),
+                                "skipped_pages": (
+                                    j.audit_result.skipped_pages
+                                    if j.audit_result
+                                    else None
+                                ),
                                 "error": (
                                     j.error
                                     if hasattr(j, "error") and j.error
@@ -261,7 +620,19 @@ class Jobs:
                             }
                             for j in jobs_list
                         ]
+                        + [
+                            {
+                                "id": d.job_id,
+                                "deleted": True,
+                                "updated_at": to_utc_iso(d.deleted_at),
+                            }
+                            for d in deleted
+                        ]
                     )
+                    response.set_etag(etag)
+                    if next_cursor:
+                        response.headers["X-Next-Cursor"] = next_cursor
+                    return response
         except Exception as e:
             print(f"[JobManager] Error fetching jobs: {e}")
             return jsonify({"error": "Failed to fetch jobs"}), 500
@@ -0,0 +1,307 @@
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from contextlib import contextmanager
+from sqlalchemy import or_, event
+from sqlalchemy.orm import sessionmaker
+
+from src.Models import Job as JobModel, QueuedJob, db, record_failure
+
+
+class DatabaseJobQueue:
+    """
+    Durable job queue backed by the application database.
+
+    A job stays in the ``job_queue`` table from ``put`` until ``task_done``.
+    Workers claim entries with a conditional update and keep them alive with
+    ``heartbeat``; an entry whose heartbeat is older than ``lease_seconds`` is
+    considered abandoned (crashed or restarted worker) and is claimed again,
+    so the job resumes from its last checkpoint. A job abandoned after
+    ``max_attempts`` claims is marked failed instead, so a job that kills its
+    worker (segfault, OOM) does not take a slot forever; 0 means no limit.
+    """
+
+    def __init__(
+        self,
+        app,
+        lease_seconds: int = 120,
+        poll_interval: float = 2.0,
+        max_attempts: int = 3,
+    ):
+        self.app = app
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = threading.Condition()
+
+        with app.app_context():
+            self.SessionLocal = sessionmaker(bind=db.engine)
+
+    @contextmanager
+    def get_db_session(self):
+        session = self.SessionLocal()
+        try:
+            yield session
+            session.commit()
+        except:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _stale_before(self):
+        return datetime.now(timezone.utc) - timedelta(seconds=self.lease_seconds)
+
+    def put(self, job_id: str, session=None):
+        """
+        Enqueue a job. Pass ``session`` to enqueue within the caller's
+        transaction; the caller then calls ``notify`` once it has committed.
+        """
+        if session is not None:
+            session.add(QueuedJob(job_id=job_id))
+            return
+        with self.get_db_session() as own_session:
+            own_session.add(QueuedJob(job_id=job_id))
+        self.notify()
+
+    def is_active(self, job_id: str, session=None) -> bool:
+        """Whether the job is still queued, or claimed by a (possibly stale) run"""
+        if session is not None:
+            return session.get(QueuedJob, job_id) is not None
+        with self.get_db_session() as own_session:
+            return own_session.get(QueuedJob, job_id) is not None
+
+    def notify(self):
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _fail_exhausted(self, session) -> int:
+        """Fail and dequeue the abandoned jobs that used up their attempts"""
+        if not self.max_attempts:
+            return 0
+        exhausted = (
+            session.query(QueuedJob.job_id, QueuedJob.attempts)
+            .filter(
+                QueuedJob.claimed_by.isnot(None),
+                QueuedJob.heartbeat_at < self._stale_before(),
+                QueuedJob.attempts >= self.max_attempts,
+            )
+            .all()
+        )
+        failed = 0
+        for job_id, attempts in exhausted:
+            # Conditional, as another worker may fail or reclaim it meanwhile
+            deleted = (
+                session.query(QueuedJob)
+                .filter(
+                    QueuedJob.job_id == job_id,
+                    QueuedJob.heartbeat_at < self._stale_before(),
+                )
+                .delete(synchronize_session=False)
+            )
+            job = session.get(JobModel, job_id)
+            if deleted and job and job.status in {"queued", "processing"}:
+                record_failure(
+                    session,
+                    job,
+                    f"Processing stopped {attempts} times without finishing "
+                    f"(the worker crashed or was killed); giving up",
+                )
+                print(f"[JobQueue] Job {job_id} failed after {attempts} attempts")
+                failed += 1
+            session.commit()
+        return failed
+
+    def _claim(self, worker_id: str):
+        with self.get_db_session() as session:
+            self._fail_exhausted(session)
+            candidates = (
+                session.query(QueuedJob.job_id)
+                .filter(
+                    or_(
+                        QueuedJob.claimed_by.is_(None),
+                        QueuedJob.heartbeat_at < self._stale_before(),
+                    )
+                )
+                .order_by(QueuedJob.enqueued_at)
+                .limit(5)
+                .all()
+            )
+            for (job_id,) in candidates:
+                claimed = (
+                    session.query(QueuedJob)
+                    .filter(
+                        QueuedJob.job_id == job_id,
+                        or_(
+                            QueuedJob.claimed_by.is_(None),
+                            QueuedJob.heartbeat_at < self._stale_before(),
+                        ),
+                    )
+                    .update(
+                        {
+                            "claimed_by": worker_id,
+                            "heartbeat_at": datetime.now(timezone.utc),
+                            "attempts": QueuedJob.attempts + 1,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                session.commit()
+                if claimed:
+                    return job_id
+        return None
+
+    def get(self, worker_name: str = "0") -> str:
+        """Block until a job can be claimed and return its id"""
+        worker_id = f"{self.worker_prefix}:{worker_name}"
+        while True:
+            job_id = self._claim(worker_id)
+            if job_id:
+                return job_id
+            with self._wakeup:
+                self._wakeup.wait(self.poll_interval)
+
+    def heartbeat(self, job_ids: list[str]):
+        if not job_ids:
+            return
+        with self.get_db_session() as session:
+            session.query(QueuedJob).filter(QueuedJob.job_id.in_(job_ids)).update(
+                {"heartbeat_at": datetime.now(timezone.utc)},
+                synchronize_session=False,
+            )
+
+    def task_done(self, job_id: str):
+        with self.get_db_session() as session:
+            session.query(QueuedJob).filter_by(job_id=job_id).delete()
+
+    def qsize(self) -> int:
+        with self.get_db_session() as session:
+            return (
+                session.query(QueuedJob)
+                .filter(
+                    or_(
+                        QueuedJob.claimed_by.is_(None),
+                        QueuedJob.heartbeat_at < self._stale_before(),
+                    )
+                )
+                .count()
+            )
+
+    def recover(self) -> int:
+        """Re-enqueue unfinished jobs that have no queue entry"""
+        with self.get_db_session() as session:
+            self._fail_exhausted(session)
+            orphans = (
+                session.query(JobModel.id)
+                .outerjoin(QueuedJob, QueuedJob.job_id == JobModel.id)
+                .filter(
+                    JobModel.status.in_(["queued", "processing"]),
+                    QueuedJob.job_id.is_(None),
+                )
+                .all()
+            )
+            for (job_id,) in orphans:
+                session.add(QueuedJob(job_id=job_id))
+            pending = session.query(QueuedJob).count()
+        if pending:
+            print(
+                f"[JobQueue] {pending} unfinished job(s) in queue "
+                f"({len(orphans)} recovered)"
+            )
+            self.notify()
+        return pending
+
+
+RQ_QUEUE_NAME = "documents"
+
+
+class RQJobQueue:
+    """
+    Job queue on Redis through rq, for worker processes spread over several
+    hosts. Jobs are executed by ``python worker.py`` processes, which run
+    ``src.Process.Tasks.run_job``; the rq job id is the application job id.
+    redis and rq are imported here, so the web process only needs them when
+    a broker is configured.
+    """
+
+    def __init__(self, app, redis_url: str, job_timeout: int = 3600):
+        from redis import Redis
+        from rq import Queue as RQQueue
+
+        self.app = app
+        self.connection = Redis.from_url(redis_url)
+        self.rq_queue = RQQueue(
+            RQ_QUEUE_NAME, connection=self.connection, default_timeout=job_timeout
+        )
+
+        with app.app_context():
+            self.SessionLocal = sessionmaker(bind=db.engine)
+
+    def _enqueue(self, job_id: str):
+        self.rq_queue.enqueue("src.Process.Tasks.run_job", job_id, job_id=job_id)
+
+    def put(self, job_id: str, session=None):
+        """Enqueue a job; with ``session`` it is enqueued once that session commits"""
+        if session is not None:
+            event.listen(
+                session, "after_commit", lambda _: self._enqueue(job_id), once=True
+            )
+            return
+        self._enqueue(job_id)
+
+    def notify(self):
+        pass
+
+    def is_active(self, job_id: str, session=None) -> bool:
+        """Whether rq still has the job waiting or running"""
+        from rq.job import Job as RQJob, JobStatus
+        from rq.exceptions import NoSuchJobError
+
+        try:
+            status = RQJob.fetch(job_id, connection=self.connection).get_status()
+        except NoSuchJobError:
+            return False
+        return status in {
+            JobStatus.QUEUED,
+            JobStatus.STARTED,
+            JobStatus.DEFERRED,
+            JobStatus.SCHEDULED,
+        }
+
+    def qsize(self) -> int:
+        return self.rq_queue.count
+
+    def recover(self) -> int:
+        """Re-enqueue unfinished jobs that rq lost or gave up on"""
+        from rq.job import Job as RQJob, JobStatus
+        from rq.exceptions import NoSuchJobError
+
+        session = self.SessionLocal()
+        try:
+            unfinished = (
+                session.query(JobModel.id)
+                .filter(JobModel.status.in_(["queued", "processing"]))
+                .all()
+            )
+        finally:
+            session.close()
+
+        recovered = 0
+        for (job_id,) in unfinished:
+            try:
+                status = RQJob.fetch(job_id, connection=self.connection).get_status()
+            except NoSuchJobError:
+                status = None
+            if status in {
+                None,
+                JobStatus.FAILED,
+                JobStatus.STOPPED,
+                JobStatus.CANCELED,
+            }:
+                self._enqueue(job_id)
+                recovered += 1
+        if recovered:
+            print(f"[JobQueue] {recovered} unfinished job(s) re-enqueued")
+        return recovered
@@ -0,0 +1,640 @@
+"""CPU-bound stages (PDF rendering + OCR), executed inside the OCR process pool.
+
+Each pool process builds its PaddleOCR instances once (``init_recognizer``,
+or lazily per tier) and keeps them for its whole life.
+"""
+
+import queue
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from importlib import metadata
+from typing import Iterator
+
+import cv2
+import numpy as np
+import pypdfium2 as pdfium
+
+from src.Documents.Page import Page
+from src.Helpers.DiskCache import DiskCache
+from src.OCR.Preprocessing import PreprocessRecord, preprocess_page
+
+
+# OCR model setups. "fast" runs first in tiered mode; pages it reads poorly are
+# re-run with "accurate", which is also the only tier outside tiered mode.
+OCR_TIERS = {
+    "fast": dict(
+        lang="en",
+        use_textline_orientation=False,
+        text_detection_model_name="PP-OCRv5_mobile_det",
+        text_recognition_model_name="PP-OCRv5_mobile_rec",
+    ),
+    "accurate": dict(
+        lang="en",
+        use_textline_orientation=True,
+        text_detection_model_name="PP-OCRv5_server_det",
+        text_recognition_model_name="PP-OCRv5_server_rec",
+    ),
+}
+
+_recognizers = {}
+_ocr_cache = None
+
+# PDFium is not thread-safe; every call into it goes through this lock
+_pdfium_lock = threading.Lock()
+
+_END_OF_DOCUMENT = object()
+
+
+@dataclass
+class RecognitionOptions:
+    dpi: int = 200
+    grayscale: bool = False
+    prefetch: int = 1
+    # Pages with at least this many embedded characters skip OCR; None disables
+    text_layer_min_chars: int | None = None
+    cache_path: str | None = None
+    cache_max_bytes: int = 0
+    batch_size: int = 4
+    tiered: bool = False
+    # A "fast" page is re-OCR'd with "accurate" below either threshold
+    escalation_min_score: float = 0.9
+    escalation_min_density: float = 50.0  # recognized characters per megapixel
+    # Entries scoring below this are re-OCR'd from a crop rendered at
+    # ``refine_dpi``; None disables the refinement
+    refine_min_score: float | None = None
+    refine_dpi: int = 400
+    refine_max_regions: int = 20  # per page
+    # Preprocessing of rendered pages, see ``preprocess_page``
+    target_height: int | None = None
+    deskew: bool = False
+    max_skew: float = 5.0
+    blank_max_ink: float | None = None
+    binarize: bool = False
+
+    @classmethod
+    def from_config(cls, config) -> "RecognitionOptions":
+        return cls(
+            dpi=config["OCR_RENDER_DPI"],
+            grayscale=config["OCR_RENDER_GRAYSCALE"],
+            prefetch=config["OCR_PREFETCH_PAGES"],
+            text_layer_min_chars=(
+                config["TEXT_LAYER_MIN_CHARS"] if config["USE_PDF_TEXT_LAYER"] else None
+            ),
+            cache_path=config["OCR_CACHE_PATH"],
+            cache_max_bytes=config["OCR_CACHE_MAX_MB"] * 1024 * 1024,
+            batch_size=config["OCR_BATCH_SIZE"],
+            tiered=config["OCR_TIERED"],
+            escalation_min_score=config["OCR_ESCALATION_MIN_SCORE"],
+            escalation_min_density=config["OCR_ESCALATION_MIN_DENSITY"],
+            refine_min_score=config["OCR_REFINE_MIN_SCORE"] or None,
+            refine_dpi=config["OCR_REFINE_DPI"],
+            refine_max_regions=config["OCR_REFINE_MAX_REGIONS"],
+            target_height=config["OCR_TARGET_HEIGHT"] or None,
+            deskew=config["OCR_DESKEW"],
+            max_skew=config["OCR_MAX_SKEW_DEGREES"],
+            blank_max_ink=config["OCR_BLANK_MAX_INK"] or None,
+            binarize=config["OCR_BINARIZE"],
+        )
+
+
+@dataclass
+class RecognitionStats:
+    """
+    Page counts by where their recognized texts came from, and what
+    preprocessing did. ``preprocessing`` holds the record of every rendered
+    page as ``(document index, page index, record)``; it is not merged.
+    """
+
+    text_layer: int = 0
+    cached: int = 0
+    fast: int = 0
+    escalated: int = 0
+    accurate: int = 0
+    # Low-confidence regions re-OCR'd at high DPI, and how many of them improved
+    refined_regions: int = 0
+    improved_regions: int = 0
+    blank: int = 0
+    downscaled: int = 0
+    deskewed: int = 0
+    preprocessing: list = field(default_factory=list, repr=False)
+
+    def merge(self, other: "RecognitionStats") -> None:
+        for name in self._counters():
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def _counters(self) -> list[str]:
+        return [name for name in self.__dataclass_fields__ if name != "preprocessing"]
+
+    def record_preprocessing(
+        self, doc_index: int, page_index: int, record: PreprocessRecord
+    ) -> None:
+        self.preprocessing.append((doc_index, page_index, record))
+        self.blank += record.blank
+        self.downscaled += record.scale < 1
+        self.deskewed += record.skew_angle != 0
+
+    def as_dict(self) -> dict:
+        counts = {name: getattr(self, name) for name in self._counters()}
+        counts["pages"] = self.text_layer + self.cached + self.fast + self.accurate
+        counts["escalation_rate"] = (
+            round(self.escalated / self.fast, 3) if self.fast else 0.0
+        )
+        return counts
+
+
+def _get_recognizer(tier: str):
+    if tier not in _recognizers:
+        # Imported here so that only OCR processes pay for loading PaddleOCR
+        from src.OCR.PaddleTextRecognition import PaddleOCRTextRecognition
+
+        _recognizers[tier] = PaddleOCRTextRecognition(**OCR_TIERS[tier])
+    return _recognizers[tier]
+
+
+def init_recognizer():
+    _get_recognizer("accurate")
+
+
+def get_ocr_cache(path: str | None, max_bytes: int) -> DiskCache | None:
+    """The process-wide OCR result cache, or None when caching is disabled"""
+    global _ocr_cache
+    if not path or max_bytes <= 0:
+        return None
+    if _ocr_cache is None or _ocr_cache.path != path:
+        _ocr_cache = DiskCache(path, max_bytes)
+    return _ocr_cache
+
+
+def _refine_key(options: RecognitionOptions) -> str:
+    if options.refine_min_score is None:
+        return "refine:off"
+    return (
+        f"refine:{options.refine_min_score},{options.refine_dpi},"
+        f"{options.refine_max_regions},{options.dpi}"
+    )
+
+
+@lru_cache(maxsize=None)
+def _paddleocr_version() -> str:
+    try:
+        return metadata.version("paddleocr")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _tier_key(tier: str) -> str:
+    # From the tier's settings rather than its recognizer, so that a batch
+    # found entirely in the cache never loads the OCR models
+    settings = ",".join(f"{k}={v}" for k, v in sorted(OCR_TIERS[tier].items()))
+    return f"paddleocr-{_paddleocr_version()}:{settings}"
+
+
+def _setup_key(options: RecognitionOptions) -> str:
+    # Everything besides the image that determines the recognized texts
+    if not options.tiered:
+        return f"{_tier_key('accurate')}|{_refine_key(options)}"
+    return (
+        f"tiered:{_tier_key('fast')}|"
+        f"{_tier_key('accurate')}|"
+        f"{options.escalation_min_score}|{options.escalation_min_density}|"
+        f"{_refine_key(options)}"
+    )
+
+
+def _ocr_cache_key(image: np.ndarray, setup_key: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{image.shape}{image.dtype}".encode())
+    digest.update(np.ascontiguousarray(image).data)
+    digest.update(setup_key.encode())
+    return digest.hexdigest()
+
+
+def _needs_escalation(
+    recognized_texts: list[tuple], image: np.ndarray, options: RecognitionOptions
+) -> bool:
+    if not recognized_texts:
+        return True
+    megapixels = image.shape[0] * image.shape[1] / 1_000_000
+    density = sum(len(text) for text, _, _ in recognized_texts) / megapixels
+    return (
+        Page(content=recognized_texts).average_recognition_accuracy
+        < options.escalation_min_score
+        or density < options.escalation_min_density
+    )
+
+
+def _render_region(pdf, page_index: int, box, options: RecognitionOptions):
+    """Render the area of ``box`` (pixels at ``options.dpi``) at the refine DPI"""
+    padding = 4  # PDF units around the box, so glyph edges are not cut off
+    scale = options.dpi / 72
+    x_min, y_min, x_max, y_max = (float(v) / scale for v in box)
+    with _pdfium_lock:
+        page = pdf[page_index]
+        try:
+            if page.get_rotation() != 0:
+                return None
+            width, height = page.get_size()
+            crop = (
+                max(0.0, x_min - padding),
+                max(0.0, height - y_max - padding),
+                max(0.0, width - x_max - padding),
+                max(0.0, y_min - padding),
+            )
+            if crop[0] + crop[2] >= width or crop[1] + crop[3] >= height:
+                return None
+            bitmap = page.render(scale=options.refine_dpi / 72, crop=crop)
+        finally:
+            page.close()
+    return _to_ocr_image(bitmap)
+
+
+def _refine_low_confidence(
+    pages: list[list[tuple]],
+    sources: list[tuple],
+    options: RecognitionOptions,
+    stats: RecognitionStats,
+) -> None:
+    """
+    Re-OCR the low-score entries of ``pages`` (read from ``sources``, as
+    ``(pdf_path, page_index, record)``) from crops rendered at high DPI, and keep the
+    new reading of every entry whose score improves. Only the crops pay the
+    high-DPI cost, not the whole page.
+    """
+    regions = []  # (page position, entry position, crop image)
+    documents = {}
+    try:
+        for position, (recognized_texts, (pdf_path, page_index, _)) in enumerate(
+            zip(pages, sources)
+        ):
+            low = sorted(
+                (
+                    (score, entry)
+                    for entry, (_, _, score) in enumerate(recognized_texts)
+                    if score < options.refine_min_score
+                ),
+                key=lambda item: item[0],
+            )[: options.refine_max_regions]
+            if not low:
+                continue
+            if pdf_path not in documents:
+                with _pdfium_lock:
+                    documents[pdf_path] = _open_pdf(pdf_path)
+            for _, entry in low:
+                box = recognized_texts[entry][1]
+                crop = _render_region(documents[pdf_path], page_index, box, options)
+                if crop is not None:
+                    regions.append((position, entry, crop))
+    finally:
+        with _pdfium_lock:
+            for pdf in documents.values():
+                pdf.close()
+    if not regions:
+        return
+
+    recognized = _get_recognizer("accurate").get_recognized_texts_batch(
+        [crop for _, _, crop in regions], batch_size=options.batch_size
+    )
+    stats.refined_regions += len(regions)
+    for (position, entry, _), crop_texts in zip(regions, recognized):
+        if not crop_texts:
+            continue
+        # Reading order inside the crop: top to bottom, then left to right
+        crop_texts = sorted(crop_texts, key=lambda item: (item[1][1], item[1][0]))
+        text = " ".join(text for text, _, _ in crop_texts).strip()
+        score = sum(float(score) for _, _, score in crop_texts) / len(crop_texts)
+        old_text, box, old_score = pages[position][entry]
+        if text and score > old_score:
+            pages[position][entry] = (text, box, score)
+            stats.improved_regions += 1
+
+
+def _recognize_images(
+    images: list[np.ndarray],
+    sources: list[tuple],
+    cache: DiskCache | None,
+    options: RecognitionOptions,
+    stats: RecognitionStats,
+) -> list[list[tuple]]:
+    """
+    OCR a batch of page images, skipping pages found in the cache. In tiered
+    mode the batch goes through the fast models first and only the pages they
+    read poorly are run through the accurate models. Boxes are then mapped
+    back onto the rendered page through the preprocessing record of each
+    source, and low-confidence entries are refined from high-DPI crops.
+    """
+    results = [None] * len(images)
+    keys = [None] * len(images)
+    missing = []
+    setup_key = _setup_key(options) if cache is not None else None
+    for index, image in enumerate(images):
+        if cache is not None:
+            record = sources[index][2]
+            keys[index] = _ocr_cache_key(image, f"{setup_key}|{record.key}")
+            cached = cache.get(keys[index])
+            if cached is not None:
+                results[index] = [
+                    (text, np.array(box), score) for text, box, score in cached
+                ]
+                stats.cached += 1
+                continue
+        missing.append(index)
+
+    if missing and options.tiered:
+        recognized = _get_recognizer("fast").get_recognized_texts_batch(
+            [images[index] for index in missing], batch_size=options.batch_size
+        )
+        stats.fast += len(missing)
+        for index, recognized_texts in zip(missing, recognized):
+            results[index] = recognized_texts
+        to_escalate = [
+            index
+            for index in missing
+            if _needs_escalation(results[index], images[index], options)
+        ]
+        stats.escalated += len(to_escalate)
+    else:
+        to_escalate = missing
+        stats.accurate += len(missing)
+
+    if to_escalate:
+        recognized = _get_recognizer("accurate").get_recognized_texts_batch(
+            [images[index] for index in to_escalate], batch_size=options.batch_size
+        )
+        for index, recognized_texts in zip(to_escalate, recognized):
+            results[index] = recognized_texts
+
+    for index in missing:
+        record = sources[index][2]
+        results[index] = [
+            (text, record.map_box_back(box), score)
+            for text, box, score in results[index]
+        ]
+
+    if missing and options.refine_min_score is not None:
+        refined = [list(results[index]) for index in missing]
+        _refine_low_confidence(
+            refined, [sources[index] for index in missing], options, stats
+        )
+        for index, recognized_texts in zip(missing, refined):
+            results[index] = recognized_texts
+
+    if cache is not None:
+        for index in missing:
+            cache.set(keys[index], Page(content=results[index]).to_json())
+    return results
+
+
+def _extract_text_layer(page, dpi: int, min_chars: int) -> list[tuple] | None:
+    """
+    Read the embedded text of a digital PDF page in PaddleOCR's
+    ``(text, box, score)`` shape, with boxes in pixels of a ``dpi`` rendering.
+    Returns None when the page has no usable text and must be OCR'd.
+    """
+    if page.get_rotation() != 0:
+        return None
+
+    scale = dpi / 72
+    crop_left, _, _, crop_top = page.get_cropbox()
+    textpage = page.get_textpage()
+    try:
+        if textpage.count_chars() < min_chars:
+            return None
+
+        content = []
+        for index in range(textpage.count_rects()):
+            left, bottom, right, top = textpage.get_rect(index)
+            text = textpage.get_text_bounded(left, bottom, right, top).strip()
+            if not text:
+                continue
+            box = np.array(
+                [
+                    (left - crop_left) * scale,
+                    (crop_top - top) * scale,
+                    (right - crop_left) * scale,
+                    (crop_top - bottom) * scale,
+                ],
+                dtype=np.int32,
+            )
+            content.append((text, box, 1.0))
+    finally:
+        textpage.close()
+
+    if sum(len(text.replace(" ", "")) for text, _, _ in content) < min_chars:
+        return None
+    return content
+
+
+def _form_widgets(page) -> tuple[int, bool]:
+    """Number of form field widgets on the page, and whether all have appearances"""
+    widgets, drawn = 0, True
+    for index in range(pdfium.raw.FPDFPage_GetAnnotCount(page)):
+        annot = pdfium.raw.FPDFPage_GetAnnot(page, index)
+        try:
+            if pdfium.raw.FPDFAnnot_GetSubtype(annot) != pdfium.raw.FPDF_ANNOT_WIDGET:
+                continue
+            widgets += 1
+            # Length in bytes of the UTF-16 appearance stream, 2 when empty
+            length = pdfium.raw.FPDFAnnot_GetAP(
+                annot, pdfium.raw.FPDF_ANNOT_APPEARANCEMODE_NORMAL, None, 0
+            )
+            drawn = drawn and length > 2
+        finally:
+            pdfium.raw.FPDFPage_CloseAnnot(annot)
+    return widgets, drawn
+
+
+def _open_pdf(pdf_path) -> pdfium.PdfDocument:
+    # Call with _pdfium_lock held. Forms are initialised before any page is
+    # loaded, so renders draw the values of filled-in form fields
+    pdf = pdfium.PdfDocument(pdf_path)
+    pdf.init_forms()
+    return pdf
+
+
+def _read_page(pdf, index: int, dpi: int, grayscale: bool, text_layer_min_chars):
+    """
+    Returns ``(image, None, width)`` to OCR or ``(None, content, width)`` from
+    the text layer, ``width`` being the page width in pixels at ``dpi``
+    """
+    with _pdfium_lock:
+        page = pdf[index]
+        width = page.get_width() * dpi / 72
+        try:
+            if text_layer_min_chars is not None:
+                # The values of a filled-in form are not in the page content,
+                # only in its widgets: flatten them into it first, or OCR the
+                # page when a widget has no appearance to flatten
+                widgets, drawn = _form_widgets(page)
+                use_text_layer = drawn
+                if widgets and drawn:
+                    flattened = pdfium.raw.FPDFPage_Flatten(
+                        page, pdfium.raw.FLAT_NORMALDISPLAY
+                    )
+                    use_text_layer = flattened != pdfium.raw.FLATTEN_FAIL
+                    # The page must be reloaded to see its new contents
+                    page.close()
+                    page = pdf[index]
+                if use_text_layer:
+                    content = _extract_text_layer(page, dpi, text_layer_min_chars)
+                    if content:
+                        return None, content, width
+            bitmap = page.render(scale=dpi / 72, grayscale=grayscale)
+        finally:
+            page.close()
+    return _to_ocr_image(bitmap), None, width
+
+
+def _to_ocr_image(bitmap) -> np.ndarray:
+    # View on the Python-owned bitmap buffer (BGR, as PaddleOCR expects)
+    image = bitmap.to_numpy()
+    if image.ndim == 3 and image.shape[2] == 1:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image
+
+
+def stream_pages(
+    pdf_path,
+    dpi: int = 200,
+    grayscale: bool = False,
+    prefetch: int = 1,
+    text_layer_min_chars: int | None = None,
+    preprocess: dict | None = None,
+) -> Iterator[tuple]:
+    """
+    Yield the pages of a PDF one at a time as
+    ``(image, text_layer, record, width)``, ``width`` in pixels at ``dpi``.
+
+    A background thread renders ahead of the consumer into a buffer of at most
+    ``prefetch`` pages, so page N+1 is rendered while page N is being OCR'd
+    and memory stays constant in the page count. With
+    ``text_layer_min_chars`` set, pages whose embedded text layer has at least
+    that many characters are not rendered: ``image`` is None and
+    ``text_layer`` holds the recognized texts.
+
+    Rendered pages go through ``preprocess_page`` with the ``preprocess``
+    keyword arguments on the render thread as well; ``record`` says what it
+    did (None for text layer pages), and ``image`` is None for blank pages.
+    """
+    buffer = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def render():
+        try:
+            with _pdfium_lock:
+                pdf = _open_pdf(pdf_path)
+                page_count = len(pdf)
+            try:
+                for index in range(page_count):
+                    if stop.is_set():
+                        break
+                    image, content, width = _read_page(
+                        pdf, index, dpi, grayscale, text_layer_min_chars
+                    )
+                    record = None
+                    if image is not None:
+                        image, record = preprocess_page(image, **(preprocess or {}))
+                    put((image, content, record, width))
+            finally:
+                with _pdfium_lock:
+                    pdf.close()
+            put(_END_OF_DOCUMENT)
+        except Exception as e:
+            put(e)
+
+    renderer = threading.Thread(target=render, name="pdf-render", daemon=True)
+    renderer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END_OF_DOCUMENT:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Let the renderer finish its current page and release what it buffered
+        stop.set()
+        renderer.join()
+        while not buffer.empty():
+            buffer.get_nowait()
+
+
+def recognize_documents(
+    pdf_paths: list, options: RecognitionOptions | None = None
+) -> tuple[list[list[Page]], RecognitionStats]:
+    """
+    Return the recognized pages of each PDF, and where they came from. Pages
+    are taken from the embedded text layer when usable, otherwise rendered and
+    OCR'd, unless the OCR cache already holds the result for an identical page
+    image.
+
+    Pages to OCR are batched across all the PDFs, ``batch_size`` at a time, so
+    PaddleOCR runs detection and recognition over several pages per call.
+    Blank pages are left out of the returned documents.
+    """
+    options = options or RecognitionOptions()
+    cache = get_ocr_cache(options.cache_path, options.cache_max_bytes)
+    stats = RecognitionStats()
+
+    documents = [[] for _ in pdf_paths]
+    # (document index, slot in the document, page index in the PDF, image, record,
+    # page width)
+    batch = []
+    batch_size = max(1, options.batch_size)
+    preprocess = dict(
+        target_height=options.target_height,
+        deskew=options.deskew,
+        max_skew=options.max_skew,
+        blank_max_ink=options.blank_max_ink,
+        binarize=options.binarize,
+    )
+
+    def flush():
+        images = [image for _, _, _, image, _, _ in batch]
+        sources = [
+            (pdf_paths[doc_index], page_index, record)
+            for doc_index, _, page_index, _, record, _ in batch
+        ]
+        recognized = _recognize_images(images, sources, cache, options, stats)
+        for (doc_index, slot, _, _, _, width), recognized_texts in zip(
+            batch, recognized
+        ):
+            documents[doc_index][slot] = Page(content=recognized_texts, width=width)
+        batch.clear()
+
+    for doc_index, pdf_path in enumerate(pdf_paths):
+        for page_index, (image, text_layer, record, width) in enumerate(
+            stream_pages(
+                pdf_path,
+                options.dpi,
+                options.grayscale,
+                options.prefetch,
+                options.text_layer_min_chars,
+                preprocess,
+            )
+        ):
+            if text_layer is not None:
+                documents[doc_index].append(Page(content=text_layer, width=width))
+                stats.text_layer += 1
+                continue
+            stats.record_preprocessing(doc_index, page_index, record)
+            if record.blank:
+                continue
+            documents[doc_index].append(None)
+            slot = len(documents[doc_index]) - 1
+            batch.append((doc_index, slot, page_index, image, record, width))
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    return documents, stats
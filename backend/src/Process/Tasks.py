@@ -0,0 +1,17 @@
+"""Entry points executed by rq workers (see ``worker.py``)."""
+
+from src.flask_config import app
+from src.Socket import socketio
+from src.Socket.Relay import get_worker_emitter
+from src.Process.Worker import Worker
+
+
+_worker = None
+
+
+def run_job(job_id):
+    # One Worker per process, so OCR models and LLM clients stay loaded between jobs
+    global _worker
+    if _worker is None:
+        _worker = Worker(emitter=get_worker_emitter(app, socketio))
+    _worker.process_job(job_id)
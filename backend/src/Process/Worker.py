@@ -1,20 +1,44 @@
-from pdf2image import convert_from_path
-import numpy as np
 import traceback
+import contextvars
+from itertools import combinations
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker, joinedload
 from contextlib import contextmanager
-from src.Models import Job as JobModel, AuditResult, db
+from src.Models import (
+    Job as JobModel,
+    AuditResult,
+    DocumentAuditResult,
+    JobCheckpoint,
+    StandardizedDocument,
+    Upload,
+    copy_standardized,
+    db,
+    record_failure,
+)
 from src.Documents.Page import Page
-from src.OCR.PaddleTextRecognition import PaddleOCRTextRecognition
-from src.Features.Classification import DocumentClassification
-from src.LLM.Models.ChatGPT import ChatGPTAI
-from src.LLM.Models.Gemini import GeminiAI
+from src.Documents.Layout import prompt_size_report
+from src.Process.Recognition import RecognitionOptions, recognize_documents
+from src.Features.Classification import (
+    DocumentClassification,
+    LocalDocumentClassifier,
+)
+from src.LLM.RateLimiter import llm_job
+from src.LLM.Router import STEPS, build_step_models
+from src.LLM.Schema import SchemaRejected
 
-from src.Documents.DocumentFormatting.DeathCertificate import DeathCertificate
-from src.Documents.DocumentFormatting.DRW import DeathRegistrationWorksheet
+from src.Documents.DocumentFormatting import DOCUMENT_TYPES
 from src.Features.Formatter import DocumentFormatter
+from src.Features.LocalExtraction import FieldExtractor
+from src.Features.Standardization import (
+    DocumentStandardizer,
+    standardization_version,
+)
 from src.Features.Comparison import DocumentComparison
+from src.Features.CrossCheck import CrossChecker
 from src.Features.General import GeneralAudit
+from src.Features.Results import combine_results
 from src.Helpers.date_formats import to_utc_iso
 
 from src.flask_config import app
@@ -22,20 +46,73 @@ from src.Socket import socketio
 
 
 class Worker:
-    def __init__(self, ai_model=None, poppler_path=None):
+    def __init__(self, ai_model=None, pool=None, emitter=None):
         self.app = app
-        self.ai = ai_model or ChatGPTAI()
-        self.formatter = DocumentFormatter(self.ai)
-        self.comparer = DocumentComparison(self.ai)
-        self.classifier = DocumentClassification(self.ai)
-        self.general_audit = GeneralAudit(self.ai)
-        self.ocr = PaddleOCRTextRecognition()
-        self.socketio = socketio
-        self.poppler_path = poppler_path
+        # One model for every step when given, else the configured routes
+        if ai_model is not None:
+            self.models = {step: ai_model for step in STEPS}
+        else:
+            self.models = build_step_models(app.config)
+        self.formatter = self._build_feature(
+            DocumentFormatter,
+            group_size=app.config["FORMATTING_GROUP_SIZE"],
+            max_parallel=app.config["FORMATTING_MAX_PARALLEL"],
+            extractor=FieldExtractor() if app.config["LOCAL_EXTRACTION"] else None,
+        )
+        self.comparer = self._build_feature(
+            DocumentComparison,
+            checker=CrossChecker() if app.config["LOCAL_CROSS_CHECK"] else None,
+        )
+        self.classifier = self._build_feature(
+            DocumentClassification,
+            local_classifier=(
+                LocalDocumentClassifier(
+                    min_margin=app.config["LOCAL_CLASSIFICATION_MIN_MARGIN"]
+                )
+                if app.config["LOCAL_CLASSIFICATION"]
+                else None
+            ),
+        )
+        self.standardizer = (
+            self._build_feature(DocumentStandardizer, formatter=self.formatter)
+            if app.config["STANDARDIZATION_MODE"] == "combined"
+            else None
+        )
+        self.general_audit = self._build_feature(GeneralAudit)
+        # Anything with socketio's emit(event, data, room=...) signature
+        self.socketio = emitter or socketio
+        self.recognition_options = RecognitionOptions.from_config(app.config)
+        # WorkerPool that owns the OCR process pool; OCR runs inline without it
+        self.pool = pool
+        self.standardization_version = standardization_version()
+        # Documents of one job standardised/audited at the same time
+        self.max_parallel = max(1, app.config["DOCUMENT_MAX_PARALLEL"])
+        self.stage = None
 
         with app.app_context():
             self.SessionLocal = sessionmaker(bind=db.engine)
 
+    def _build_feature(self, feature_class, **kwargs):
+        use_cache = feature_class.name not in self.app.config["LLM_CACHE_OPT_OUT"]
+        model = self.models[feature_class.step]
+        return feature_class(model, use_cache=use_cache, **kwargs)
+
+    def _map_parallel(self, function, items: list) -> list:
+        """``function`` over ``items`` on up to ``max_parallel`` threads, in order"""
+        if len(items) <= 1 or self.max_parallel == 1:
+            return [function(*item) for item in items]
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_parallel, len(items)),
+            thread_name_prefix="document",
+        ) as executor:
+            # Each call runs in a copy of this context, so it keeps the job's
+            # rate limiter queue
+            futures = [
+                executor.submit(contextvars.copy_context().run, function, *item)
+                for item in items
+            ]
+            return [future.result() for future in futures]
+
     @contextmanager
     def get_db_session(self):
         session = self.SessionLocal()
@@ -48,34 +125,319 @@ class Worker:
         finally:
             session.close()
 
-    def _convert_pdf_pages_to_images(self, pdf_path):
-        return convert_from_path(pdf_path=pdf_path, poppler_path=self.poppler_path)
+    def _recognize_documents(self, pdf_paths) -> tuple[list[list[Page]], list]:
+        """The pages of each PDF, and the numbers of its pages skipped as blank"""
+        # All files of a job go to the OCR stage together so their pages batch
+        options = self.recognition_options
+        if self.pool:
+            documents, stats = self.pool.submit_cpu(
+                recognize_documents, pdf_paths, options
+            )
+            self.pool.record_recognition_stats(stats)
+        else:
+            documents, stats = recognize_documents(pdf_paths, options)
+        print(f"[Worker] OCR pages: {stats.as_dict()}")
+        blank_pages = [[] for _ in pdf_paths]
+        for doc_index, page_index, record in stats.preprocessing:
+            print(
+                f"[Worker] Preprocessed {pdf_paths[doc_index]} page {page_index + 1}: "
+                f"{record.as_dict()}"
+            )
+            if record.blank:
+                blank_pages[doc_index].append(page_index + 1)
+        return documents, blank_pages
+
+    # --- Checkpoints ---
+    def _load_checkpoints(self, job_id) -> dict:
+        with self.app.app_context():
+            with self.get_db_session() as session:
+                rows = session.query(JobCheckpoint).filter_by(job_id=job_id).all()
+                return {(row.upload_id, row.stage): row.data for row in rows}
+
+    def _save_checkpoint(self, job_id, upload_id, stage, data):
+        # An upsert: a run whose lease went stale may still be writing the same
+        # stages as the run that reclaimed the job
+        with self.app.app_context():
+            with self.get_db_session() as session:
+                key = dict(job_id=job_id, upload_id=upload_id, stage=stage)
+                updated = (
+                    session.query(JobCheckpoint)
+                    .filter_by(**key)
+                    .update({"data": data}, synchronize_session=False)
+                )
+                if updated:
+                    return
+                try:
+                    with session.begin_nested():
+                        session.add(JobCheckpoint(data=data, **key))
+                except IntegrityError:
+                    # Inserted by the other run in between
+                    session.query(JobCheckpoint).filter_by(**key).update(
+                        {"data": data}, synchronize_session=False
+                    )
+
+    # --- Standardised documents ---
+    def _load_standardized(self, upload_ids) -> tuple[dict, dict]:
+        """
+        Stored documents of the current standardisation version, and the
+        pages their OCR skipped as blank, by upload.
+        A document is found by the content hash of its file, so a new job with
+        a file already standardised for any earlier upload reuses it; the
+        upload then gets its own copy, which outlives the other job.
+        """
+        with self.app.app_context():
+            with self.get_db_session() as session:
+                hashes = dict(
+                    session.query(Upload.id, Upload.content_hash).filter(
+                        Upload.id.in_(upload_ids)
+                    )
+                )
+                rows = (
+                    session.query(StandardizedDocument, Upload.content_hash)
+                    .join(Upload, StandardizedDocument.upload_id == Upload.id)
+                    .filter(
+                        or_(
+                            Upload.content_hash.in_(
+                                [h for h in hashes.values() if h is not None]
+                            ),
+                            # Uploads from before hashing only match themselves
+                            StandardizedDocument.upload_id.in_(upload_ids),
+                        ),
+                        StandardizedDocument.prompt_version
+                        == self.standardization_version,
+                    )
+                    # The newest row of a file wins
+                    .order_by(StandardizedDocument.created_at)
+                    .all()
+                )
+                by_hash, by_upload = {}, {}
+                for row, content_hash in rows:
+                    if content_hash is not None:
+                        by_hash[content_hash] = row
+                    by_upload[row.upload_id] = row
+
+                documents, blank_pages = {}, {}
+                for upload_id in upload_ids:
+                    # The upload's own row first: it may only have one
+                    row = by_upload.get(upload_id) or by_hash.get(
+                        hashes.get(upload_id)
+                    )
+                    if row is None or row.document_type not in DOCUMENT_TYPES:
+                        continue
+                    if row.upload_id != upload_id:
+                        session.add(copy_standardized(row, upload_id))
+                    document = DOCUMENT_TYPES[row.document_type](
+                        pages=[Page.from_json(page) for page in row.pages]
+                    )
+                    document.parsed_content = row.parsed_content
+                    documents[upload_id] = document
+                    blank_pages[upload_id] = row.blank_pages or []
+                return documents, blank_pages
+
+    def _save_standardized(self, upload_id, document, blank_pages):
+        with self.app.app_context():
+            with self.get_db_session() as session:
+                session.query(StandardizedDocument).filter_by(
+                    upload_id=upload_id
+                ).delete()
+                session.add(
+                    StandardizedDocument(
+                        upload_id=upload_id,
+                        document_type=document.type_name,
+                        pages=[page.to_json() for page in document.pages],
+                        parsed_content=document.parsed_content,
+                        blank_pages=blank_pages,
+                        model_name=self.models["format"].model_name,
+                        prompt_version=self.standardization_version,
+                    )
+                )
 
-    def _standardize_document(self, uploaded_files):
-        documents = []
+    def _standardize_document(self, job_id, uploaded_files, checkpoints=None):
+        """The documents of the uploads, and the pages OCR skipped as blank"""
+        checkpoints = checkpoints or {}
         print(f"Standardizing documents...")
-        for file in uploaded_files:
-            pages = self._convert_pdf_pages_to_images(file)
-            pages_read = []
-            for page in pages:
-                image_np = np.array(page)
-                recognized_texts = self.ocr.get_recognized_texts(image_np)
 
-                pages_read.append(Page(content=recognized_texts))
+        upload_ids = [upload_id for upload_id, _ in uploaded_files]
+        stored, stored_blank = self._load_standardized(upload_ids)
+        if stored:
+            print(f"[Worker] Reusing {len(stored)} stored standardised document(s)")
+        uploaded_files = [
+            (upload_id, file)
+            for upload_id, file in uploaded_files
+            if upload_id not in stored
+        ]
+
+        self.stage = "ocr"
+        pages_by_upload = {
+            upload_id: [Page.from_json(p) for p in checkpoints[(upload_id, "ocr")]]
+            for upload_id, _ in uploaded_files
+            if (upload_id, "ocr") in checkpoints
+        }
+        blank_by_upload = dict(stored_blank)
+        blank_by_upload.update(
+            (upload_id, checkpoints.get((upload_id, "blank"), []))
+            for upload_id in pages_by_upload
+        )
+        to_recognize = [
+            (upload_id, file)
+            for upload_id, file in uploaded_files
+            if upload_id not in pages_by_upload
+        ]
+        if to_recognize:
+            recognized, blank_pages = self._recognize_documents(
+                [file for _, file in to_recognize]
+            )
+            for (upload_id, _), pages_read, blank in zip(
+                to_recognize, recognized, blank_pages
+            ):
+                pages_by_upload[upload_id] = pages_read
+                blank_by_upload[upload_id] = blank
+                if blank:
+                    self._save_checkpoint(job_id, upload_id, "blank", blank)
+                self._save_checkpoint(
+                    job_id, upload_id, "ocr", [page.to_json() for page in pages_read]
+                )
+
+        # The LLM steps of every file run concurrently
+        self.stage = "classification"
+        standardized = self._map_parallel(
+            self._standardize_upload,
+            [
+                (
+                    job_id,
+                    upload_id,
+                    pages_by_upload[upload_id],
+                    blank_by_upload[upload_id],
+                    checkpoints,
+                )
+                for upload_id, _ in uploaded_files
+            ],
+        )
+        stored.update(
+            (upload_id, document)
+            for (upload_id, _), document in zip(uploaded_files, standardized)
+        )
+        return [stored[upload_id] for upload_id in upload_ids], blank_by_upload
+
+    def _standardize_upload(
+        self, job_id, upload_id, pages_read, blank_pages, checkpoints
+    ):
+        document = self._classify_and_format(
+            job_id, upload_id, pages_read, checkpoints
+        )
+        self._save_standardized(upload_id, document, blank_pages)
+        return document
 
+    def _classify_and_format(self, job_id, upload_id, pages_read, checkpoints):
+        combined = self._standardize_combined(
+            job_id, upload_id, pages_read, checkpoints
+        )
+        if combined is not None:
+            return combined
+        if (upload_id, "classification") in checkpoints:
+            doc_type = checkpoints[(upload_id, "classification")]
+        else:
             doc_type = (self.classifier.classify(pages_read) or "").strip().lower()
-            if doc_type == "death registration worksheet":
-                document = DeathRegistrationWorksheet(pages=pages_read)
-            elif doc_type == "certificate of death":
-                document = DeathCertificate(pages=pages_read)
-            else:
-                raise ValueError(f"Unknown document type {doc_type}")
+            self._save_checkpoint(job_id, upload_id, "classification", doc_type)
+
+        if doc_type not in DOCUMENT_TYPES:
+            raise ValueError(f"Unknown document type {doc_type}")
+        document = DOCUMENT_TYPES[doc_type](pages=pages_read)
 
+        self.stage = "formatting"
+        if (upload_id, "formatting") in checkpoints:
+            document.parsed_content = checkpoints[(upload_id, "formatting")]
+        else:
+            print(
+                f"[Worker] Prompt size for upload {upload_id}: "
+                f"{prompt_size_report(pages_read)}"
+            )
             self.formatter.format_document(document)
-            documents.append(document)
-        return documents
+            self._save_checkpoint(
+                job_id, upload_id, "formatting", document.parsed_content
+            )
+        return document
+
+    # --- Audit ---
+    def _audit_item(self, job_id, item, checkpoints):
+        """
+        Results of one audit item: an ``(upload_id, document)`` for the
+        general audit, two of them for a cross-check pair.
+        """
+        (upload_id, document), *other = item
+        stage = f"audit:{other[0][0]}" if other else "audit"
+        if (upload_id, stage) in checkpoints:
+            return checkpoints[(upload_id, stage)]
+        if other:
+            results = self.comparer.compare(document, other[0][1])
+        else:
+            results = self.general_audit.audit(document)
+        self._save_checkpoint(job_id, upload_id, stage, results)
+        return results
+
+    def _audit_documents(self, job_id, feature, documents, names, checkpoints):
+        """
+        Every document for the general audit, every pair of documents for a
+        cross-check. Returns ``(items, results)``, with ``names`` labelling
+        each item's issues in the combined job result.
+        """
+        if feature == "general":
+            items = [(entry,) for entry in documents]
+        elif feature == "cross-check":
+            if len(documents) < 2:
+                raise ValueError("Cross-check needs at least two documents")
+            # Each standardised document is reused by all of its pairs
+            items = list(combinations(documents, 2))
+        else:
+            raise ValueError(f"Unknown feature {feature}")
+
+        results = self._map_parallel(
+            self._audit_item, [(job_id, item, checkpoints) for item in items]
+        )
+        labelled = [
+            (" / ".join(names[upload_id] for upload_id, _ in item), item_results)
+            for item, item_results in zip(items, results)
+        ]
+        return items, labelled
+
+    def _standardize_combined(self, job_id, upload_id, pages_read, checkpoints):
+        """
+        Classify and format in a single LLM call. None when the document goes
+        the two-step way: combined mode is off, a step is already checkpointed,
+        the local classifier knows the type, or the response is unusable.
+        """
+        if self.standardizer is None or any(
+            (upload_id, stage) in checkpoints
+            for stage in ("classification", "formatting")
+        ):
+            return None
+        local_classifier = self.classifier.local_classifier
+        if local_classifier is not None and local_classifier.classify(pages_read)[0]:
+            return None
+
+        print(
+            f"[Worker] Prompt size for upload {upload_id}: "
+            f"{prompt_size_report(pages_read)}"
+        )
+        try:
+            doc_type, document = self.standardizer.standardize(pages_read)
+        except (ValueError, SchemaRejected) as e:
+            print(f"[Worker] Combined standardization failed, two steps instead: {e}")
+            return None
+        self._save_checkpoint(job_id, upload_id, "classification", doc_type)
+        self._save_checkpoint(job_id, upload_id, "formatting", document.parsed_content)
+        return document
+
+    def process_job(self, job_id) -> str | None:
+        """
+        Run the job. Returns the status this run gave it, "completed" or
+        "failed", or None when it found the job canceled or finished already.
+        """
+        # LLM calls of this job share the rate limiter fairly with other jobs
+        with llm_job(job_id):
+            return self._process_job(job_id)
 
-    def process_job(self, job_id):
+    def _process_job(self, job_id) -> str | None:
         try:
             print("Processing job...")
             with self.app.app_context():
@@ -85,74 +447,129 @@ class Worker:
                         .options(joinedload(JobModel.uploads))
                         .get(job_id)
                     )
-                    if not job or job.status == "canceled":
-                        return
+                    # A resumed job may have finished right before the restart
+                    if not job or job.status in {"canceled", "completed", "failed"}:
+                        return None
                     job.status = "processing"
                     session.commit()
-                    uploaded_files = [u.file_path for u in job.uploads]
+                    uploads = sorted(job.uploads, key=lambda u: u.id)
+                    uploaded_files = [(u.id, u.file_path) for u in uploads]
+                    names = {u.id: u.permanent_file_name for u in uploads}
                     feature = job.feature
                     user_id = job.user_id
             print(f"Emitting job progress to frontend: Processing")
             self._emit_job_progress(job_id, user_id)
 
-            documents = self._standardize_document(uploaded_files)
+            checkpoints = self._load_checkpoints(job_id)
+            if checkpoints:
+                print(f"Resuming job {job_id} from {len(checkpoints)} checkpoint(s)")
+            documents, blank_by_upload = self._standardize_document(
+                job_id, uploaded_files, checkpoints
+            )
+            skipped_pages = [
+                {"file": names[upload_id], "page": page}
+                for upload_id, _ in uploaded_files
+                for page in blank_by_upload.get(upload_id, [])
+            ]
+            if skipped_pages:
+                print(f"[Worker] Pages skipped as blank: {skipped_pages}")
 
             with self.app.app_context():
                 with self.get_db_session() as session:
                     job_check = session.get(JobModel, job_id)
                     if job_check and job_check.status == "canceled":
-                        return
+                        return None
 
-            if feature.lower() == "general":
-                results = self.general_audit.audit(documents[0])
-            elif feature.lower() == "cross-check":
-                results = self.comparer.compare(documents[0], documents[1])
+            self.stage = "audit"
+            upload_ids = [upload_id for upload_id, _ in uploaded_files]
+            if (None, "audit") in checkpoints:
+                # Job-level result saved before per-document audits existed
+                items, labelled = [], []
+                results = checkpoints[(None, "audit")]
             else:
-                raise ValueError(f"Unknown feature {feature}")
+                items, labelled = self._audit_documents(
+                    job_id,
+                    feature.lower(),
+                    list(zip(upload_ids, documents)),
+                    names,
+                    checkpoints,
+                )
+                results = combine_results(labelled)
 
             with self.app.app_context():
                 with self.get_db_session() as session:
                     job_db = session.get(JobModel, job_id)
-                    if job_db.status != "canceled":
-                        job_db.status = "completed"
-                        audit = AuditResult(
-                            job_id=job_db.id,
-                            accuracy=results.get("accuracy"),
-                            issues=results.get("issues"),
+                    # Completed already by a run that reclaimed a stale lease
+                    if job_db.status in {"canceled", "completed"}:
+                        return None
+                    job_db.status = "completed"
+                    # A run that failed meanwhile may have left its error
+                    session.query(AuditResult).filter_by(job_id=job_id).delete()
+                    audit = AuditResult(
+                        job_id=job_db.id,
+                        accuracy=results.get("accuracy"),
+                        issues=results.get("issues"),
+                        skipped_pages=skipped_pages,
+                    )
+                    session.add(audit)
+                    document_results = []
+                    for item, (label, item_results) in zip(items, labelled):
+                        ids = [upload_id for upload_id, _ in item]
+                        session.add(
+                            DocumentAuditResult(
+                                job_id=job_id,
+                                upload_id=ids[0],
+                                other_upload_id=ids[1] if len(ids) > 1 else None,
+                                accuracy=item_results.get("accuracy"),
+                                issues=item_results.get("issues"),
+                            )
                         )
-                        session.add(audit)
-                        session.commit()
-                        self._emit_job_update(
+                        document_results.append(
                             {
-                                "id": job_db.id,
-                                "status": "completed",
-                                "accuracy": audit.accuracy,
-                                "issues": audit.issues,
-                                "completed_at": to_utc_iso(audit.completed_at),
-                                "user_id": job_db.user_id,
+                                "upload_ids": ids,
+                                "files": label,
+                                "accuracy": item_results.get("accuracy"),
+                                "issues": item_results.get("issues"),
                             }
                         )
+                    # The checkpoints are only needed to resume the job
+                    session.query(JobCheckpoint).filter_by(job_id=job_id).delete()
+                    session.commit()
+                    self._emit_job_update(
+                        {
+                            "id": job_db.id,
+                            "status": "completed",
+                            "accuracy": audit.accuracy,
+                            "issues": audit.issues,
+                            "documents": document_results,
+                            "skipped_pages": skipped_pages,
+                            "completed_at": to_utc_iso(audit.completed_at),
+                            "user_id": job_db.user_id,
+                        }
+                    )
+            return "completed"
 
         except Exception as e:
             traceback.print_exc()
             with self.app.app_context():
                 with self.get_db_session() as session:
                     job_db = session.get(JobModel, job_id)
-                    if job_db:
-                        job_db.status = "failed"
-                        job_db.error = str(e)
-                        audit = AuditResult(job_id=job_db.id, error=str(e))
-                        session.add(audit)
-                        session.commit()
-                        self._emit_job_failed(
-                            {
-                                "id": job_db.id,
-                                "status": "failed",
-                                "error": job_db.error,
-                                "completed_at": to_utc_iso(audit.completed_at),
-                                "user_id": job_db.user_id,
-                            }
-                        )
+                    # Finished or canceled meanwhile, e.g. by a run that
+                    # reclaimed a stale lease; that outcome stands
+                    if not job_db or job_db.status in {"canceled", "completed"}:
+                        return None
+                    audit = record_failure(session, job_db, str(e))
+                    session.commit()
+                    self._emit_job_failed(
+                        {
+                            "id": job_db.id,
+                            "status": "failed",
+                            "error": audit.error,
+                            "completed_at": to_utc_iso(audit.completed_at),
+                            "user_id": job_db.user_id,
+                        }
+                    )
+            return "failed"
 
     def _emit_job_progress(self, job_id, user_id):
         self.socketio.emit(
@@ -0,0 +1,161 @@
+import time
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from src.Process.Recognition import RecognitionStats, init_recognizer
+
+
+class WorkerSlot:
+    """Book-keeping for a single job thread of the pool"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.worker = None
+        self.current_job = None
+        self.busy_since = None
+        self.busy_seconds = 0.0
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+
+    def stats(self, now: float, uptime: float) -> dict:
+        busy = self.busy_seconds
+        if self.busy_since is not None:
+            busy += now - self.busy_since
+        return {
+            "worker": self.index,
+            "current_job": self.current_job,
+            "stage": getattr(self.worker, "stage", None) if self.current_job else None,
+            "jobs_completed": self.jobs_completed,
+            "jobs_failed": self.jobs_failed,
+            "busy_seconds": round(busy, 2),
+            "utilisation": round(busy / uptime, 3) if uptime > 0 else 0.0,
+        }
+
+
+class WorkerPool:
+    """
+    Runs jobs from ``job_queue`` on ``size`` threads.
+
+    Every thread owns its own ``Worker`` (and therefore its own LLM client), so
+    the I/O-bound LLM stages of several jobs run side by side. The CPU-bound
+    stages (PDF rendering, PaddleOCR) are shipped to a shared process pool of
+    ``ocr_processes`` processes, so one job's OCR overlaps another job's LLM
+    round trips.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        ocr_processes: int,
+        job_queue,
+        worker_factory,
+        heartbeat_interval: float = 30.0,
+    ):
+        self.size = max(1, size)
+        self.ocr_processes = max(1, ocr_processes)
+        self.queue = job_queue
+        self.worker_factory = worker_factory
+        self.heartbeat_interval = heartbeat_interval
+        self.slots = [WorkerSlot(i) for i in range(self.size)]
+        self.ocr_executor = None
+        self.started_at = None
+        self._ocr_pending = 0
+        self.recognition_stats = RecognitionStats()
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Pool processes spawned by the OCR executor import the app module
+        # again on some platforms; they must never start a pool of their own.
+        if multiprocessing.parent_process() is not None:
+            return
+
+        # Spawned rather than forked: the processes start lazily from a job
+        # thread, while other threads may hold locks (PDFium, sqlite, stdout)
+        # that a forked child would inherit held
+        self.ocr_executor = ProcessPoolExecutor(
+            max_workers=self.ocr_processes,
+            initializer=init_recognizer,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self.started_at = time.monotonic()
+        for slot in self.slots:
+            slot.worker = self.worker_factory(pool=self)
+            threading.Thread(
+                target=self._worker_loop,
+                args=(slot,),
+                name=f"job-worker-{slot.index}",
+                daemon=True,
+            ).start()
+        threading.Thread(
+            target=self._heartbeat_loop, name="job-heartbeat", daemon=True
+        ).start()
+        print(
+            f"[WorkerPool] Started {self.size} job workers, "
+            f"{self.ocr_processes} OCR processes"
+        )
+
+    def submit_cpu(self, fn, *args, **kwargs):
+        """Run a CPU-bound stage in the OCR process pool and wait for it"""
+        with self._lock:
+            self._ocr_pending += 1
+        try:
+            return self.ocr_executor.submit(fn, *args, **kwargs).result()
+        finally:
+            with self._lock:
+                self._ocr_pending -= 1
+
+    def record_recognition_stats(self, stats: RecognitionStats):
+        with self._lock:
+            self.recognition_stats.merge(stats)
+
+    def _worker_loop(self, slot: WorkerSlot):
+        while True:
+            job_id = self.queue.get(str(slot.index))
+            slot.current_job = job_id
+            slot.busy_since = time.monotonic()
+            try:
+                print(f"[WorkerLoop-{slot.index}] Processing job {job_id}")
+                outcome = slot.worker.process_job(job_id)
+                # Jobs found canceled or finished by another run count as neither
+                if outcome == "completed":
+                    slot.jobs_completed += 1
+                elif outcome == "failed":
+                    slot.jobs_failed += 1
+            except Exception as e:
+                slot.jobs_failed += 1
+                print(f"[WorkerLoop-{slot.index}] Job {job_id} failed: {e}")
+                traceback.print_exc()
+            finally:
+                slot.busy_seconds += time.monotonic() - slot.busy_since
+                slot.busy_since = None
+                slot.current_job = None
+                self.queue.task_done(job_id)
+
+    def _heartbeat_loop(self):
+        # Keeps the queue lease of running jobs alive
+        while True:
+            time.sleep(self.heartbeat_interval)
+            running = [slot.current_job for slot in self.slots if slot.current_job]
+            try:
+                self.queue.heartbeat(running)
+            except Exception as e:
+                print(f"[WorkerPool] Heartbeat failed: {e}")
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        uptime = now - self.started_at if self.started_at else 0.0
+        workers = [slot.stats(now, uptime) for slot in self.slots]
+        return {
+            "queue_depth": self.queue.qsize(),
+            "workers": workers,
+            "busy_workers": sum(1 for w in workers if w["current_job"]),
+            "utilisation": (
+                round(sum(w["utilisation"] for w in workers) / len(workers), 3)
+            ),
+            "ocr_processes": self.ocr_processes,
+            "ocr_pending": self._ocr_pending,
+            "ocr_pages": self.recognition_stats.as_dict(),
+            "uptime_seconds": round(uptime, 2),
+        }
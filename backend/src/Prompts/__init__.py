@@ -14,9 +14,11 @@ DOCUMENT_GENERAL_AUDIT_PROMPT_PATH = os.path.join(
 DOCUMENT_COMPARISON_PROMPT_PATH = os.path.join(BASE_DIR, "comparison_prompt.txt")
 DOCUMENT_FORMATTING_PROMPT_PATH = os.path.join(BASE_DIR, "formatting.txt")
 DOCUMENT_CLASSIFICATION_PROMPT_PATH = os.path.join(BASE_DIR, "classification.txt")
+DOCUMENT_STANDARDIZATION_PROMPT_PATH = os.path.join(BASE_DIR, "standardization.txt")
 
 
 DOCUMENT_GENERAL_AUDIT_PROMPT = get_prompt(DOCUMENT_GENERAL_AUDIT_PROMPT_PATH)
 DOCUMENT_COMPARISON_PROMPT = get_prompt(DOCUMENT_COMPARISON_PROMPT_PATH)
 DOCUMENT_FORMATTING_PROMPT = get_prompt(DOCUMENT_FORMATTING_PROMPT_PATH)
 DOCUMENT_CLASSIFICATION_PROMPT = get_prompt(DOCUMENT_CLASSIFICATION_PROMPT_PATH)
+DOCUMENT_STANDARDIZATION_PROMPT = get_prompt(DOCUMENT_STANDARDIZATION_PROMPT_PATH)
@@ -0,0 +1,70 @@
+"""
+Local stand-in for a Socket.IO message queue.
+
+Worker processes started with ``python worker.py`` cannot emit on the web
+process' Socket.IO server directly. With ``SOCKETIO_MESSAGE_QUEUE`` set they
+publish through Redis; without it they write their events to the
+``socket_events`` table and the web process relays them to the clients.
+"""
+
+from contextlib import contextmanager
+from sqlalchemy.orm import sessionmaker
+
+from src.Models import SocketEvent, db
+
+
+class OutboxEmitter:
+    """Drop-in for ``socketio.emit`` that stores events in the database"""
+
+    def __init__(self, app):
+        with app.app_context():
+            self.SessionLocal = sessionmaker(bind=db.engine)
+
+    @contextmanager
+    def get_db_session(self):
+        session = self.SessionLocal()
+        try:
+            yield session
+            session.commit()
+        except:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def emit(self, event, data, room=None):
+        with self.get_db_session() as session:
+            session.add(SocketEvent(event=event, data=data, room=room))
+
+
+def get_worker_emitter(app, socketio):
+    """Emitter for code running outside the web process"""
+    if app.config["SOCKETIO_MESSAGE_QUEUE"]:
+        return socketio
+    return OutboxEmitter(app)
+
+
+def start_event_relay(app, socketio, poll_interval: float = 0.5):
+    """Forward events stored by worker processes to the connected clients"""
+    with app.app_context():
+        SessionLocal = sessionmaker(bind=db.engine)
+
+    def relay_loop():
+        while True:
+            session = SessionLocal()
+            try:
+                events = (
+                    session.query(SocketEvent).order_by(SocketEvent.id).limit(100).all()
+                )
+                for event in events:
+                    socketio.emit(event.event, event.data, room=event.room)
+                    session.delete(event)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                print(f"[EventRelay] Error relaying events: {e}")
+            finally:
+                session.close()
+            socketio.sleep(poll_interval)
+
+    socketio.start_background_task(relay_loop)
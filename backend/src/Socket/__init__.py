@@ -8,4 +8,5 @@ socketio = SocketIO(
     manage_session=False,
     logger=False,
     engineio_logger=False,
+    message_queue=app.config["SOCKETIO_MESSAGE_QUEUE"],
 )
@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from flask import Flask
+from flask_migrate import Migrate
 from flask_session.sqlalchemy import SqlAlchemySessionInterface
 from src.Models import db
 
@@ -12,19 +13,156 @@ DB_PATH = os.path.join(BASE_DIR, "application.db")
 
 class Config:
     SECRET_KEY = os.getenv("FLASK_SECRET_KEY")
-    SQLALCHEMY_DATABASE_URI = f"sqlite:///{DB_PATH}"
+    SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "userdata", "uploads")
     SESSION_TYPE = "sqlalchemy"
     SESSION_COOKIE_HTTPONLY = True
     SESSION_REFRESH_EACH_REQUEST = False
 
+    # Job processing
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+    OCR_PROCESSES = int(os.getenv("OCR_PROCESSES", 1))
+    # Page rendering before OCR
+    OCR_RENDER_DPI = int(os.getenv("OCR_RENDER_DPI", 200))
+    OCR_RENDER_GRAYSCALE = os.getenv("OCR_RENDER_GRAYSCALE", "false").lower() == "true"
+    OCR_PREFETCH_PAGES = int(os.getenv("OCR_PREFETCH_PAGES", 1))
+    # Pages per PaddleOCR predict() call, across all files of a job
+    OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", 4))
+    # The OCR heuristics below (tiered OCR, crop refinement, downscaling,
+    # deskew, the blank check) are off until validated on real jobs
+    # Tiered OCR: mobile models first, server models for pages read poorly
+    OCR_TIERED = os.getenv("OCR_TIERED", "false").lower() == "true"
+    OCR_ESCALATION_MIN_SCORE = float(os.getenv("OCR_ESCALATION_MIN_SCORE", 0.9))
+    # Recognized characters per megapixel
+    OCR_ESCALATION_MIN_DENSITY = float(os.getenv("OCR_ESCALATION_MIN_DENSITY", 50))
+    # Re-OCR low-score text boxes from high-DPI crops; 0 disables the refinement
+    OCR_REFINE_MIN_SCORE = float(os.getenv("OCR_REFINE_MIN_SCORE", 0))
+    OCR_REFINE_DPI = int(os.getenv("OCR_REFINE_DPI", 400))
+    OCR_REFINE_MAX_REGIONS = int(os.getenv("OCR_REFINE_MAX_REGIONS", 20))
+    # Page preprocessing before OCR: downscale to a target height in pixels,
+    # deskew, skip blank pages (low ink ratio and no mark bigger than a speck),
+    # optionally binarise. A target height or max ink of 0 disables the
+    # downscale or the blank check; skipped pages are listed in the job result
+    OCR_TARGET_HEIGHT = int(os.getenv("OCR_TARGET_HEIGHT", 0))
+    OCR_DESKEW = os.getenv("OCR_DESKEW", "false").lower() == "true"
+    OCR_MAX_SKEW_DEGREES = float(os.getenv("OCR_MAX_SKEW_DEGREES", 5))
+    OCR_BLANK_MAX_INK = float(os.getenv("OCR_BLANK_MAX_INK", 0))
+    OCR_BINARIZE = os.getenv("OCR_BINARIZE", "false").lower() == "true"
+    # Digital PDFs: read pages with an embedded text layer instead of OCR'ing them
+    USE_PDF_TEXT_LAYER = os.getenv("USE_PDF_TEXT_LAYER", "true").lower() == "true"
+    TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", 50))
+    # OCR results keyed by page image and model setup; 0 MB disables the cache
+    OCR_CACHE_PATH = os.getenv(
+        "OCR_CACHE_PATH", os.path.join(BASE_DIR, "userdata", "cache", "ocr.db")
+    )
+    OCR_CACHE_MAX_MB = int(os.getenv("OCR_CACHE_MAX_MB", 512))
+    # LLM HTTP clients, shared by all model instances of a process
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 120))
+    LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", 10))
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+    # "provider:model" (openai or gemini) and an optional secondary per step,
+    # e.g. LLM_CLASSIFY_MODEL=openai:gpt-5-mini LLM_CLASSIFY_FALLBACK=gemini:
+    LLM_ROUTES = {
+        step: (
+            os.getenv(f"LLM_{step}_MODEL", os.getenv("LLM_MODEL", "openai:gpt-5")),
+            os.getenv(f"LLM_{step}_FALLBACK", os.getenv("LLM_FALLBACK", "")),
+        )
+        for step in ("CLASSIFY", "FORMAT", "COMPARE", "AUDIT")
+    }
+    # Also fire the secondary when the primary is slower than its rolling p95
+    LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() == "true"
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 95))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+
+    # The local heuristics below (local extraction and classification,
+    # cross-check) and combined standardization are off until validated on
+    # real jobs
+    # Read SSNs, dates, ZIP codes, phones, emails... from the OCR output locally
+    LOCAL_EXTRACTION = os.getenv("LOCAL_EXTRACTION", "false").lower() == "true"
+    # Classify common forms from their first page; the LLM decides close calls
+    LOCAL_CLASSIFICATION = os.getenv("LOCAL_CLASSIFICATION", "false").lower() == "true"
+    LOCAL_CLASSIFICATION_MIN_MARGIN = float(
+        os.getenv("LOCAL_CLASSIFICATION_MIN_MARGIN", 0.25)
+    )
+    # Cross-check mapped worksheet/certificate fields locally, LLM for the rest
+    LOCAL_CROSS_CHECK = os.getenv("LOCAL_CROSS_CHECK", "false").lower() == "true"
+    # Fields per formatting LLM call, run concurrently; 0 asks for all fields at once
+    FORMATTING_GROUP_SIZE = int(os.getenv("FORMATTING_GROUP_SIZE", 0))
+    FORMATTING_MAX_PARALLEL = int(os.getenv("FORMATTING_MAX_PARALLEL", 4))
+    # Documents of a job standardised (and audits run) concurrently per job
+    DOCUMENT_MAX_PARALLEL = int(os.getenv("DOCUMENT_MAX_PARALLEL", 4))
+    # "combined" classifies and formats in one structured-output call when the
+    # local classifier cannot tell the type; "separate" makes two calls
+    STANDARDIZATION_MODE = os.getenv("STANDARDIZATION_MODE", "separate").lower()
+
+    # LLM budget of each provider, shared by all jobs; 0 disables a limit.
+    # LLM_REQUESTS_PER_MINUTE/LLM_TOKENS_PER_MINUTE set the defaults, and
+    # LLM_<PROVIDER>_REQUESTS_PER_MINUTE/_TOKENS_PER_MINUTE override them, e.g.
+    # LLM_GEMINI_REQUESTS_PER_MINUTE=1000
+    LLM_RATE_LIMITS = {
+        provider: (
+            int(
+                os.getenv(
+                    f"LLM_{provider}_REQUESTS_PER_MINUTE",
+                    os.getenv("LLM_REQUESTS_PER_MINUTE", 500),
+                )
+            ),
+            int(
+                os.getenv(
+                    f"LLM_{provider}_TOKENS_PER_MINUTE",
+                    os.getenv("LLM_TOKENS_PER_MINUTE", 500_000),
+                )
+            ),
+        )
+        for provider in ("OPENAI", "GEMINI")
+    }
+    # Processes making LLM calls (the web process with RUN_WORKERS_IN_WEB, or
+    # every worker.py); each one enforces its share of the budgets above
+    LLM_RATE_LIMIT_PROCESSES = int(os.getenv("LLM_RATE_LIMIT_PROCESSES", 1))
+
+    # LLM responses keyed by model, temperature and prompt; 0 MB disables the cache
+    LLM_CACHE_PATH = os.getenv(
+        "LLM_CACHE_PATH", os.path.join(BASE_DIR, "userdata", "cache", "llm.db")
+    )
+    LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", 256))
+    LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    # Comma-separated feature names that never use the cache, e.g. "general_audit"
+    LLM_CACHE_OPT_OUT = {
+        name.strip()
+        for name in os.getenv("LLM_CACHE_OPT_OUT", "").split(",")
+        if name.strip()
+    }
+    # Usernames allowed to read /user/jobs/stats, which shows every user's
+    # running jobs and the cache and LLM internals; comma-separated
+    STATS_USERS = {
+        name.strip() for name in os.getenv("STATS_USERS", "").split(",") if name.strip()
+    }
+    # Largest ?limit= of a /user/jobs page
+    JOBS_MAX_PAGE_SIZE = int(os.getenv("JOBS_MAX_PAGE_SIZE", 200))
+    # Deleted jobs are reported to ?since= listings for this long; clients that
+    # last synced before that must list all jobs again
+    JOBS_TOMBSTONE_DAYS = int(os.getenv("JOBS_TOMBSTONE_DAYS", 30))
+    # A claimed job whose worker stopped heartbeating is handed to another worker
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 120))
+    # A job whose worker died this many times is marked failed; 0 retries forever
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+    JOB_QUEUE_POLL_SECONDS = float(os.getenv("JOB_QUEUE_POLL_SECONDS", 2))
+    # Set to false when jobs are processed by separate `python worker.py` processes
+    RUN_WORKERS_IN_WEB = os.getenv("RUN_WORKERS_IN_WEB", "true").lower() == "true"
+    # Redis URL for an rq job queue; the database queue is used when unset
+    JOB_BROKER_URL = os.getenv("JOB_BROKER_URL") or None
+    # Redis URL through which worker processes emit Socket.IO events
+    SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE") or None
+
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
 # Initialize db
 db.init_app(app)
+# Schema migrations, applied on start by ``upgrade_database``
+migrate = Migrate(app, db, directory=os.path.join(BASE_DIR, "migrations"))
 
 app.session_interface = SqlAlchemySessionInterface(
     app,
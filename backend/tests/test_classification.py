@@ -0,0 +1,64 @@
+from src.Documents.Page import Page
+from src.Features.Classification import LocalDocumentClassifier
+
+
+class Worksheet:
+    signatures = ["REGISTRATION WORKSHEET"]
+
+    def __init__(self):
+        self.fields = {"FIRST NAME": None, "INFORMANT NAME": None, "FUNERAL HOME": None}
+
+
+class Certificate:
+    signatures = ["CERTIFICATE OF DEATH"]
+
+    def __init__(self):
+        self.fields = {"FIRST NAME": None, "CAUSE OF DEATH": None, "REGISTRAR": None}
+
+
+TYPES = {"worksheet": Worksheet, "certificate": Certificate}
+
+
+def page(*texts):
+    return Page(
+        content=[
+            (text, [0, 10 * i, 100, 10 * i + 8], 1) for i, text in enumerate(texts)
+        ]
+    )
+
+
+def test_labels_shared_by_types_do_not_count():
+    classifier = LocalDocumentClassifier(TYPES)
+    assert classifier._labels == {
+        "worksheet": {"INFORMANT NAME", "FUNERAL HOME"},
+        "certificate": {"CAUSE OF DEATH", "REGISTRAR"},
+    }
+
+
+def test_signature_and_labels():
+    classifier = LocalDocumentClassifier(TYPES)
+    scores = classifier.scores(
+        page("Death Registration Worksheet", "Informant Name:", "First Name")
+    )
+    assert scores == {"worksheet": 0.75, "certificate": 0.0}
+    doc_type, _ = classifier.classify([page("Registration Worksheet", "Funeral Home")])
+    assert doc_type == "worksheet"
+
+
+def test_garbled_signature():
+    classifier = LocalDocumentClassifier(TYPES)
+    doc_type, _ = classifier.classify([page("CERTIFICATE 0F DEATH", "Cause of death")])
+    assert doc_type == "certificate"
+
+
+def test_close_call_is_left_to_the_llm():
+    pages = [page("Certificate of Death", "Registration Worksheet", "Registrar")]
+    doc_type, scores = LocalDocumentClassifier(TYPES, min_margin=0.25).classify(pages)
+    assert scores == {"worksheet": 0.5, "certificate": 0.75}
+    assert doc_type == "certificate"
+    doc_type, _ = LocalDocumentClassifier(TYPES, min_margin=0.3).classify(pages)
+    assert doc_type is None
+
+
+def test_no_pages():
+    assert LocalDocumentClassifier(TYPES).classify([]) == (None, {})
@@ -0,0 +1,91 @@
+from src.Documents.DocumentFormatting.DRW import DeathRegistrationWorksheet
+from src.Documents.DocumentFormatting.DeathCertificate import DeathCertificate
+from src.Features.CrossCheck import (
+    FIELD_MAPPING,
+    MATCH_SCORE,
+    MISMATCH_SCORE,
+    CrossChecker,
+    score_values,
+)
+
+
+def test_digits_and_numbers():
+    assert score_values("123-45-6789", "123456789", "digits") == 1.0
+    assert score_values("123-45-6789", "123456780", "digits") == 0.0
+    assert score_values("N/A", "123456789", "digits") is None
+    assert score_values("72 years", "72", "number") == 1.0
+
+
+def test_dates_in_different_forms():
+    assert score_values("01/02/1950", "January 2, 1950", "date") == 1.0
+    assert score_values("01/02/1950", "01/03/1950", "date") == 0.0
+    assert score_values("unknown", "01/02/1950", "date") is None
+
+
+def test_identifiers_ignore_punctuation_and_case():
+    assert score_values("fh-1234", "FH 1234", "identifier") == 1.0
+
+
+def test_choices():
+    assert score_values("M", "Male", "choice") == 1.0
+    assert score_values("Married", "Divorced", "choice") == 0.0
+
+
+def test_names_only_match_exactly():
+    assert score_values("John Smith", "SMITH, JOHN", "name") == 1.0
+    assert score_values("Jon Smith", "John Smith", "name") is None
+
+
+def test_addresses():
+    full = score_values(
+        "12 Main St, Springfield, IL", "12 MAIN STREET SPRINGFIELD ILLINOIS", "address"
+    )
+    assert full == 1.0
+    # Left out parts or a slight difference are undecided, not a mismatch
+    partial = score_values("12 Main St", "12 Main Street, Springfield", "address")
+    assert MISMATCH_SCORE < partial < MATCH_SCORE
+    assert score_values("12 Main St", "98 Oak Avenue", "address") <= MISMATCH_SCORE
+
+
+def test_mapping_uses_the_documents_field_names():
+    worksheet_fields = set(DeathRegistrationWorksheet().fields)
+    certificate_fields = set(DeathCertificate().fields)
+    for worksheet_names, certificate_name, _ in FIELD_MAPPING:
+        assert set(worksheet_names) <= worksheet_fields
+        assert certificate_name in certificate_fields
+
+
+def test_check_compares_place_of_death_certifier_and_date_signed():
+    result = CrossChecker().check(
+        {
+            "PLACE OF DEATH FACILITY NAME": "Mercy Hospital",
+            "PLACE OF DEATH FACILITY ADDRESS": "12 Main St",
+            "CERTIFIER'S NAME": "John Smith",
+            "DATE SIGNED": "01/02/2024",
+        },
+        {
+            "PLACE OF DEATH (FACILITY NAME AND ADDRESS)": "MERCY HOSPITAL 12 MAIN STREET",
+            "NAME OF PERSON COMPLETING CAUSE OF DEATH": "SMITH, JOHN",
+            "DATE CERTIFIED (mm/dd/yyyy)": "01/03/2024",
+        },
+    )
+    assert result.matches == [
+        "PLACE OF DEATH (FACILITY NAME AND ADDRESS)",
+        "NAME OF PERSON COMPLETING CAUSE OF DEATH",
+    ]
+    assert len(result.issues) == 1
+    assert result.issues[0].startswith("DATE CERTIFIED (mm/dd/yyyy)")
+
+
+def test_field_filled_in_on_one_document_only_is_an_issue():
+    result = CrossChecker().check(
+        {"SOCIAL SECURITY NUMBER": "123-45-6789", "AGE": ""},
+        {"DATE OF DEATH (mm/dd/yyyy)": "01/02/2024", "AGE": None},
+    )
+    assert result.matches == [] and result.undecided == {}
+    assert result.issues == [
+        "SOCIAL SECURITY NUMBER: '123-45-6789' on the Death Registration "
+        "Worksheet but missing from the Certificate of Death",
+        "DATE OF DEATH (mm/dd/yyyy): '01/02/2024' on the Certificate of Death "
+        "but missing from the Death Registration Worksheet",
+    ]
@@ -0,0 +1,53 @@
+import itertools
+
+import pytest
+
+from src.Helpers import DiskCache as disk_cache_module
+from src.Helpers.DiskCache import DiskCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Distinct access times, so the LRU order does not depend on timer resolution
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(disk_cache_module.time, "time", lambda: float(next(ticks)))
+
+
+def test_get_set_and_counters(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / "cache.db"), max_bytes=1000)
+    assert cache.get("a") is None
+    cache.set("a", {"pages": [1, 2]})
+    assert cache.get("a") == {"pages": [1, 2]}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    # Each value is 12 bytes of JSON
+    cache = DiskCache(str(tmp_path / "cache.db"), max_bytes=40)
+    for key in "abc":
+        cache.set(key, "x" * 10)
+    cache.get("a")
+    cache.set("d", "x" * 10)
+    # 48 bytes stored: freed down to 36, oldest access first
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.get("d") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_missing(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(disk_cache_module.time, "time", lambda: now[0])
+    cache = DiskCache(str(tmp_path / "cache.db"), max_bytes=1000, ttl_seconds=60)
+    cache.set("a", 1)
+    now[0] += 61
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    DiskCache(path, max_bytes=1000).set("a", [1])
+    assert DiskCache(path, max_bytes=1000).get("a") == [1]
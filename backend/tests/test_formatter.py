@@ -0,0 +1,40 @@
+from src.Features.Formatter import merge_field_groups
+
+
+def test_fields_in_group_order():
+    merged, conflicts = merge_field_groups(
+        [["A", "B"], ["C"]], [{"B": "b", "A": "a"}, {"C": "c"}]
+    )
+    assert list(merged) == ["A", "B", "C"]
+    assert merged == {"A": "a", "B": "b", "C": "c"}
+    assert conflicts == []
+
+
+def test_owning_group_wins_a_conflict():
+    merged, conflicts = merge_field_groups(
+        [["A"], ["B"]], [{"A": "a"}, {"B": "b", "A": "other"}]
+    )
+    assert merged["A"] == "a"
+    assert conflicts == [{"field": "A", "value": "a", "alternatives": ["other"]}]
+
+
+def test_empty_owner_takes_another_groups_value():
+    merged, conflicts = merge_field_groups(
+        [["A"], ["B"]], [{"A": "N/A"}, {"B": "b", "A": "found"}]
+    )
+    assert merged["A"] == "found"
+    assert conflicts == []
+
+
+def test_same_or_empty_values_are_not_conflicts():
+    _, conflicts = merge_field_groups(
+        [["A"], ["B"]], [{"A": "a"}, {"B": "b", "A": "a"}]
+    )
+    assert conflicts == []
+    _, conflicts = merge_field_groups([["A"], ["B"]], [{"A": "a"}, {"A": None}])
+    assert conflicts == []
+
+
+def test_missing_field_and_unrequested_field():
+    merged, _ = merge_field_groups([["A", "B"]], [{"A": "a", "EXTRA": "x"}])
+    assert merged == {"A": "a", "B": None, "EXTRA": "x"}
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Flask
+
+from src.Models import AuditResult, Job, QueuedJob, User, db
+from src.Process.JobQueue import DatabaseJobQueue
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, username="user", password="password"))
+        db.session.add(
+            Job(
+                id="job",
+                case_number="1",
+                branch="branch",
+                status="processing",
+                feature="general",
+                user_id=1,
+            )
+        )
+        db.session.commit()
+        yield app
+
+
+def enqueue_claimed(attempts: int, heartbeat_age: timedelta):
+    db.session.add(
+        QueuedJob(
+            job_id="job",
+            claimed_by="host:1:0",
+            attempts=attempts,
+            heartbeat_at=datetime.now(timezone.utc) - heartbeat_age,
+        )
+    )
+    db.session.commit()
+
+
+def test_stale_job_is_reclaimed_below_the_attempt_limit(app):
+    enqueue_claimed(attempts=2, heartbeat_age=timedelta(hours=1))
+    queue = DatabaseJobQueue(app, lease_seconds=60, max_attempts=3)
+
+    assert queue._claim("host:2:0") == "job"
+    db.session.expire_all()
+    assert db.session.get(QueuedJob, "job").attempts == 3
+
+
+def test_stale_job_that_used_its_attempts_fails(app):
+    enqueue_claimed(attempts=3, heartbeat_age=timedelta(hours=1))
+    queue = DatabaseJobQueue(app, lease_seconds=60, max_attempts=3)
+
+    assert queue._claim("host:2:0") is None
+    db.session.expire_all()
+    assert db.session.get(Job, "job").status == "failed"
+    assert db.session.get(QueuedJob, "job") is None
+    assert db.session.query(AuditResult).one().error
+
+
+def test_running_job_is_left_alone(app):
+    enqueue_claimed(attempts=3, heartbeat_age=timedelta(seconds=0))
+    queue = DatabaseJobQueue(app, lease_seconds=60, max_attempts=3)
+
+    assert queue._claim("host:2:0") is None
+    db.session.expire_all()
+    assert db.session.get(Job, "job").status == "processing"
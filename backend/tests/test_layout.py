@@ -0,0 +1,31 @@
+from src.Documents.Page import Page
+from src.Documents.Layout import serialize_layout, serialize_page
+
+
+def test_lines_in_reading_order_with_page_width_columns():
+    page = Page(
+        content=[
+            ("Smith", [850, 102, 950, 118], 0.9),
+            ("Name", [100, 100, 180, 120], 0.9),
+            ("Date of death", [100, 200, 300, 220], 0.9),
+            ("  ", [400, 200, 420, 220], 0.9),
+        ],
+        width=1700,
+    )
+    assert serialize_page(page, columns=100) == "@5 Name @50 Smith\n@5 Date of death"
+    assert serialize_page(page, columns=None) == "Name Smith\nDate of death"
+
+
+def test_width_falls_back_to_the_rightmost_text():
+    page = Page(content=[("A", [0, 0, 10, 10], 1), ("B", [50, 0, 100, 10], 1)])
+    assert serialize_page(page, columns=10) == "@0 A @5 B"
+
+
+def test_column_is_capped():
+    page = Page(content=[("Edge", [1700, 0, 1750, 10], 1)], width=1700)
+    assert serialize_page(page, columns=100) == "@99 Edge"
+
+
+def test_serialize_layout_numbers_pages():
+    pages = [Page(content=[("A", [0, 0, 10, 10], 1)], width=100), Page(content=[])]
+    assert serialize_layout(pages, columns=None) == "[page 1]\nA\n[page 2]\n"
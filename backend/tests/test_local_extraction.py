@@ -0,0 +1,69 @@
+from src.Documents.Page import Page
+from src.Features.LocalExtraction import FieldExtractor, field_kind, field_label
+
+
+def box(x_min, y_min, x_max, y_max):
+    return [x_min, y_min, x_max, y_max]
+
+
+def test_field_kind_and_label():
+    assert field_kind("DATE OF BIRTH (mm/dd/yyyy)") == "date"
+    assert field_kind("DECEDENT'S FIRST NAME") is None
+    assert field_label("DATE OF BIRTH (mm/dd/yyyy)") == "DATE OF BIRTH"
+
+
+def test_value_in_the_label_text():
+    page = Page(
+        content=[("Social Security Number: 123 45 6789", box(0, 0, 300, 10), 1)]
+    )
+    values = FieldExtractor().extract([page], ["SOCIAL SECURITY NUMBER"])
+    assert values == {"SOCIAL SECURITY NUMBER": "123-45-6789"}
+
+
+def test_value_right_of_and_below_the_label():
+    page = Page(
+        content=[
+            ("PHONE NUMBER", box(0, 0, 100, 10), 1),
+            ("(555) 123-4567", box(120, 0, 220, 10), 1),
+            ("DATE OF BIRTH (mm/dd/yyyy)", box(0, 50, 200, 60), 1),
+            ("1/2/1950", box(0, 65, 80, 75), 1),
+        ]
+    )
+    values = FieldExtractor().extract(
+        [page], ["PHONE NUMBER", "DATE OF BIRTH (mm/dd/yyyy)"]
+    )
+    assert values == {
+        "PHONE NUMBER": "555-123-4567",
+        "DATE OF BIRTH (mm/dd/yyyy)": "01/02/1950",
+    }
+
+
+def test_ocr_noise_in_long_label_words():
+    page = Page(content=[("S0CIAL SECURlTY NUMBER 123-45-6789", box(0, 0, 300, 10), 1)])
+    values = FieldExtractor().extract([page], ["SOCIAL SECURITY NUMBER"])
+    assert values == {"SOCIAL SECURITY NUMBER": "123-45-6789"}
+
+
+def test_short_label_words_must_match_exactly():
+    page = Page(
+        content=[
+            ("TAX NUMBER", box(0, 0, 100, 10), 1),
+            ("555-123-4567", box(120, 0, 220, 10), 1),
+        ]
+    )
+    assert FieldExtractor().extract([page], ["FAX NUMBER"]) == {}
+
+
+def test_longer_word_starting_with_the_label_is_not_the_label():
+    page = Page(content=[("DATED 01/02/2020", box(0, 0, 200, 10), 1)])
+    assert FieldExtractor().extract([page], ["DATE"]) == {}
+
+
+def test_disagreeing_occurrences_are_left_to_the_llm():
+    page = Page(
+        content=[
+            ("ZIP CODE 12345", box(0, 0, 100, 10), 1),
+            ("ZIP CODE 54321", box(0, 50, 100, 60), 1),
+        ]
+    )
+    assert FieldExtractor().extract([page], ["ZIP CODE"]) == {}
@@ -0,0 +1,65 @@
+import cv2
+import numpy as np
+
+from src.OCR.Preprocessing import preprocess_page
+
+
+def blank_page(height=2200, width=1700):
+    return np.full((height, width, 3), 255, dtype=np.uint8)
+
+
+def text_page(angle=0.0):
+    image = blank_page()
+    for top in range(200, 2000, 60):
+        cv2.rectangle(image, (200, top), (1500, top + 20), (0, 0, 0), -1)
+    if angle:
+        rotation = cv2.getRotationMatrix2D((850, 1100), angle, 1.0)
+        image = cv2.warpAffine(
+            image, rotation, (1700, 2200), borderValue=(255, 255, 255)
+        )
+    return image
+
+
+def test_blank_page_is_skipped():
+    image = blank_page()
+    # Scanner dust
+    image[500:502, 500:502] = 0
+    result, record = preprocess_page(image, blank_max_ink=0.01)
+    assert result is None and record.blank
+
+
+def test_sparse_page_with_a_mark_is_kept():
+    image = blank_page()
+    cv2.line(image, (300, 1800), (900, 1800), (0, 0, 0), 3)
+    result, record = preprocess_page(image, blank_max_ink=0.01)
+    assert result is not None and not record.blank
+
+
+def test_downscale_and_map_box_back():
+    result, record = preprocess_page(text_page(), target_height=1100)
+    assert result.shape[:2] == (1100, 850)
+    assert record.scale == 0.5
+    assert record.map_box_back([100, 100, 200, 110]).tolist() == [200, 200, 400, 220]
+
+
+def test_never_upscaled():
+    result, record = preprocess_page(text_page(), target_height=4000)
+    assert result.shape[:2] == (2200, 1700) and record.scale == 1.0
+
+
+def test_deskew_and_map_box_back():
+    image = text_page(angle=2.0)
+    result, record = preprocess_page(image, deskew=True, max_skew=5)
+    assert abs(abs(record.skew_angle) - 2.0) <= 0.25
+    # A box in the preprocessed image maps back to the same spot on the page
+    point = np.array([850.0, 400.0, 1.0])
+    x, y = record.matrix @ point
+    box = record.map_box_back([x - 1, y - 1, x + 1, y + 1])
+    assert abs((box[0] + box[2]) / 2 - 850) <= 2
+    assert abs((box[1] + box[3]) / 2 - 400) <= 2
+
+
+def test_binarize():
+    result, record = preprocess_page(text_page(), binarize=True)
+    assert record.binarized
+    assert set(np.unique(result)) <= {0, 255}
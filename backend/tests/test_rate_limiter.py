@@ -0,0 +1,84 @@
+import time
+import threading
+
+from src.LLM import RateLimiter as rate_limiter_module
+from src.LLM.RateLimiter import RateLimiter, _Bucket, get_rate_limiter, process_budget
+
+
+def test_bucket_refills_continuously():
+    bucket = _Bucket(60)
+    bucket.updated = 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1) == 1.0
+    bucket.refill(0.5)
+    assert bucket.level == 0.5
+    bucket.refill(1000.0)
+    assert bucket.level == 60
+
+
+def test_bucket_lets_oversized_requests_through_when_full():
+    bucket = _Bucket(100)
+    assert bucket.wait_time(500) == 0.0
+    bucket.take(500)
+    assert bucket.level == 0.0
+
+
+def test_acquire_waits_for_the_token_budget():
+    limiter = RateLimiter(tokens_per_minute=6000)
+    started = time.monotonic()
+    limiter.acquire(6000)
+    assert time.monotonic() - started < 0.05
+    # 100 tokens a second
+    limiter.acquire(10)
+    assert time.monotonic() - started >= 0.09
+    assert limiter.stats()["granted"] == 2
+
+
+def test_pause_holds_grants():
+    limiter = RateLimiter(requests_per_minute=1000)
+    limiter.pause(0.1)
+    started = time.monotonic()
+    limiter.acquire(1)
+    assert time.monotonic() - started >= 0.09
+    assert limiter.stats()["rate_limited"] == 1
+
+
+def test_jobs_are_served_round_robin():
+    # 100 tokens a second: each call waits 0.1 s, long after all are queued
+    limiter = RateLimiter(tokens_per_minute=6000)
+    limiter.acquire(6000)
+    order = []
+
+    def call(job):
+        limiter.acquire(10, key=job)
+        order.append(job)
+
+    threads = []
+    for job in ["a", "a", "a", "b"]:
+        thread = threading.Thread(target=call, args=(job,))
+        thread.start()
+        threads.append(thread)
+        # Queue the calls in this order
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    # Job b's one call does not wait behind all of job a's
+    assert order == ["a", "b", "a", "a"]
+
+
+def test_process_budget():
+    assert process_budget((500, 0), 4) == (125, 0)
+    assert process_budget((3, 100), 8) == (1, 12)
+    assert process_budget((500, 1000), 0) == (500, 1000)
+
+
+def test_get_rate_limiter_is_shared_per_provider(monkeypatch):
+    monkeypatch.setattr(rate_limiter_module, "_limiters", {})
+    config = {
+        "LLM_RATE_LIMITS": {"OPENAI": (500, 0), "GEMINI": (0, 0)},
+        "LLM_RATE_LIMIT_PROCESSES": 2,
+    }
+    limiter = get_rate_limiter(config, "openai")
+    assert limiter is get_rate_limiter(config, "OpenAI")
+    assert limiter.stats()["requests_per_minute"] == 250
+    assert get_rate_limiter(config, "gemini") is None
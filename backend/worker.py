@@ -0,0 +1,96 @@
+"""
+Standalone job worker.
+
+Runs the OCR/LLM pipeline of ``src/Process/Worker.py`` outside the web
+process. Start the web process with ``RUN_WORKERS_IN_WEB=false`` and any
+number of these:
+
+    python worker.py [--workers N] [--ocr-processes N]
+
+With ``JOB_BROKER_URL`` (Redis) set, jobs are pulled from the shared rq queue
+and progress is sent to the web tier through ``SOCKETIO_MESSAGE_QUEUE``, so
+workers can run on other hosts (they also need ``DATABASE_URL`` and the upload
+folder). Without it, the database job queue and the database event relay act
+as a local broker for workers on the same host.
+
+The LLM rate limits are enforced per process: set LLM_RATE_LIMIT_PROCESSES to
+the number of worker processes (plus the web process if it also runs workers)
+so that together they stay within the provider budgets.
+"""
+
+import time
+import argparse
+import logging
+from functools import partial
+
+from src.flask_config import app
+from src.Socket import socketio
+from src.Models import upgrade_database
+from src.Socket.Relay import get_worker_emitter
+from src.Process.JobQueue import DatabaseJobQueue, RQ_QUEUE_NAME
+
+
+def run_rq_worker(burst: bool):
+    from redis import Redis
+    from rq import Queue, SimpleWorker
+
+    connection = Redis.from_url(app.config["JOB_BROKER_URL"])
+    queue = Queue(RQ_QUEUE_NAME, connection=connection)
+    # SimpleWorker runs jobs in this process instead of forking per job, so the
+    # OCR models and LLM clients stay loaded between jobs
+    SimpleWorker([queue], connection=connection).work(burst=burst)
+
+
+def run_pool_worker(workers: int, ocr_processes: int, stats_interval: int):
+    from src.Process.Worker import Worker
+    from src.Process.WorkerPool import WorkerPool
+
+    job_queue = DatabaseJobQueue(
+        app,
+        lease_seconds=app.config["JOB_LEASE_SECONDS"],
+        poll_interval=app.config["JOB_QUEUE_POLL_SECONDS"],
+        max_attempts=app.config["JOB_MAX_ATTEMPTS"],
+    )
+    pool = WorkerPool(
+        size=workers,
+        ocr_processes=ocr_processes,
+        job_queue=job_queue,
+        worker_factory=partial(Worker, emitter=get_worker_emitter(app, socketio)),
+        heartbeat_interval=app.config["JOB_LEASE_SECONDS"] / 4,
+    )
+    pool.start()
+
+    while True:
+        time.sleep(stats_interval)
+        stats = pool.stats()
+        print(
+            f"[Worker] queue depth {stats['queue_depth']}, "
+            f"busy {stats['busy_workers']}/{len(stats['workers'])}, "
+            f"utilisation {stats['utilisation']:.0%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued document jobs")
+    parser.add_argument("--workers", type=int, default=app.config["JOB_WORKERS"])
+    parser.add_argument(
+        "--ocr-processes", type=int, default=app.config["OCR_PROCESSES"]
+    )
+    parser.add_argument("--stats-interval", type=int, default=60)
+    parser.add_argument(
+        "--burst", action="store_true", help="rq only: exit once the queue is empty"
+    )
+    args = parser.parse_args()
+
+    with app.app_context():
+        upgrade_database()
+
+    if app.config["JOB_BROKER_URL"]:
+        run_rq_worker(args.burst)
+    else:
+        run_pool_worker(args.workers, args.ocr_processes, args.stats_interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()